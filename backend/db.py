@@ -1,42 +1,671 @@
 # backend/db.py
+import functools
 import os
+import random
+import threading
+import time
+
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from utils import query_stats
 
 # ✅ Load .env when running locally
 load_dotenv()
 
-def get_db():
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _connect_kwargs() -> dict:
     """
-    Create and return a MySQL connection using environment variables.
+    Connection settings from environment variables.
 
     - Works locally with defaults (XAMPP).
     - Works in deployment when DB_* env vars are set in the host (Render, etc.).
     """
+    return {
+        "host": os.getenv("DB_HOST", "127.0.0.1"),
+        "port": int(os.getenv("DB_PORT", "3306")),  # ✅ defaults to 3306
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", ""),
+        "database": os.getenv("DB_NAME", "itrack"),
+    }
+
+
+def _replica_connect_kwargs() -> dict:
+    """
+    Read-replica settings (DB_REPLICA_*); anything unset falls back to the primary's.
+    """
+    primary = _connect_kwargs()
+    return {
+        "host": os.getenv("DB_REPLICA_HOST", primary["host"]),
+        "port": int(os.getenv("DB_REPLICA_PORT", str(primary["port"]))),
+        "user": os.getenv("DB_REPLICA_USER", primary["user"]),
+        "password": os.getenv("DB_REPLICA_PASSWORD", primary["password"]),
+        "database": os.getenv("DB_REPLICA_NAME", primary["database"]),
+    }
+
+
+def use_sqlite() -> bool:
+    """DB_BACKEND=sqlite: embedded local database instead of MySQL (db_sqlite.py)."""
+    return os.getenv("DB_BACKEND", "mysql").strip().lower() == "sqlite"
+
+
+def replica_configured() -> bool:
+    return bool(os.getenv("DB_REPLICA_HOST"))
+
+
+def _open_raw_connection(kwargs: dict | None = None):
+    """
+    Open a brand-new MySQL connection (TCP connect + auth + database select).
+    """
+    conn = mysql.connector.connect(**(kwargs or _connect_kwargs()))
+    if conn.is_connected():
+        return conn
+
+    print("❌ Database connected but connection is not active.")
+    raise Error("Connection is not active")
+
+
+class UnpooledConnection:
+    """
+    A connection opened outside the pool (DB_POOL_ENABLED=0, the training
+    scheduler's lock connection). Everything is delegated to the real
+    connection except cursor(), which is timed into utils.query_stats like
+    the pooled ones.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cur = self._raw.cursor(*args, **kwargs)
+        if query_stats.ENABLED:
+            return query_stats.InstrumentedCursor(cur)
+        return cur
+
+
+def open_dedicated_connection(kwargs: dict | None = None) -> UnpooledConnection:
+    """
+    A new MySQL connection of the caller's own, never shared through the pool.
+    For session state that must outlive one request (GET_LOCK held for the
+    process lifetime); close() really disconnects. Statements are timed like
+    pooled ones.
+    """
+    return UnpooledConnection(_open_raw_connection(kwargs))
+
+
+# ----------------------------------------------------------
+# Connection pool
+# ----------------------------------------------------------
+class _PreparedRegistry:
+    """
+    Server-side prepared statements for one physical connection, keyed by SQL
+    text. Each statement is prepared on first use and then re-executed over the
+    binary protocol. Statements die with the connection, so the registry lives
+    exactly as long as the pooled connection it belongs to.
+    """
+
+    def __init__(self, max_size: int, bump):
+        self.max_size = max_size
+        self._bump = bump  # increments one of the owning pool's counters
+        self._cursors: dict = {}  # (sql, dictionary) -> prepared cursor, LRU order
+
+    def get(self, raw, sql: str, dictionary: bool):
+        key = (sql, dictionary)
+        cur = self._cursors.pop(key, None)
+        if cur is not None:
+            self._bump("prepared_hits")
+        else:
+            if len(self._cursors) >= self.max_size:
+                oldest = self._cursors.pop(next(iter(self._cursors)))
+                try:
+                    oldest.close()  # deallocates the server-side statement
+                except Exception:
+                    pass
+            cur = raw.cursor(prepared=True, dictionary=dictionary)
+            self._bump("statements_prepared")
+        self._cursors[key] = cur  # most recently used goes last
+        return cur
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+
+class _ConnState:
+    """
+    Bookkeeping the pool keeps next to each physical connection.
+    """
+
+    __slots__ = ("created_at", "prepared")
+
+    def __init__(self, created_at: float, prepared: _PreparedRegistry):
+        self.created_at = created_at
+        self.prepared = prepared
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a mysql.connector connection checked out of the pool.
+
+    Everything is delegated to the real connection, except:
+    - close() hands the connection back to the pool instead of tearing down
+      the socket, so the existing `conn.close()` calls keep working unchanged;
+    - cursor() returns a timed cursor feeding utils.query_stats;
+    - prepared() hands out this connection's prepared cursor for a statement.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw, state: _ConnState):
+        self._pool = pool
+        self._raw = raw
+        self._state = state
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cur = self._raw.cursor(*args, **kwargs)
+        if query_stats.ENABLED:
+            return query_stats.InstrumentedCursor(cur)
+        return cur
+
+    def prepared(self, sql: str, dictionary: bool = False):
+        """
+        Prepared cursor for `sql`, reused across requests on this connection.
+        The registry owns it: callers may close() it as usual (that only ends
+        the timing), and must fetch all rows before the next execute.
+        """
+        cur = self._state.prepared.get(self._raw, sql, dictionary)
+        return query_stats.InstrumentedCursor(cur, owned=False)
+
+    def close(self) -> None:
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._checkin(self._raw, self._state)
+
+
+class ConnectionPool:
+    """
+    Small thread-safe MySQL connection pool.
+
+    - size:         connections kept open while idle
+    - max_overflow: extra connections allowed under load (closed on return)
+    - recycle:      max age in seconds before a connection is replaced (<= 0 disables)
+    - pre_ping:     ping idle connections on checkout and replace dead ones
+    - timeout:      seconds to wait for a free connection before giving up
+    """
+
+    def __init__(
+        self,
+        size: int = 5,
+        max_overflow: int = 10,
+        recycle: int = 1800,
+        pre_ping: bool = True,
+        timeout: float = 30.0,
+        connect=_open_raw_connection,
+        prepared_cache_size: int = 32,
+    ):
+        self.size = max(1, size)
+        self.max_overflow = max(0, max_overflow)
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self._connect = connect
+        self.prepared_cache_size = max(1, prepared_cache_size)
+
+        self._idle: list = []  # [(raw_conn, _ConnState)]
+        self._checked_out = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "statements_prepared": 0,
+            "prepared_hits": 0,
+        }
+
+    # ---------- internal helpers ----------
+    def _bump(self, name: str) -> None:
+        # Counters change from many threads; only under the pool lock
+        with self._cond:
+            self._stats[name] += 1
+
+    def _close_raw(self, raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+        self._bump("connections_closed")
+
+    def _is_usable(self, raw, state: _ConnState) -> bool:
+        if self.recycle > 0 and time.monotonic() - state.created_at > self.recycle:
+            self._bump("recycled")
+            return False
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._bump("ping_failures")
+                return False
+        return True
+
+    # ---------- checkout / checkin ----------
+    def connect(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, state = self._idle.pop()
+                    self._checked_out += 1
+                    break
+                if self._checked_out < self.size + self.max_overflow:
+                    raw, state = None, None
+                    self._checked_out += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise Error(
+                        f"Connection pool exhausted "
+                        f"(size={self.size}, max_overflow={self.max_overflow})"
+                    )
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        # Network work (ping / connect) happens outside the lock.
+        try:
+            if raw is not None and not self._is_usable(raw, state):
+                self._close_raw(raw)
+                raw = None
+
+            if raw is None:
+                raw = self._connect()
+                state = _ConnState(
+                    time.monotonic(),
+                    _PreparedRegistry(self.prepared_cache_size, self._bump),
+                )
+                self._bump("connections_created")
+            else:
+                self._bump("reused")
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+        self._bump("checkouts")
+        return PooledConnection(self, raw, state)
+
+    def _checkin(self, raw, state: _ConnState) -> None:
+        # Never hand a connection with an open transaction (or a stale
+        # REPEATABLE READ snapshot) to the next request.
+        keep = True
+        try:
+            raw.rollback()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if keep and len(self._idle) < self.size:
+                self._idle.append((raw, state))
+                raw = None
+            self._cond.notify()
+
+        if raw is not None:
+            self._close_raw(raw)
+
+    # ---------- maintenance ----------
+    def dispose(self) -> None:
+        """
+        Close every idle connection (checked-out ones close when returned).
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _ in idle:
+            self._close_raw(raw)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "recycle_seconds": self.recycle,
+                "pre_ping": self.pre_ping,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                **self._stats,
+            }
+
+
+_POOL = None
+_REPLICA_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _build_pool(connect) -> ConnectionPool:
+    return ConnectionPool(
+        size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+        recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        connect=connect,
+        prepared_cache_size=int(os.getenv("DB_PREPARED_CACHE_SIZE", "32")),
+    )
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Lazily build the process-wide pool from DB_POOL_* env vars.
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = _build_pool(_open_raw_connection)
+    return _POOL
+
+
+def get_replica_pool() -> ConnectionPool:
+    global _REPLICA_POOL
+    if _REPLICA_POOL is None:
+        with _POOL_LOCK:
+            if _REPLICA_POOL is None:
+                _REPLICA_POOL = _build_pool(
+                    lambda: _open_raw_connection(_replica_connect_kwargs())
+                )
+    return _REPLICA_POOL
+
+
+def dispose_pools() -> None:
+    for pool in (_POOL, _REPLICA_POOL):
+        if pool is not None:
+            pool.dispose()
+
+
+# ----------------------------------------------------------
+# Replica lag guard
+# ----------------------------------------------------------
+_REPLICA_STATE = {
+    "checked_at": 0.0,
+    "healthy": False,
+    "lag_seconds": None,
+    "last_error": None,
+    "readonly_checkouts": 0,
+    "fallbacks_to_primary": 0,
+}
+_REPLICA_LOCK = threading.Lock()
+
+
+def _replica_lag_seconds(conn) -> float | None:
+    """
+    Seconds the replica is behind its source; None when replication is stopped.
+    A server that is not replicating at all reports 0.
+    """
+    cur = conn.cursor(dictionary=True)
     try:
-        host = os.getenv("DB_HOST", "127.0.0.1")
-        port = int(os.getenv("DB_PORT", "3306"))  # ✅ defaults to 3306
-        user = os.getenv("DB_USER", "root")
-        password = os.getenv("DB_PASSWORD", "")
-        database = os.getenv("DB_NAME", "itrack")
-
-        conn = mysql.connector.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database,
+        try:
+            cur.execute("SHOW REPLICA STATUS")  # MySQL 8.0.22+
+        except Error:
+            cur.execute("SHOW SLAVE STATUS")
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+
+    if not rows:
+        return 0.0
+    row = rows[0]
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+def _replica_is_fresh(conn) -> bool:
+    """
+    Check replication lag at most every DB_REPLICA_LAG_CHECK_INTERVAL seconds;
+    fresh when lag <= DB_REPLICA_MAX_LAG.
+    """
+    interval = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "5"))
+    max_lag = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))
+
+    with _REPLICA_LOCK:
+        if time.monotonic() - _REPLICA_STATE["checked_at"] < interval:
+            return _REPLICA_STATE["healthy"]
+
+    try:
+        lag = _replica_lag_seconds(conn)
+        healthy = lag is not None and lag <= max_lag
+        error = None if healthy else f"replica lag {lag}s exceeds {max_lag}s"
+    except Exception as e:
+        lag, healthy, error = None, False, str(e)
+
+    with _REPLICA_LOCK:
+        _REPLICA_STATE.update(
+            checked_at=time.monotonic(),
+            healthy=healthy,
+            lag_seconds=lag,
+            last_error=error,
         )
+    return healthy
 
-        if conn.is_connected():
-            return conn
 
-        print("❌ Database connected but connection is not active.")
-        raise Error("Connection is not active")
+def _get_replica_connection():
+    """
+    A pooled replica connection, or None when the replica is down or too far behind.
+    """
+    try:
+        conn = get_replica_pool().connect()
+    except Exception as e:
+        with _REPLICA_LOCK:
+            _REPLICA_STATE["last_error"] = str(e)
+            _REPLICA_STATE["fallbacks_to_primary"] += 1
+        return None
+
+    if _replica_is_fresh(conn):
+        with _REPLICA_LOCK:
+            _REPLICA_STATE["readonly_checkouts"] += 1
+        return conn
+
+    conn.close()
+    with _REPLICA_LOCK:
+        _REPLICA_STATE["fallbacks_to_primary"] += 1
+    return None
+
+
+def get_pool_stats() -> dict:
+    stats = {"primary": get_pool().stats(), "replica": None}
+    if replica_configured():
+        with _REPLICA_LOCK:
+            guard = {k: v for k, v in _REPLICA_STATE.items() if k != "checked_at"}
+        stats["replica"] = {**get_replica_pool().stats(), **guard}
+    return stats
+
+
+def get_db(readonly: bool = False):
+    """
+    Return a pooled MySQL connection.
+
+    - readonly=True routes to the read replica (DB_REPLICA_* env vars) when one
+      is configured, healthy and within DB_REPLICA_MAX_LAG seconds; otherwise it
+      falls back to the primary. Only use it for reads that tolerate that lag.
+    - Callers keep using `conn.close()`; that returns the connection to the pool.
+    - Set DB_POOL_ENABLED=0 to fall back to one fresh connection per call.
+    - DB_BACKEND=sqlite returns a connection to the embedded local database
+      instead (offline benchmarks / load tests; see db_sqlite.py).
+    """
+    if use_sqlite():
+        from db_sqlite import connect_sqlite
+
+        return connect_sqlite()
+
+    try:
+        if not _env_bool("DB_POOL_ENABLED", True):
+            return open_dedicated_connection()
+
+        if readonly and replica_configured():
+            conn = _get_replica_connection()
+            if conn is not None:
+                return conn
+
+        return get_pool().connect()
 
     except Error as e:
         # This will show up in your backend logs
         print("❌ Database connection error:", e)
         # Let FastAPI return 500 instead of silently returning None
         raise
+
+
+def prepared_cursor(conn, sql: str, dictionary: bool = False):
+    """
+    Cursor for a hot statement, executed as a server-side prepared statement.
+
+    Pooled connections keep one prepared cursor per SQL text, so the statement
+    is parsed once per connection instead of once per call. Other connections
+    (DB_POOL_ENABLED=0) or DB_PREPARED_STATEMENTS=0 get a plain cursor.
+    Either way: execute, fetch every row, then close() as usual.
+    """
+    if isinstance(conn, PooledConnection) and _env_bool("DB_PREPARED_STATEMENTS", True):
+        return conn.prepared(sql, dictionary=dictionary)
+    return conn.cursor(dictionary=dictionary)
+
+
+# ----------------------------------------------------------
+# Deadlock-safe transactions
+# ----------------------------------------------------------
+# MySQL errors worth retrying the whole transaction for.
+RETRYABLE_ERRNOS = {
+    1213: "deadlocks",           # ER_LOCK_DEADLOCK
+    1205: "lock_wait_timeouts",  # ER_LOCK_WAIT_TIMEOUT
+}
+
+_TX_STATS: dict = {}
+_TX_LOCK = threading.Lock()
+
+
+def db_error_code(err) -> int | None:
+    """
+    MySQL error number from a mysql.connector (err.errno) or PyMySQL/aiomysql
+    (err.args[0]) exception.
+    """
+    code = getattr(err, "errno", None)
+    if isinstance(code, int):
+        return code
+    args = getattr(err, "args", ())
+    if args and isinstance(args[0], int):
+        return args[0]
+    return None
+
+
+def is_retryable_error(err) -> bool:
+    return db_error_code(err) in RETRYABLE_ERRNOS
+
+
+def _tx_note(name: str, key: str) -> None:
+    with _TX_LOCK:
+        counters = _TX_STATS.setdefault(
+            name,
+            {"calls": 0, "retries": 0, "deadlocks": 0, "lock_wait_timeouts": 0, "gave_up": 0},
+        )
+        counters[key] += 1
+
+
+def get_tx_stats() -> dict:
+    with _TX_LOCK:
+        return {name: dict(c) for name, c in _TX_STATS.items()}
+
+
+def tx_retry_attempts() -> int:
+    return max(1, int(os.getenv("DB_TX_RETRY_ATTEMPTS", "4")))
+
+
+def tx_backoff_seconds(attempt: int) -> float:
+    """
+    "Full jitter" exponential backoff: uniform(0, min(cap, base * 2^attempt)).
+    """
+    base = float(os.getenv("DB_TX_RETRY_BASE_MS", "25")) / 1000.0
+    cap = float(os.getenv("DB_TX_RETRY_MAX_MS", "500")) / 1000.0
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def tx_give_up(name: str, attempts: int, err) -> HTTPException:
+    _tx_note(name, "gave_up")
+    return HTTPException(
+        status_code=503,
+        detail=f"Database busy ({err}); gave up after {attempts} attempts, please retry.",
+    )
+
+
+def retry_transaction(name: str):
+    """
+    Re-run a whole transaction function when MySQL reports a deadlock (1213)
+    or lock wait timeout (1205). The function must roll back and re-raise
+    those errors untouched; anything else passes straight through.
+    Per-name counters are exported via get_tx_stats().
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            attempts = tx_retry_attempts()
+            _tx_note(name, "calls")
+            for attempt in range(1, attempts + 1):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as err:
+                    if not is_retryable_error(err):
+                        raise
+                    _tx_note(name, RETRYABLE_ERRNOS[db_error_code(err)])
+                    if attempt == attempts:
+                        raise tx_give_up(name, attempts, err) from err
+                    _tx_note(name, "retries")
+                    time.sleep(tx_backoff_seconds(attempt))
+
+        return wrapper
+
+    return decorator
+
+
+def get_db_conn():
+    """
+    FastAPI dependency: one pooled connection for the whole request.
+
+    Handlers and log_activity(conn=...) share it, so a request costs one
+    checkout instead of two. The connection goes back to the pool (rolled
+    back if uncommitted) once the request finishes, on every path.
+    """
+    conn = get_db()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_readonly_db_conn():
+    """
+    Same as get_db_conn, but served by the read replica when it is usable.
+    """
+    conn = get_db(readonly=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
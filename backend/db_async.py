@@ -0,0 +1,142 @@
+# backend/db_async.py
+"""
+Async MySQL access for the hot POS endpoints.
+
+The sync db.get_db() path blocks a Starlette threadpool thread per request.
+Handlers that `await` here instead release the event loop while MySQL works,
+so concurrency is bounded by the pool, not by the threadpool.
+
+aiomysql is optional: when it is missing (or DB_ASYNC_ENABLED=0, or
+DB_BACKEND=sqlite) the async handlers fall back to their sync implementation
+in the threadpool.
+"""
+import asyncio
+import functools
+import os
+from contextlib import asynccontextmanager
+
+from db import (
+    _connect_kwargs,
+    _env_bool,
+    _tx_note,
+    RETRYABLE_ERRNOS,
+    db_error_code,
+    is_retryable_error,
+    tx_retry_attempts,
+    tx_backoff_seconds,
+    tx_give_up,
+    use_sqlite,
+)
+from utils import query_stats
+
+try:
+    import aiomysql
+    _HAS_AIOMYSQL = True
+    AsyncDBError = aiomysql.Error
+except Exception:
+    aiomysql = None  # type: ignore
+    _HAS_AIOMYSQL = False
+
+    class AsyncDBError(Exception):  # type: ignore[no-redef]
+        pass
+
+
+_POOL = None
+# Concurrent first requests must not each create (and leak) a pool
+_POOL_LOCK = asyncio.Lock()
+
+
+def has_async_db() -> bool:
+    return _HAS_AIOMYSQL and _env_bool("DB_ASYNC_ENABLED", True) and not use_sqlite()
+
+
+async def get_async_pool():
+    """
+    Lazily create the aiomysql pool. Sized like the sync pool
+    (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW) and recycled after DB_POOL_RECYCLE.
+    """
+    global _POOL
+    if _POOL is not None:
+        return _POOL
+    async with _POOL_LOCK:
+        if _POOL is None:
+            kw = _connect_kwargs()
+            size = int(os.getenv("DB_POOL_SIZE", "5"))
+            overflow = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+            _POOL = await aiomysql.create_pool(
+                host=kw["host"],
+                port=kw["port"],
+                user=kw["user"],
+                password=kw["password"],
+                db=kw["database"],
+                minsize=max(1, size),
+                maxsize=max(1, size + overflow),
+                pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+                autocommit=False,
+            )
+    return _POOL
+
+
+async def close_async_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.close()
+        await _POOL.wait_closed()
+        _POOL = None
+
+
+@asynccontextmanager
+async def acquire():
+    """
+    Check a connection out of the async pool.
+
+    Always rolls back before release: aiomysql drops connections that come
+    back mid-transaction, which would defeat the pool.
+    """
+    pool = await get_async_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+    finally:
+        try:
+            await conn.rollback()
+        except Exception:
+            conn.close()
+        pool.release(conn)
+
+
+def dict_cursor(conn):
+    """
+    Cursor returning rows as dicts, like mysql.connector's cursor(dictionary=True).
+    """
+    cur = conn.cursor(aiomysql.DictCursor)
+    if query_stats.ENABLED:
+        return query_stats.AsyncInstrumentedCursor(cur)
+    return cur
+
+
+def retry_transaction_async(name: str):
+    """
+    Async twin of db.retry_transaction (same counters, same backoff).
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            attempts = tx_retry_attempts()
+            _tx_note(name, "calls")
+            for attempt in range(1, attempts + 1):
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as err:
+                    if not is_retryable_error(err):
+                        raise
+                    _tx_note(name, RETRYABLE_ERRNOS[db_error_code(err)])
+                    if attempt == attempts:
+                        raise tx_give_up(name, attempts, err) from err
+                    _tx_note(name, "retries")
+                    await asyncio.sleep(tx_backoff_seconds(attempt))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,277 @@
+# backend/db_sqlite.py
+"""
+Embedded SQLite stand-in for the MySQL database (DB_BACKEND=sqlite).
+
+Lets the whole FastAPI app run on one machine without MySQL, for offline
+benchmarks and load tests. get_db() hands out connections from here; they
+look enough like mysql.connector connections for the routers:
+
+  - cursor(dictionary=True), execute/fetchone/fetchall/fetchmany, lastrowid,
+    rowcount, start_transaction/commit/rollback/close
+  - %s placeholders, backticked `order` / `user` (SQLite accepts backticks)
+  - NOW(), YEAR(), MONTH(), DAY() registered as SQL functions; DATE(),
+    COALESCE, LOWER, TRIM are native
+  - FOR UPDATE is stripped; start_transaction() takes BEGIN IMMEDIATE instead,
+    so writers are serialized like the row locks would serialize them
+  - INSERT ... ON DUPLICATE KEY UPDATE col = VALUES(col) becomes an upsert
+    (ON CONFLICT DO UPDATE SET col = excluded.col)
+  - sqlite3 errors are re-raised as mysql.connector errors ("database is
+    locked" as errno 1205), so the routers' except clauses and the deadlock
+    retry still apply
+
+Settings:
+  DB_SQLITE_PATH     database file (default backend/data/itrack_local.sqlite3;
+                     ":memory:" for a throwaway shared in-memory database)
+  DB_SQLITE_TIMEOUT  seconds to wait on a locked database (default 30)
+
+The schema lives in schema_sqlite.sql and is applied on first use;
+scripts/seed_local_db.py fills it with deterministic data.
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import mysql.connector
+
+from utils import query_stats
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+SCHEMA_FILE = BACKEND_ROOT / "schema_sqlite.sql"
+DEFAULT_PATH = BACKEND_ROOT / "data" / "itrack_local.sqlite3"
+MEMORY_URI = "file:itrack_local?mode=memory&cache=shared"
+
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+
+_INIT_LOCK = threading.Lock()
+_INITIALIZED: set = set()
+_MEMORY_KEEPER = None  # a shared in-memory db lives as long as one connection does
+
+
+# -----------------------------------
+# Type adapters / converters
+# -----------------------------------
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(sep=" ", timespec="seconds"))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, str)
+
+
+def _to_datetime(raw: bytes):
+    return datetime.fromisoformat(raw.decode())
+
+
+sqlite3.register_converter("DATETIME", _to_datetime)
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("DECIMAL", lambda raw: Decimal(raw.decode()))
+
+
+def _part(value, start: int, end: int):
+    if value is None:
+        return None
+    text = value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+    try:
+        return int(text[start:end])
+    except ValueError:
+        return None
+
+
+def _register_functions(raw: sqlite3.Connection) -> None:
+    raw.create_function(
+        "NOW", 0, lambda: datetime.now().isoformat(sep=" ", timespec="seconds")
+    )
+    raw.create_function("YEAR", 1, lambda v: _part(v, 0, 4), deterministic=True)
+    raw.create_function("MONTH", 1, lambda v: _part(v, 5, 7), deterministic=True)
+    raw.create_function("DAY", 1, lambda v: _part(v, 8, 10), deterministic=True)
+
+
+# -----------------------------------
+# Dialect shim
+# -----------------------------------
+def translate_sql(sql: str, has_params: bool) -> str:
+    """
+    MySQL -> SQLite for the subset the routers use. Like mysql.connector,
+    placeholders (and %% escapes) are only rewritten when params are given.
+    """
+    sql = _FOR_UPDATE.sub("", sql)
+    upsert = _ON_DUPLICATE.search(sql)
+    if upsert:
+        head, tail = sql[: upsert.start()], sql[upsert.end():]
+        sql = head + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", tail)
+    if has_params:
+        sql = sql.replace("%s", "?").replace("%%", "%")
+    return sql
+
+
+def _mysql_error(err: sqlite3.Error) -> mysql.connector.Error:
+    msg = str(err)
+    if isinstance(err, sqlite3.IntegrityError):
+        return mysql.connector.errors.IntegrityError(msg=msg, errno=1452)
+    if isinstance(err, sqlite3.OperationalError) and "locked" in msg:
+        return mysql.connector.errors.DatabaseError(msg=msg, errno=1205)
+    if isinstance(err, sqlite3.OperationalError):
+        return mysql.connector.errors.ProgrammingError(msg=msg)
+    return mysql.connector.errors.DatabaseError(msg=msg)
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over a sqlite3 cursor."""
+
+    def __init__(self, raw: sqlite3.Connection, dictionary: bool = False):
+        self._cur = raw.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cur.description, row)}
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        sql = translate_sql(operation, params is not None)
+        try:
+            self._cur.execute(sql, tuple(params) if params is not None else ())
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def executemany(self, operation, seq_params):
+        sql = translate_sql(operation, True)
+        try:
+            self._cur.executemany(sql, [tuple(p) for p in seq_params])
+        except sqlite3.Error as err:
+            raise _mysql_error(err) from err
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cur.fetchmany(size) if size else self._cur.fetchmany()
+        return [self._row(r) for r in rows]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class SQLiteConnection:
+    """mysql.connector-style connection over a sqlite3 connection."""
+
+    def __init__(self, raw: sqlite3.Connection):
+        self._raw = raw
+
+    def cursor(self, dictionary: bool = False, prepared: bool = False, **_):
+        cur = SQLiteCursor(self._raw, dictionary=dictionary)
+        if query_stats.ENABLED:
+            return query_stats.InstrumentedCursor(cur)
+        return cur
+
+    def start_transaction(self, *_, **__):
+        if not self._raw.in_transaction:
+            try:
+                self._raw.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error as err:
+                raise _mysql_error(err) from err
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._raw.in_transaction
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def ping(self, *_, **__):
+        return None
+
+    def is_connected(self) -> bool:
+        return True
+
+    def close(self):
+        try:
+            self._raw.rollback()
+        finally:
+            self._raw.close()
+
+
+# -----------------------------------
+# Connections
+# -----------------------------------
+def sqlite_path() -> str:
+    return os.getenv("DB_SQLITE_PATH", str(DEFAULT_PATH))
+
+
+def _open(path: str) -> sqlite3.Connection:
+    timeout = float(os.getenv("DB_SQLITE_TIMEOUT", "30"))
+    if path == ":memory:":
+        raw = sqlite3.connect(
+            MEMORY_URI,
+            uri=True,
+            timeout=timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+    else:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        raw = sqlite3.connect(
+            path,
+            timeout=timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+        raw.execute("PRAGMA journal_mode=WAL")
+    raw.execute("PRAGMA foreign_keys=ON")
+    _register_functions(raw)
+    return raw
+
+
+def _ensure_schema(path: str) -> None:
+    global _MEMORY_KEEPER
+    if path in _INITIALIZED:
+        return
+    with _INIT_LOCK:
+        if path in _INITIALIZED:
+            return
+        raw = _open(path)
+        raw.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+        raw.commit()
+        if path == ":memory:":
+            _MEMORY_KEEPER = raw
+        else:
+            raw.close()
+        _INITIALIZED.add(path)
+
+
+def connect_sqlite(path: str | None = None) -> SQLiteConnection:
+    """New connection to the local database (schema applied on first use)."""
+    path = path or sqlite_path()
+    _ensure_schema(path)
+    return SQLiteConnection(_open(path))
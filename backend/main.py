@@ -2,7 +2,6 @@
 import logging
 import os
 import asyncio
-from datetime import datetime
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,11 +18,11 @@ from routers.reports import router as reports_router
 from routers.dashboard import router as dashboard_router
 from routers.activity_logs import router as activity_logs_router
 from routers.stockcard import router as stockcard_router
-from services.predictive_service import (
-    load_models_from_disk,
-    train_from_db_and_persist,
-    get_train_status,
-)
+from routers.debug import router as debug_router
+from db import dispose_pools
+from db_async import close_async_pool
+from utils.query_stats import QueryContextMiddleware
+from services import model_registry, train_scheduler
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -31,45 +30,11 @@ logging.basicConfig(level=logging.INFO)
 app = FastAPI()
 
 
-# ----------------------------------------------------------
-# Predictive auto-train scheduler (daily; skips if already ran today)
-# ----------------------------------------------------------
-async def _predictive_auto_train_loop():
-    await asyncio.sleep(5)  # allow app to finish startup
-    while True:
-        try:
-            status = get_train_status()
-            last_ts = status.get("last_trained_utc")
-            today = datetime.utcnow().date()
-            already_ran_today = False
-            if isinstance(last_ts, str):
-                try:
-                    parsed = datetime.fromisoformat(last_ts.replace("Z", "+00:00"))
-                    already_ran_today = parsed.date() == today
-                except Exception:
-                    already_ran_today = False
-
-            if not already_ran_today:
-                logging.info(
-                    "Auto-train: starting predictive retrain from DB history."
-                )
-                await asyncio.get_running_loop().run_in_executor(
-                    None, train_from_db_and_persist
-                )
-                logging.info("Auto-train: finished predictive retrain.")
-            else:
-                logging.debug("Auto-train: already ran today; skipping.")
-        except Exception as exc:
-            logging.exception("Auto-train loop failed: %s", exc)
-
-        # Sleep roughly a day; adjust if you want more frequent updates
-        await asyncio.sleep(24 * 60 * 60)
-
-
 @app.on_event("startup")
 async def _startup():
-    load_models_from_disk()
-    app.state.predictive_task = asyncio.create_task(_predictive_auto_train_loop())
+    model_registry.ensure_loaded()
+    # Scheduled retraining; only the elected leader process trains
+    app.state.predictive_task = asyncio.create_task(train_scheduler.run_forever())
 
 
 @app.on_event("shutdown")
@@ -77,6 +42,9 @@ async def _shutdown():
     task = getattr(app.state, "predictive_task", None)
     if task:
         task.cancel()
+    train_scheduler.stop()
+    dispose_pools()
+    await close_async_pool()
 
 
 # ----------------------------------------------------------
@@ -121,6 +89,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Attribute SQL timings (utils/query_stats) to the endpoint that issued them
+app.add_middleware(QueryContextMiddleware)
+
 
 # ----------------------------------------------------------
 # Routers
@@ -136,3 +107,4 @@ app.include_router(dashboard_router)
 app.include_router(reports_router)
 app.include_router(activity_logs_router)
 app.include_router(stockcard_router)
+app.include_router(debug_router)
@@ -0,0 +1,38 @@
+-- 0001: indexes for the predicates the routers filter / join / sort on.
+--
+-- Each CREATE INDEX is skipped by scripts/migrate.py when the table already
+-- has an index with the same name or one whose leading columns cover it
+-- (e.g. an FK index created by hand in phpMyAdmin).
+
+-- `order` ---------------------------------------------------------------
+-- Date-range reports, dashboards and history loads; total_price makes
+-- /dashboard/sales an index-only scan. order_id (PK) is implicit in InnoDB.
+CREATE INDEX idx_order_txdate_total ON `order` (transaction_date, total_price);
+
+-- add_or uniqueness check and "OR_number IS NOT NULL" dashboard filters.
+CREATE INDEX idx_order_or_number ON `order` (OR_number, total_price);
+
+-- order_line ------------------------------------------------------------
+-- order -> lines (add_or, set_joborder_date, EXISTS Souvenir checks, reports).
+CREATE INDEX idx_order_line_order_item ON order_line (order_id, item_id, quantity);
+
+-- item -> lines (stock card, fetch_daily_series, top items).
+CREATE INDEX idx_order_line_item_order ON order_line (item_id, order_id, quantity);
+
+-- item ------------------------------------------------------------------
+-- Souvenir lookups (category = 'Souvenir').
+CREATE INDEX idx_item_category ON item (category);
+
+-- Catalog (ORDER BY name) as an index-only scan; history GROUP BY i.name.
+CREATE INDEX idx_item_name_catalog ON item (name, price, stock_quantity);
+
+-- activity_logs ---------------------------------------------------------
+-- Paginated list: ORDER BY timestamp DESC, date range filters.
+CREATE INDEX idx_activity_logs_timestamp ON activity_logs (timestamp);
+
+-- Action filter + newest-first (list page and dashboard highlights).
+CREATE INDEX idx_activity_logs_action_ts ON activity_logs (action, timestamp);
+
+-- user ------------------------------------------------------------------
+-- Login looks users up by email.
+CREATE INDEX idx_user_email ON `user` (email);
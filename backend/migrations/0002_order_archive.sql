@@ -0,0 +1,24 @@
+-- 0002: archive tables for closed years of `order` / order_line.
+--
+-- scripts/archive_orders.py moves finalized orders of closed years out of the
+-- hot tables into these copies. order_archive_state.archived_before is the
+-- boundary: every finalized order dated before it lives in the archive, so
+-- reads whose date range starts on/after it never touch the archive
+-- (services/order_archive.py).
+--
+-- Per-table archives rather than PARTITION BY RANGE (transaction_date):
+-- MySQL partitioning needs transaction_date in every unique key (order_id is
+-- the primary key) and does not allow the order_line -> `order` foreign key.
+
+CREATE TABLE IF NOT EXISTS order_archive LIKE `order`;
+
+CREATE TABLE IF NOT EXISTS order_line_archive LIKE order_line;
+
+CREATE TABLE IF NOT EXISTS order_archive_state (
+    id               TINYINT  NOT NULL PRIMARY KEY,
+    archived_before  DATE     NULL,
+    updated_at       DATETIME NULL
+);
+
+INSERT IGNORE INTO order_archive_state (id, archived_before, updated_at)
+VALUES (1, NULL, NULL);
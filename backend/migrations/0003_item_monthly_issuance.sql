@@ -0,0 +1,36 @@
+-- 0003: monthly issuance rollup per item, read by the predictive module.
+--
+-- One row per (item_id, month) with the quantity of every finalized order
+-- line (transaction_date set) in that month. Kept current by add_or,
+-- set_joborder_date and delete_order (services/issuance_rollup.py);
+-- scripts/rebuild_issuance_rollup.py recomputes it from the order lines.
+-- updated_at is the watermark services/history_cache.py reads changes by.
+
+CREATE TABLE IF NOT EXISTS item_monthly_issuance (
+    item_id     INT      NOT NULL,
+    month       DATE     NOT NULL,
+    quantity    BIGINT   NOT NULL DEFAULT 0,
+    updated_at  DATETIME NOT NULL,
+    PRIMARY KEY (item_id, month)
+);
+
+CREATE INDEX idx_item_monthly_issuance_updated ON item_monthly_issuance (updated_at);
+
+-- Initial fill from the hot tables and the archive (0002)
+INSERT INTO item_monthly_issuance (item_id, month, quantity, updated_at)
+SELECT ol.item_id,
+       DATE_FORMAT(o.transaction_date, '%Y-%m-01'),
+       SUM(ol.quantity),
+       NOW()
+FROM (
+    SELECT order_id, item_id, quantity FROM order_line
+    UNION ALL
+    SELECT order_id, item_id, quantity FROM order_line_archive
+) ol
+JOIN (
+    SELECT order_id, transaction_date FROM `order`
+    UNION ALL
+    SELECT order_id, transaction_date FROM order_archive
+) o ON o.order_id = ol.order_id
+WHERE o.transaction_date IS NOT NULL
+GROUP BY ol.item_id, DATE_FORMAT(o.transaction_date, '%Y-%m-01');
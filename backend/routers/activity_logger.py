@@ -1,17 +1,31 @@
 # backend/routers/activity_logger.py
 import logging
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
 
 from mysql.connector import IntegrityError
-from db import get_db
+from db import get_db, prepared_cursor
 
+INSERT_ACTIVITY_SQL = """
+    INSERT INTO activity_logs (user_id, action, description, timestamp)
+    VALUES (%s, %s, %s, %s)
+"""
 
-def log_activity(user_id: Any, action: str, description: str) -> None:
+
+def log_activity(
+    user_id: Any,
+    action: str,
+    description: str,
+    conn: Optional[Any] = None,
+    commit: bool = True,
+) -> None:
     """
     Insert a row into activity_logs.
 
     - Safely converts user_id to int or None.
+    - Pass the request's connection (get_db_conn) as `conn` to reuse it
+      instead of checking out a second one. With commit=False the row joins
+      the caller's open transaction and is committed with it.
     - If FK/NOT NULL constraints fail, we log the error but DO NOT crash the main request.
     - The ActivityLog frontend treats:
         - user_id == None or 0 => "System"
@@ -23,19 +37,18 @@ def log_activity(user_id: Any, action: str, description: str) -> None:
     except (TypeError, ValueError):
         uid = None
 
-    conn = None
+    owns_conn = conn is None
     cur = None
     try:
-        conn = get_db()
-        cur = conn.cursor()
+        if owns_conn:
+            conn = get_db()
+        cur = prepared_cursor(conn, INSERT_ACTIVITY_SQL)
         cur.execute(
-            """
-            INSERT INTO activity_logs (user_id, action, description, timestamp)
-            VALUES (%s, %s, %s, %s)
-            """,
+            INSERT_ACTIVITY_SQL,
             (uid, action, description, datetime.now()),
         )
-        conn.commit()
+        if commit:
+            conn.commit()
 
     except IntegrityError as e:
         # Most likely: FK or NOT NULL violation on user_id
@@ -50,7 +63,7 @@ def log_activity(user_id: Any, action: str, description: str) -> None:
                 cur.close()
             except Exception:
                 pass
-        if conn is not None:
+        if owns_conn and conn is not None:
             try:
                 conn.close()
             except Exception:
@@ -1,5 +1,5 @@
 # backend/routers/activity_logs.py
-from datetime import date
+from datetime import date, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
@@ -22,7 +22,7 @@ def list_activity_logs(
     """
     Paginated + filterable list of activity logs for ActivityLog.jsx.
     """
-    conn = get_db()
+    conn = get_db(readonly=True)
     cur = conn.cursor(dictionary=True)
 
     try:
@@ -45,13 +45,14 @@ def list_activity_logs(
             where.append("al.description LIKE %s")
             params.append(f"%{search}%")
 
+        # Plain ranges on al.timestamp (not DATE(...)) so the index is usable
         if date_from:
-            where.append("DATE(al.timestamp) >= %s")
+            where.append("al.timestamp >= %s")
             params.append(date_from)
 
         if date_to:
-            where.append("DATE(al.timestamp) <= %s")
-            params.append(date_to)
+            where.append("al.timestamp < %s")
+            params.append(date_to + timedelta(days=1))
 
         where_sql = f"WHERE {' AND '.join(where)}" if where else ""
 
@@ -111,7 +112,7 @@ def list_highlight_activity_logs(
     - Inventory create/update/delete where description starts with:
       "Added inventory item%", "Deleted inventory item%", "Updated inventory item%"
     """
-    conn = get_db()
+    conn = get_db(readonly=True)
     cur = conn.cursor(dictionary=True)
 
     try:
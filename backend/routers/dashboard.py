@@ -1,9 +1,25 @@
+from datetime import date
+
 from fastapi import APIRouter, HTTPException
 from db import get_db
+from services.order_archive import order_tables
 
 router = APIRouter(tags=["Dashboard"])
 
 
+def _period_range(year: int, month: int | None = None):
+    """
+    [start, end) dates for a year or a single month. Filtering on a range
+    (instead of YEAR()/MONTH()) lets MySQL use the transaction_date index.
+    """
+    if month:
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    else:
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    return start, end
+
+
 @router.get("/dashboard/top-items")
 def get_top_items(year: int, month: int | None = None):
     """
@@ -11,32 +27,22 @@ def get_top_items(year: int, month: int | None = None):
     If month is None → yearly
     If month is provided → monthly
     """
-    conn = get_db()
+    conn = get_db(readonly=True)
     cursor = conn.cursor(dictionary=True)
 
-    if month:
-        cursor.execute("""
-            SELECT i.name, SUM(ol.quantity) AS total_sold
-            FROM order_line ol
-            JOIN `order` o ON o.order_id = ol.order_id
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-              AND MONTH(o.transaction_date) = %s
-            GROUP BY i.item_id
-            ORDER BY total_sold DESC
-            LIMIT 3
-        """, (year, month))
-    else:
-        cursor.execute("""
-            SELECT i.name, SUM(ol.quantity) AS total_sold
-            FROM order_line ol
-            JOIN `order` o ON o.order_id = ol.order_id
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-            GROUP BY i.item_id
-            ORDER BY total_sold DESC
-            LIMIT 3
-        """, (year,))
+    start, end = _period_range(year, month)
+    orders, lines = order_tables(start)
+    cursor.execute(f"""
+        SELECT i.name, SUM(ol.quantity) AS total_sold
+        FROM {lines} ol
+        JOIN {orders} o ON o.order_id = ol.order_id
+        JOIN item i ON i.item_id = ol.item_id
+        WHERE o.transaction_date >= %s
+          AND o.transaction_date < %s
+        GROUP BY i.item_id
+        ORDER BY total_sold DESC
+        LIMIT 3
+    """, (start, end))
 
     rows = cursor.fetchall()
     cursor.close()
@@ -49,17 +55,20 @@ def get_sales(year: int):
     """
     Returns monthly sales totals for given year.
     """
-    conn = get_db()
+    conn = get_db(readonly=True)
     cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("""
+    start, end = _period_range(year)
+    orders, _ = order_tables(start)
+    cursor.execute(f"""
         SELECT MONTH(transaction_date) AS month, 
                SUM(total_price) AS total
-        FROM `order`
-        WHERE YEAR(transaction_date) = %s
+        FROM {orders} o
+        WHERE transaction_date >= %s
+          AND transaction_date < %s
         GROUP BY MONTH(transaction_date)
         ORDER BY MONTH(transaction_date)
-    """, (year,))
+    """, (start, end))
 
     rows = cursor.fetchall()
     cursor.close()
@@ -0,0 +1,46 @@
+# backend/routers/debug.py
+from fastapi import APIRouter, Depends, Query
+
+from db import get_pool_stats, get_tx_stats
+from security.deps import require_roles
+from utils import query_stats
+
+# Internals (SQL text, pool sizing): admins only
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(require_roles(["admin"]))],
+)
+
+
+@router.get("/db-pool")
+def db_pool_stats():
+    """
+    Connection pool counters (idle / checked out / created / recycled ...)
+    for the primary and, when configured, the read replica and its lag guard.
+    """
+    return get_pool_stats()
+
+
+@router.get("/tx-retries")
+def tx_retries():
+    """
+    Per-transaction retry counters (calls / retries / deadlocks /
+    lock_wait_timeouts / gave_up) for add_or, set_joborder_date, create_sale.
+    """
+    return get_tx_stats()
+
+
+@router.get("/slow-queries")
+def slow_queries(limit: int = Query(20, ge=1, le=500)):
+    """
+    Slowest statements, recent statements over DB_SLOW_QUERY_MS, and
+    per-SQL totals (which inline query costs the most overall).
+    """
+    return query_stats.snapshot(limit)
+
+
+@router.delete("/slow-queries")
+def reset_slow_queries():
+    query_stats.reset()
+    return {"status": "ok"}
@@ -1,10 +1,12 @@
 # backend/routers/items.py
 from typing import Optional
 
-from fastapi import APIRouter, Form, Cookie, HTTPException
+from fastapi import APIRouter, Form, Cookie, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 import mysql.connector
 
-from db import get_db
+from db import get_db, get_db_conn
+from db_async import has_async_db, acquire, dict_cursor
 from security.jwt_tools import verify_token
 from security.deps import COOKIE_NAME_AT
 from routers.activity_logger import log_activity
@@ -24,15 +26,29 @@ def _actor_id_from_cookie(access_token: str | None) -> Optional[int]:
     return None
 
 
-@router.get("/")
-def get_items():
+ITEMS_SQL = "SELECT * FROM item"
+
+
+def get_items_sync():
     conn = get_db()
     cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM item")
-    items = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return items
+    try:
+        cursor.execute(ITEMS_SQL)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@router.get("/")
+async def get_items():
+    if not has_async_db():
+        return await run_in_threadpool(get_items_sync)
+
+    async with acquire() as conn:
+        async with dict_cursor(conn) as cursor:
+            await cursor.execute(ITEMS_SQL)
+            return await cursor.fetchall()
 
 
 @router.post("/")
@@ -44,8 +60,8 @@ def add_item(
     stock_quantity: int = Form(...),
     reorder_level: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_db_conn),
 ):
-    conn = get_db()
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -55,21 +71,22 @@ def add_item(
             """,
             (name, unit, category, price, stock_quantity, reorder_level),
         )
-        conn.commit()
         item_id = cursor.lastrowid
+
+        actor_id = _actor_id_from_cookie(access_token)
+        log_activity(
+            actor_id,
+            "Create",
+            f"Added inventory item '{name}' (item_id={item_id}), category={category}, stock={stock_quantity}.",
+            conn=conn,
+            commit=False,
+        )
+        conn.commit()
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
-
-    actor_id = _actor_id_from_cookie(access_token)
-    log_activity(
-        actor_id,
-        "Create",
-        f"Added inventory item '{name}' (item_id={item_id}), category={category}, stock={stock_quantity}.",
-    )
 
     return {"message": "Item added successfully", "item_id": item_id}
 
@@ -84,6 +101,7 @@ def update_item(
     stock_quantity: int = Form(...),
     reorder_level: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_db_conn),
 ):
     """
     Update item details.
@@ -91,8 +109,9 @@ def update_item(
     Logs:
     - If price changed:  "… price changed from X to Y …"
     - Otherwise:         generic update message.
+
+    The update and its activity row are committed in one transaction.
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     try:
         # 🔹 1) Get existing item first (to know old price, etc.)
@@ -119,36 +138,37 @@ def update_item(
             """,
             (name, unit, category, price, stock_quantity, reorder_level, item_id),
         )
+
+        # 🔹 3) Build a nice log message
+        old_price_str = str(old_price)
+        new_price_str = str(price)
+
+        if float(old_price) != float(price):
+            desc = (
+                f"Updated inventory item '{name}' (item_id={item_id}), "
+                f"price changed from {old_price_str} to {new_price_str}, "
+                f"category={category}, stock={stock_quantity}."
+            )
+        else:
+            desc = (
+                f"Updated inventory item '{name}' (item_id={item_id}), "
+                f"category={category}, stock={stock_quantity}."
+            )
+
+        actor_id = _actor_id_from_cookie(access_token)
+        log_activity(
+            actor_id,
+            "Update",
+            desc,
+            conn=conn,
+            commit=False,
+        )
         conn.commit()
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
-
-    # 🔹 3) Build a nice log message
-    old_price_str = str(old_price)
-    new_price_str = str(price)
-
-    if float(old_price) != float(price):
-        desc = (
-            f"Updated inventory item '{name}' (item_id={item_id}), "
-            f"price changed from {old_price_str} to {new_price_str}, "
-            f"category={category}, stock={stock_quantity}."
-        )
-    else:
-        desc = (
-            f"Updated inventory item '{name}' (item_id={item_id}), "
-            f"category={category}, stock={stock_quantity}."
-        )
-
-    actor_id = _actor_id_from_cookie(access_token)
-    log_activity(
-        actor_id,
-        "Update",
-        desc,
-    )
 
     return {"message": "Item updated successfully"}
 
@@ -157,8 +177,8 @@ def update_item(
 def delete_item(
     item_id: int,
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_db_conn),
 ):
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute("SELECT name FROM item WHERE item_id=%s", (item_id,))
@@ -167,20 +187,21 @@ def delete_item(
             raise HTTPException(status_code=404, detail="Item not found")
 
         cursor.execute("DELETE FROM item WHERE item_id=%s", (item_id,))
+
+        actor_id = _actor_id_from_cookie(access_token)
+        log_activity(
+            actor_id,
+            "Delete",
+            f"Deleted inventory item '{row['name']}' (item_id={item_id}).",
+            conn=conn,
+            commit=False,
+        )
         conn.commit()
     except mysql.connector.Error:
         conn.rollback()
         raise
     finally:
         cursor.close()
-        conn.close()
-
-    actor_id = _actor_id_from_cookie(access_token)
-    log_activity(
-        actor_id,
-        "Delete",
-        f"Deleted inventory item '{row['name']}' (item_id={item_id}).",
-    )
 
     return {"message": "Item deleted successfully"}
 
@@ -190,12 +211,12 @@ def add_stock(
     item_id: int,
     added_qty: int = Form(...),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_db_conn),
 ):
     """
     Increment stock_quantity for an existing item.
     This is for 'add stock' operations (e.g., new delivery).
     """
-    conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     try:
@@ -218,6 +239,16 @@ def add_stock(
             """,
             (new_stock, item_id),
         )
+
+        actor_id = _actor_id_from_cookie(access_token)
+        log_activity(
+            actor_id,
+            "Update",
+            f"Updated inventory item stock for '{row['name']}' (item_id={item_id}), "
+            f"change=+{added_qty}, new_qty={new_stock}.",
+            conn=conn,
+            commit=False,
+        )
         conn.commit()
 
     except mysql.connector.Error:
@@ -225,15 +256,6 @@ def add_stock(
         raise
     finally:
         cursor.close()
-        conn.close()
-
-    actor_id = _actor_id_from_cookie(access_token)
-    log_activity(
-        actor_id,
-        "Update",
-        f"Updated inventory item stock for '{row['name']}' (item_id={item_id}), "
-        f"change=+{added_qty}, new_qty={new_stock}.",
-    )
 
     return {
         "message": "Stock updated successfully",
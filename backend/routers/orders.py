@@ -1,9 +1,21 @@
 from datetime import date
+from typing import Optional
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import mysql.connector
 
-from db import get_db
+from db import get_db, prepared_cursor, is_retryable_error, retry_transaction
+from db_async import (
+    has_async_db,
+    acquire,
+    dict_cursor,
+    AsyncDBError,
+    retry_transaction_async,
+)
 from schemas import ORPayload
+from services.inventory_locks import lock_items, lock_items_async, with_locked_stock
+from services.issuance_rollup import record_order, record_order_async
+from services.order_archive import HOT_LINES, HOT_ORDERS, order_tables, reaches_archive
 
 router = APIRouter(tags=["Orders"])
 
@@ -29,18 +41,23 @@ def _month_range(year: int, month: int):
 #  NORMAL POS TRANSACTIONS (EXCLUDES SOUVENIR / JOB ORDER TRANSACTIONS)
 # =====================================================================
 @router.get("/transactions")
-def get_transactions():
+def get_transactions(include_archived: bool = True, start: Optional[date] = None):
     """
     Return all transactions EXCEPT those that contain any item whose
     category = 'Souvenir'.
 
     Normal POS: these rely on OR_number to set transaction_date.
+
+    Closed years moved to the archive are listed too (include_archived=false
+    leaves them out). start limits the list to orders dated on/after it,
+    plus the pending ones, and only reads the archive when it has to.
     """
+    orders, lines = order_tables(start) if include_archived else (HOT_ORDERS, HOT_LINES)
     conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute(
-        """
+        f"""
         SELECT
             o.order_id,
             o.OR_number,
@@ -48,17 +65,19 @@ def get_transactions():
             o.total_price,
             o.transaction_date,
             u.username
-        FROM `order` o
+        FROM {orders} o
         JOIN `user` u ON o.user_id = u.user_id
         WHERE NOT EXISTS (
             SELECT 1
-            FROM order_line ol
+            FROM {lines} ol
             JOIN item i ON i.item_id = ol.item_id
             WHERE ol.order_id = o.order_id
               AND i.category = 'Souvenir'
         )
+          AND (%s IS NULL OR o.transaction_date IS NULL OR o.transaction_date >= %s)
         ORDER BY o.transaction_date DESC, o.order_id DESC
-        """
+        """,
+        (start, start),
     )
     transactions = cursor.fetchall()
 
@@ -71,35 +90,42 @@ def get_transactions():
 #  JOB ORDER TRANSACTIONS (ONLY ORDERS WITH SOUVENIR ITEMS)
 # =====================================================================
 @router.get("/job-orders/transactions")
-def get_job_order_transactions():
+def get_job_order_transactions(include_archived: bool = True, start: Optional[date] = None):
     """
     Return ONLY transactions that contain at least one item whose
     category = 'Souvenir' (regardless of OR_number).
 
     For these, transaction_date will be set by /orders/{id}/set_joborder_date.
+
+    Closed years moved to the archive are listed too (include_archived=false
+    leaves them out). start limits the list to orders dated on/after it,
+    plus the pending ones, and only reads the archive when it has to.
     """
+    orders, lines = order_tables(start) if include_archived else (HOT_ORDERS, HOT_LINES)
     conn = get_db()
     cursor = conn.cursor(dictionary=True)
 
     cursor.execute(
-        """
+        f"""
         SELECT
             o.order_id,
             o.customer_name,
             o.total_price,
             o.transaction_date,
             u.username
-        FROM `order` o
+        FROM {orders} o
         JOIN `user` u ON o.user_id = u.user_id
         WHERE EXISTS (
             SELECT 1
-            FROM order_line ol
+            FROM {lines} ol
             JOIN item i ON i.item_id = ol.item_id
             WHERE ol.order_id = o.order_id
               AND i.category = 'Souvenir'
         )
+          AND (%s IS NULL OR o.transaction_date IS NULL OR o.transaction_date >= %s)
         ORDER BY o.transaction_date DESC, o.order_id DESC
-        """
+        """,
+        (start, start),
     )
     transactions = cursor.fetchall()
 
@@ -109,26 +135,116 @@ def get_job_order_transactions():
 
 
 # =====================================================================
-#  NORMAL POS: ADD OR (NON-SOUVENIR ORDERS ONLY)
+#  SQL shared by the sync and async finalize implementations
 # =====================================================================
-@router.post("/orders/{order_id}/add_or")
-def add_or(order_id: int, payload: ORPayload):
+OR_DUPLICATE_SQL = """
+    SELECT order_id
+    FROM `order`
+    WHERE OR_number = %s
+      AND order_id <> %s
+"""
+
+# OR numbers stay unique across archived years too (only checked once
+# something has been archived).
+OR_DUPLICATE_ARCHIVE_SQL = "SELECT order_id FROM order_archive WHERE OR_number = %s"
+
+LOCK_ORDER_SQL = "SELECT * FROM `order` WHERE order_id = %s FOR UPDATE"
+
+LOCK_ORDER_DATE_SQL = """
+    SELECT order_id, transaction_date
+    FROM `order`
+    WHERE order_id = %s
+    FOR UPDATE
+"""
+
+SOUVENIR_COUNT_SQL = """
+    SELECT COUNT(*) AS cnt
+    FROM order_line ol
+    JOIN item i ON i.item_id = ol.item_id
+    WHERE ol.order_id = %s
+      AND i.category = 'Souvenir'
+"""
+
+# Order lines are read without FOR UPDATE: the order row lock already
+# serializes finalization of one order, and the item rows are then locked
+# through services.inventory_locks in ascending item_id order.
+ORDER_LINES_SQL = """
+    SELECT ol.item_id, ol.quantity
+    FROM order_line ol
+    WHERE ol.order_id = %s
+    ORDER BY ol.item_id, ol.order_line_id
+"""
+
+SOUVENIR_LINES_SQL = """
+    SELECT ol.item_id, ol.quantity
+    FROM order_line ol
+    JOIN item i ON i.item_id = ol.item_id
+    WHERE ol.order_id = %s
+      AND i.category = 'Souvenir'
+    ORDER BY ol.item_id, ol.order_line_id
+"""
+
+DEDUCT_STOCK_SQL = """
+    UPDATE item
+    SET stock_quantity = stock_quantity - %s
+    WHERE item_id = %s
+"""
+
+SET_OR_SQL = """
+    UPDATE `order`
+    SET OR_number = %s,
+        transaction_date = NOW()
+    WHERE order_id = %s
+"""
+
+SET_JOBORDER_DATE_SQL = """
+    UPDATE `order`
+    SET transaction_date = COALESCE(transaction_date, NOW())
+    WHERE order_id = %s
+"""
+
+ORDER_SUMMARY_SQL = """
+    SELECT
+        o.order_id,
+        o.OR_number,
+        o.customer_name,
+        o.total_price,
+        o.transaction_date,
+        u.username
+    FROM `order` o
+    JOIN `user` u ON o.user_id = u.user_id
+    WHERE o.order_id = %s
+"""
+
+
+def _deduct_stock(conn, lines) -> None:
     """
-    Normal POS flow (NON–Souvenir orders):
+    Run the stock UPDATE for each line through the connection's prepared cursor.
+    """
+    cur = prepared_cursor(conn, DEDUCT_STOCK_SQL)
+    try:
+        for line in lines:
+            cur.execute(DEDUCT_STOCK_SQL, (line["quantity"], line["item_id"]))
+    finally:
+        cur.close()
 
-    - OR_number must be unique across orders (except this order)
-      * if duplicate -> 400 "OR is not unique"
-    - If OR was previously NULL AND the order is NOT a Souvenir order:
-      * validate stock
-      * deduct item.stock_quantity based on order_line
 
-    - Always:
-      * update OR_number
-      * set transaction_date = NOW()
+def _check_stock(lines) -> None:
+    for line in lines:
+        if line["stock_quantity"] < line["quantity"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Insufficient stock for item {line['item_id']}.",
+            )
 
-    NOTE:
-    - Orders that contain 'Souvenir' items will NOT have stock deducted here;
-      they are handled in set_joborder_date instead.
+
+# =====================================================================
+#  NORMAL POS: ADD OR (NON-SOUVENIR ORDERS ONLY)
+# =====================================================================
+@retry_transaction("add_or")
+def add_or_sync(order_id: int, payload: ORPayload):
+    """
+    Blocking implementation of POST /orders/{order_id}/add_or (see add_or).
     """
     conn = get_db()
     cursor = conn.cursor(dictionary=True)
@@ -138,24 +254,16 @@ def add_or(order_id: int, payload: ORPayload):
 
         # 0) Enforce OR uniqueness (only if OR_number is provided)
         if payload.OR_number:
-            cursor.execute(
-                """
-                SELECT order_id
-                FROM `order`
-                WHERE OR_number = %s
-                  AND order_id <> %s
-                """,
-                (payload.OR_number, order_id),
-            )
+            cursor.execute(OR_DUPLICATE_SQL, (payload.OR_number, order_id))
             dup = cursor.fetchone()
+            if not dup and reaches_archive():
+                cursor.execute(OR_DUPLICATE_ARCHIVE_SQL, (payload.OR_number,))
+                dup = cursor.fetchone()
             if dup:
                 raise HTTPException(status_code=400, detail="OR is not unique")
 
         # 1) Lock order row
-        cursor.execute(
-            "SELECT * FROM `order` WHERE order_id = %s FOR UPDATE",
-            (order_id,),
-        )
+        cursor.execute(LOCK_ORDER_SQL, (order_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Order not found")
@@ -163,86 +271,33 @@ def add_or(order_id: int, payload: ORPayload):
         already_has_or = row.get("OR_number") is not None
 
         # 1b) Check if this order is a Souvenir order (has any Souvenir item)
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM order_line ol
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE ol.order_id = %s
-              AND i.category = 'Souvenir'
-            """,
-            (order_id,),
-        )
+        cursor.execute(SOUVENIR_COUNT_SQL, (order_id,))
         job_info = cursor.fetchone()
         is_souvenir_order = bool(job_info and job_info["cnt"] > 0)
 
-        # 2) Get order lines + item stock, lock item rows
-        cursor.execute(
-            """
-            SELECT
-                ol.item_id,
-                ol.quantity,
-                i.stock_quantity
-            FROM order_line ol
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE ol.order_id = %s
-            FOR UPDATE
-            """,
-            (order_id,),
-        )
+        # 2) Get order lines, lock their item rows (ascending item_id)
+        cursor.execute(ORDER_LINES_SQL, (order_id,))
         lines = cursor.fetchall()
+        lines = with_locked_stock(lines, lock_items(conn, (l["item_id"] for l in lines)))
 
         # 3) If OR was NULL before AND this is NOT a Souvenir order,
         #    deduct stock now (normal POS behavior).
         if not already_has_or and not is_souvenir_order:
-            # Validate stock
-            for line in lines:
-                if line["stock_quantity"] < line["quantity"]:
-                    raise HTTPException(
-                        status_code=409,
-                        detail=f"Insufficient stock for item {line['item_id']}.",
-                    )
-
-            # Deduct stock
-            for line in lines:
-                cursor.execute(
-                    """
-                    UPDATE item
-                    SET stock_quantity = stock_quantity - %s
-                    WHERE item_id = %s
-                    """,
-                    (line["quantity"], line["item_id"]),
-                )
+            _check_stock(lines)
+            _deduct_stock(conn, lines)
 
         # 4) Update OR_number and transaction_date
-        cursor.execute(
-            """
-            UPDATE `order`
-            SET OR_number = %s,
-                transaction_date = NOW()
-            WHERE order_id = %s
-            """,
-            (payload.OR_number, order_id),
-        )
+        cursor.execute(SET_OR_SQL, (payload.OR_number, order_id))
+
+        # 4b) Monthly issuance rollup: move the order to its new month
+        if row.get("transaction_date") is not None:
+            record_order(conn, order_id, sign=-1, when=row["transaction_date"])
+        record_order(conn, order_id)
 
         conn.commit()
 
         # 5) Return updated order summary
-        cursor.execute(
-            """
-            SELECT
-                o.order_id,
-                o.OR_number,
-                o.customer_name,
-                o.total_price,
-                o.transaction_date,
-                u.username
-            FROM `order` o
-            JOIN `user` u ON o.user_id = u.user_id
-            WHERE o.order_id = %s
-            """,
-            (order_id,),
-        )
+        cursor.execute(ORDER_SUMMARY_SQL, (order_id,))
         updated = cursor.fetchone()
 
         return {"message": "OR updated", "order": updated}
@@ -252,28 +307,118 @@ def add_or(order_id: int, payload: ORPayload):
         raise
     except mysql.connector.Error as err:
         conn.rollback()
+        if is_retryable_error(err):
+            raise  # deadlock / lock wait timeout -> retry_transaction
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
         conn.close()
 
 
+@router.post("/orders/{order_id}/add_or")
+async def add_or(order_id: int, payload: ORPayload):
+    """
+    Normal POS flow (NON–Souvenir orders):
+
+    - OR_number must be unique across orders (except this order)
+      * if duplicate -> 400 "OR is not unique"
+    - If OR was previously NULL AND the order is NOT a Souvenir order:
+      * validate stock
+      * deduct item.stock_quantity based on order_line
+
+    - Always:
+      * update OR_number
+      * set transaction_date = NOW()
+
+    NOTE:
+    - Orders that contain 'Souvenir' items will NOT have stock deducted here;
+      they are handled in set_joborder_date instead.
+    """
+    if not has_async_db():
+        return await run_in_threadpool(add_or_sync, order_id, payload)
+    return await _add_or_async(order_id, payload)
+
+
+@retry_transaction_async("add_or")
+async def _add_or_async(order_id: int, payload: ORPayload):
+    async with acquire() as conn:
+        async with dict_cursor(conn) as cursor:
+            try:
+                await conn.begin()
+
+                # 0) Enforce OR uniqueness (only if OR_number is provided)
+                if payload.OR_number:
+                    await cursor.execute(OR_DUPLICATE_SQL, (payload.OR_number, order_id))
+                    dup = await cursor.fetchone()
+                    # reaches_archive() may query the boundary: off the event loop
+                    if not dup and await run_in_threadpool(reaches_archive):
+                        await cursor.execute(OR_DUPLICATE_ARCHIVE_SQL, (payload.OR_number,))
+                        dup = await cursor.fetchone()
+                    if dup:
+                        raise HTTPException(status_code=400, detail="OR is not unique")
+
+                # 1) Lock order row
+                await cursor.execute(LOCK_ORDER_SQL, (order_id,))
+                row = await cursor.fetchone()
+                if not row:
+                    raise HTTPException(status_code=404, detail="Order not found")
+
+                already_has_or = row.get("OR_number") is not None
+
+                # 1b) Souvenir order?
+                await cursor.execute(SOUVENIR_COUNT_SQL, (order_id,))
+                job_info = await cursor.fetchone()
+                is_souvenir_order = bool(job_info and job_info["cnt"] > 0)
+
+                # 2) Get order lines, lock their item rows (ascending item_id)
+                await cursor.execute(ORDER_LINES_SQL, (order_id,))
+                lines = await cursor.fetchall()
+                locked = await lock_items_async(cursor, (l["item_id"] for l in lines))
+                lines = with_locked_stock(lines, locked)
+
+                # 3) First OR on a normal order -> deduct stock
+                if not already_has_or and not is_souvenir_order:
+                    _check_stock(lines)
+                    for line in lines:
+                        await cursor.execute(
+                            DEDUCT_STOCK_SQL, (line["quantity"], line["item_id"])
+                        )
+
+                # 4) Update OR_number and transaction_date
+                await cursor.execute(SET_OR_SQL, (payload.OR_number, order_id))
+
+                # 4b) Monthly issuance rollup: move the order to its new month
+                if row.get("transaction_date") is not None:
+                    await record_order_async(
+                        cursor, order_id, sign=-1, when=row["transaction_date"]
+                    )
+                await record_order_async(cursor, order_id)
+
+                await conn.commit()
+
+                # 5) Return updated order summary
+                await cursor.execute(ORDER_SUMMARY_SQL, (order_id,))
+                updated = await cursor.fetchone()
+
+                return {"message": "OR updated", "order": updated}
+
+            except HTTPException:
+                await conn.rollback()
+                raise
+            except AsyncDBError as err:
+                await conn.rollback()
+                if is_retryable_error(err):
+                    raise
+                raise HTTPException(status_code=500, detail=str(err))
+
+
 # =====================================================================
 #  JOB ORDER FINALIZE: SOUVENIR ONLY
 # =====================================================================
-@router.post("/orders/{order_id}/set_joborder_date")
-def set_joborder_date(order_id: int):
+@retry_transaction("set_joborder_date")
+def set_joborder_date_sync(order_id: int):
     """
-    SOUVENIR FLOW ONLY (JOB ORDER):
-
-    - Applies ONLY if the order has at least one item with category = 'Souvenir'
-    - Set transaction_date = NOW() IF it's currently NULL
-    - Does NOT require OR_number
-    - When transaction_date was NULL (first time):
-        * validate stock for Souvenir items
-        * deduct stock_quantity for those items
-
-    Called immediately after Job Order "Save & Print".
+    Blocking implementation of POST /orders/{order_id}/set_joborder_date.
     """
     conn = get_db()
     cursor = conn.cursor(dictionary=True)
@@ -282,15 +427,7 @@ def set_joborder_date(order_id: int):
         conn.start_transaction()
 
         # 1) Lock order row to ensure it exists
-        cursor.execute(
-            """
-            SELECT order_id, transaction_date
-            FROM `order`
-            WHERE order_id = %s
-            FOR UPDATE
-            """,
-            (order_id,),
-        )
+        cursor.execute(LOCK_ORDER_DATE_SQL, (order_id,))
         row = cursor.fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Order not found")
@@ -298,16 +435,7 @@ def set_joborder_date(order_id: int):
         had_date_before = row["transaction_date"] is not None
 
         # 2) Check it has at least one 'Souvenir' item
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM order_line ol
-            JOIN item i ON i.item_id = ol.item_id
-            WHERE ol.order_id = %s
-              AND i.category = 'Souvenir'
-            """,
-            (order_id,),
-        )
+        cursor.execute(SOUVENIR_COUNT_SQL, (order_id,))
         info = cursor.fetchone()
         if not info or info["cnt"] == 0:
             raise HTTPException(
@@ -318,69 +446,26 @@ def set_joborder_date(order_id: int):
         # 3) If this is the FIRST time we finalize this Souvenir Order
         #    (transaction_date was NULL), deduct stock for Souvenir items.
         if not had_date_before:
-            cursor.execute(
-                """
-                SELECT
-                    ol.item_id,
-                    ol.quantity,
-                    i.stock_quantity
-                FROM order_line ol
-                JOIN item i ON i.item_id = ol.item_id
-                WHERE ol.order_id = %s
-                  AND i.category = 'Souvenir'
-                FOR UPDATE
-                """,
-                (order_id,),
-            )
+            cursor.execute(SOUVENIR_LINES_SQL, (order_id,))
             job_lines = cursor.fetchall()
+            job_lines = with_locked_stock(
+                job_lines, lock_items(conn, (l["item_id"] for l in job_lines))
+            )
 
-            # Validate stock
-            for line in job_lines:
-                if line["stock_quantity"] < line["quantity"]:
-                    raise HTTPException(
-                        status_code=409,
-                        detail=f"Insufficient stock for item {line['item_id']}.",
-                    )
-
-            # Deduct stock
-            for line in job_lines:
-                cursor.execute(
-                    """
-                    UPDATE item
-                    SET stock_quantity = stock_quantity - %s
-                    WHERE item_id = %s
-                    """,
-                    (line["quantity"], line["item_id"]),
-                )
+            _check_stock(job_lines)
+            _deduct_stock(conn, job_lines)
 
         # 4) Update transaction_date ONLY if it's currently NULL
-        cursor.execute(
-            """
-            UPDATE `order`
-            SET transaction_date = COALESCE(transaction_date, NOW())
-            WHERE order_id = %s
-            """,
-            (order_id,),
-        )
+        cursor.execute(SET_JOBORDER_DATE_SQL, (order_id,))
+
+        # 4b) First finalize -> count the order in the monthly issuance rollup
+        if not had_date_before:
+            record_order(conn, order_id)
 
         conn.commit()
 
         # 5) Return updated order summary
-        cursor.execute(
-            """
-            SELECT
-                o.order_id,
-                o.OR_number,
-                o.customer_name,
-                o.total_price,
-                o.transaction_date,
-                u.username
-            FROM `order` o
-            JOIN `user` u ON o.user_id = u.user_id
-            WHERE o.order_id = %s
-            """,
-            (order_id,),
-        )
+        cursor.execute(ORDER_SUMMARY_SQL, (order_id,))
         updated = cursor.fetchone()
 
         return {"message": "Souvenir Job Order finalized", "order": updated}
@@ -390,12 +475,97 @@ def set_joborder_date(order_id: int):
         raise
     except mysql.connector.Error as err:
         conn.rollback()
+        if is_retryable_error(err):
+            raise  # deadlock / lock wait timeout -> retry_transaction
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
         conn.close()
 
 
+@router.post("/orders/{order_id}/set_joborder_date")
+async def set_joborder_date(order_id: int):
+    """
+    SOUVENIR FLOW ONLY (JOB ORDER):
+
+    - Applies ONLY if the order has at least one item with category = 'Souvenir'
+    - Set transaction_date = NOW() IF it's currently NULL
+    - Does NOT require OR_number
+    - When transaction_date was NULL (first time):
+        * validate stock for Souvenir items
+        * deduct stock_quantity for those items
+
+    Called immediately after Job Order "Save & Print".
+    """
+    if not has_async_db():
+        return await run_in_threadpool(set_joborder_date_sync, order_id)
+    return await _set_joborder_date_async(order_id)
+
+
+@retry_transaction_async("set_joborder_date")
+async def _set_joborder_date_async(order_id: int):
+    async with acquire() as conn:
+        async with dict_cursor(conn) as cursor:
+            try:
+                await conn.begin()
+
+                # 1) Lock order row to ensure it exists
+                await cursor.execute(LOCK_ORDER_DATE_SQL, (order_id,))
+                row = await cursor.fetchone()
+                if not row:
+                    raise HTTPException(status_code=404, detail="Order not found")
+
+                had_date_before = row["transaction_date"] is not None
+
+                # 2) Check it has at least one 'Souvenir' item
+                await cursor.execute(SOUVENIR_COUNT_SQL, (order_id,))
+                info = await cursor.fetchone()
+                if not info or info["cnt"] == 0:
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Order does not contain any 'Souvenir' items",
+                    )
+
+                # 3) First finalize -> deduct stock for Souvenir items
+                if not had_date_before:
+                    await cursor.execute(SOUVENIR_LINES_SQL, (order_id,))
+                    job_lines = await cursor.fetchall()
+                    locked = await lock_items_async(
+                        cursor, (l["item_id"] for l in job_lines)
+                    )
+                    job_lines = with_locked_stock(job_lines, locked)
+
+                    _check_stock(job_lines)
+                    for line in job_lines:
+                        await cursor.execute(
+                            DEDUCT_STOCK_SQL, (line["quantity"], line["item_id"])
+                        )
+
+                # 4) Update transaction_date ONLY if it's currently NULL
+                await cursor.execute(SET_JOBORDER_DATE_SQL, (order_id,))
+
+                # 4b) First finalize -> count it in the monthly issuance rollup
+                if not had_date_before:
+                    await record_order_async(cursor, order_id)
+
+                await conn.commit()
+
+                # 5) Return updated order summary
+                await cursor.execute(ORDER_SUMMARY_SQL, (order_id,))
+                updated = await cursor.fetchone()
+
+                return {"message": "Souvenir Job Order finalized", "order": updated}
+
+            except HTTPException:
+                await conn.rollback()
+                raise
+            except AsyncDBError as err:
+                await conn.rollback()
+                if is_retryable_error(err):
+                    raise
+                raise HTTPException(status_code=500, detail=str(err))
+
+
 # =====================================================================
 #  DELETE ORDER (ANY CATEGORY)
 # =====================================================================
@@ -403,18 +573,36 @@ def set_joborder_date(order_id: int):
 def delete_order(order_id: int):
     """
     Delete an order (REGARDLESS of category).
+
+    Orders of archived years cannot be deleted (409): they are closed, and
+    the archive is not rewritten.
     """
     conn = get_db()
     cursor = conn.cursor()
 
     try:
         cursor.execute(
-            "SELECT order_id FROM `order` WHERE order_id = %s",
+            "SELECT order_id, transaction_date FROM `order` WHERE order_id = %s",
             (order_id,),
         )
-        if not cursor.fetchone():
+        row = cursor.fetchone()
+        if not row:
+            if reaches_archive():
+                cursor.execute(
+                    "SELECT order_id FROM order_archive WHERE order_id = %s",
+                    (order_id,),
+                )
+                if cursor.fetchone():
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Order is archived; archived orders cannot be deleted",
+                    )
             raise HTTPException(status_code=404, detail="Order not found")
 
+        # A finalized order leaves the monthly issuance rollup with it
+        if row[1] is not None:
+            record_order(conn, order_id, sign=-1, when=row[1])
+
         cursor.execute(
             "DELETE FROM `order` WHERE order_id = %s",
             (order_id,),
@@ -444,13 +632,14 @@ def monthly_report(year: int, month: int):
     - Each row is one order_line
     """
     start_date, end_date = _month_range(year, month)
+    orders, lines = order_tables(start_date)
 
-    conn = get_db()
+    conn = get_db(readonly=True)
     cursor = conn.cursor(dictionary=True)
 
     try:
         cursor.execute(
-            """
+            f"""
             SELECT
                 o.order_id,
                 o.OR_number AS or_number,
@@ -461,15 +650,15 @@ def monthly_report(year: int, month: int):
                 i.name AS description,
                 i.price AS unit_cost,
                 (ol.quantity * i.price) AS total_cost
-            FROM `order` o
-            JOIN order_line ol ON ol.order_id = o.order_id
+            FROM {orders} o
+            JOIN {lines} ol ON ol.order_id = o.order_id
             JOIN item i ON i.item_id = ol.item_id
             WHERE o.transaction_date >= %s
               AND o.transaction_date < %s
               AND o.OR_number IS NOT NULL
               AND NOT EXISTS (
                   SELECT 1
-                  FROM order_line ol2
+                  FROM {lines} ol2
                   JOIN item i2 ON i2.item_id = ol2.item_id
                   WHERE ol2.order_id = o.order_id
                     AND i2.category = 'Souvenir'
@@ -502,13 +691,14 @@ def monthly_report_job_orders(year: int, month: int):
     - Each row is one order_line where item.category = 'Souvenir'
     """
     start_date, end_date = _month_range(year, month)
+    orders, lines = order_tables(start_date)
 
-    conn = get_db()
+    conn = get_db(readonly=True)
     cursor = conn.cursor(dictionary=True)
 
     try:
         cursor.execute(
-            """
+            f"""
             SELECT
                 o.order_id,
                 o.customer_name AS payer,
@@ -518,14 +708,14 @@ def monthly_report_job_orders(year: int, month: int):
                 i.name AS description,
                 i.price AS unit_cost,
                 (ol.quantity * i.price) AS total_cost
-            FROM `order` o
-            JOIN order_line ol ON ol.order_id = o.order_id
+            FROM {orders} o
+            JOIN {lines} ol ON ol.order_id = o.order_id
             JOIN item i ON i.item_id = ol.item_id
             WHERE o.transaction_date >= %s
               AND o.transaction_date < %s
               AND EXISTS (
                   SELECT 1
-                  FROM order_line ol2
+                  FROM {lines} ol2
                   JOIN item i2 ON i2.item_id = ol2.item_id
                   WHERE ol2.order_id = o.order_id
                     AND i2.category = 'Souvenir'
@@ -547,32 +737,34 @@ def monthly_report_job_orders(year: int, month: int):
 # This is what your Dashboard will use.
 @router.get("/dashboard")
 def get_dashboard_stats():
-    conn = get_db()
+    # All-time figures: archived years included
+    orders, lines = order_tables()
+    conn = get_db(readonly=True)
     cursor = conn.cursor(dictionary=True)
     try:
         # 1) Total revenue from completed transactions (have OR_number)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT COALESCE(SUM(total_price), 0) AS total_revenue
-            FROM `order`
+            FROM {orders} o
             WHERE OR_number IS NOT NULL
         """)
         rev_row = cursor.fetchone() or {}
         total_revenue = float(rev_row.get("total_revenue") or 0)
 
         # 2) Total items sold (sum of quantities from order_line)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT COUNT(*) AS total_items_sold
-            FROM `order`
+            FROM {orders} o
             WHERE OR_number IS NOT NULL
         """)
         items_row = cursor.fetchone() or {}
         total_items_sold = int(items_row.get("total_items_sold") or 0)
 
         # 3) Most sold items (top 5)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT i.item_id, i.name, SUM(ol.quantity) AS total_sold
-            FROM order_line ol
-            JOIN `order` o ON o.order_id = ol.order_id
+            FROM {lines} ol
+            JOIN {orders} o ON o.order_id = ol.order_id
             JOIN item i ON i.item_id = ol.item_id
             WHERE o.OR_number IS NOT NULL
             GROUP BY i.item_id, i.name
@@ -11,24 +11,24 @@ from security.jwt_tools import verify_token
 from security.deps import COOKIE_NAME_AT
 from routers.activity_logger import log_activity
 
+from services import forecast_snapshot, history_cache, model_registry, train_scheduler, training_jobs
+from services.issuance_rollup import rebuild as rebuild_issuance_rollup
+
 from services.predictive_service import (
     DATA_FILE,
-    ITEM_MODELS,
     load_history_from_excel,
     load_history_from_db,
+    get_history_snapshot,
     to_monthly,
     eligible_items,
-    train_models_for_eligible_items,
     list_cached_models,
-    save_models_to_disk,
-    load_models_from_disk,
     get_train_status,
-    train_from_db_and_persist,
     forecast_next_6_months_for_itemname,
     forecast_next_month_safe,
     recommended_restock_plan,
     export_month_plan,
-    all_items_summary,
+    load_stock_from_db,
+    restock_summary,
 )
 
 router = APIRouter(prefix="/predictive", tags=["Predictive"])
@@ -47,19 +47,7 @@ def _actor_id_from_cookie(access_token: Optional[str]) -> Optional[int]:
 
 
 def _get_stock_from_db() -> pd.DataFrame:
-    conn = get_db()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT name AS item_name, stock_quantity FROM item")
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    if not rows:
-        return pd.DataFrame(columns=["item_name", "stock_quantity"])
-
-    df = pd.DataFrame(rows)
-    df["item_name"] = df["item_name"].astype(str).str.strip()
-    return df
+    return load_stock_from_db()
 
 
 @router.api_route("/train", methods=["GET", "POST"])
@@ -83,34 +71,89 @@ def train_validate_excel():
     }
 
 
-@router.api_route("/train/all", methods=["GET", "POST"])
-def train_all_models():
-    try:
-        df = load_history_from_excel()
-        trained, skipped = train_models_for_eligible_items(df)
-        save_models_to_disk(source="csv_manual", trained=trained, skipped=skipped)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Training failed: {e}")
-
+@router.api_route("/train/all", methods=["GET", "POST"], status_code=202)
+def train_all_models(
+    full: bool = Query(False, description="Refit every item, even unchanged ones"),
+    source: str = Query("csv", pattern="^(csv|db)$", description="Train from the CSV/XLSX file or DB history"),
+):
+    """
+    Start a background training job (services/training_jobs.py) and return
+    its id; poll GET /predictive/jobs/{job_id} for progress. If a job is
+    already running, that job is returned instead of starting another.
+    """
+    job, created = training_jobs.submit(source, full=full)
     return {
-        "status": "ok",
-        "trained": trained,
-        "trained_count": len(trained),
-        "skipped": skipped,
-        "skipped_count": len(skipped),
-        "cache_size": len(ITEM_MODELS),
+        "status": "started" if created else "already_running",
+        "job_id": job.id,
+        "job_url": f"/predictive/jobs/{job.id}",
+        "job": job.to_dict(),
     }
 
 
+@router.get("/jobs")
+def list_training_jobs():
+    jobs = training_jobs.list_jobs()
+    return {"count": len(jobs), "jobs": jobs}
+
+
+@router.get("/jobs/{job_id}")
+def get_training_job(job_id: str):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_training_job(job_id: str):
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
 @router.get("/models")
-def list_models():
+def list_models(
+    memory: bool = Query(False, description="Include each model's size (measured once per model)"),
+):
     names = list_cached_models()
-    return {"count": len(names), "items": names}
+    out = {"count": len(names), "items": names, **model_registry.info()}
+    if memory:
+        out["memory"] = model_registry.memory()
+    return out
 
 
 @router.get("/status")
 def predictive_status():
-    return get_train_status()
+    return {**get_train_status(), "scheduler": train_scheduler.info()}
+
+
+@router.post("/history/rebuild")
+def rebuild_history_cache(
+    rollup: bool = Query(False, description="Recompute item_monthly_issuance from the order lines first"),
+):
+    """
+    Re-read the issuance history from scratch. With rollup=true the monthly
+    rollup itself is recomputed first (needed after order lines were edited
+    outside the app; see scripts/rebuild_issuance_rollup.py).
+    """
+    result = None
+    try:
+        if rollup:
+            conn = get_db()
+            try:
+                result = rebuild_issuance_rollup(conn)
+            finally:
+                conn.close()
+        hist = load_history_from_db(rebuild=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"History rebuild failed: {e}")
+    return {
+        "status": "ok",
+        "rows": int(len(hist)),
+        "rollup": result,
+        "history_cache": history_cache.cache_info(),
+    }
 
 
 @router.get("/forecast/item")
@@ -119,7 +162,7 @@ def forecast_one_item(
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
 ):
     try:
-        hist = load_history_from_db()
+        hist = get_history_snapshot()
         if hist.empty:
             hist = load_history_from_excel()
     except Exception as e:
@@ -158,17 +201,30 @@ def forecast_one_item(
     }
 
 
+def _stock_map(stock_df: pd.DataFrame) -> dict:
+    return {
+        str(n).strip().casefold(): int(q)
+        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
+    }
+
+
 @router.get("/forecast/all")
-def forecast_all_items(access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT)):
+def forecast_all_items(
+    recompute: bool = Query(False, description="Recompute the forecast snapshot before serving it"),
+    access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+):
+    """
+    6-month forecast and restock plan summary for ALL items. Forecasts come
+    from the snapshot computed at training time (services/forecast_snapshot.py);
+    restock is worked out against current stock.
+    """
     try:
-        hist = load_history_from_db()
-        if hist.empty:
-            hist = load_history_from_excel()
+        snap = forecast_snapshot.current(recompute=recompute)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
     stock_df = _get_stock_from_db()
-    table = all_items_summary(hist, stock_df)
+    rows = restock_summary(snap["forecast_all"], _stock_map(stock_df))
 
     actor_id = _actor_id_from_cookie(access_token)
     log_activity(
@@ -177,7 +233,11 @@ def forecast_all_items(access_token: str | None = Cookie(default=None, alias=COO
         "Ran manual 6-month forecast for ALL items.",
     )
 
-    return {"count": int(len(table)), "rows": table.to_dict(orient="records")}
+    return {
+        "count": len(rows),
+        "rows": rows,
+        "snapshot": forecast_snapshot.freshness(snap),
+    }
 
 
 @router.get("/export")
@@ -231,7 +291,7 @@ def next_month_one_item(
     Predict next month's issuance for a single item.
     """
     try:
-        hist = load_history_from_db()
+        hist = get_history_snapshot()
         if hist.empty:
             hist = load_history_from_excel()
     except Exception as e:
@@ -265,18 +325,13 @@ def next_month_one_item(
 
 @router.get("/next_month/all")
 def next_month_all_items(
+    recompute: bool = Query(False, description="Recompute the forecast snapshot before serving it"),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
 ):
     """
-    Predict next month's issuance for ALL items.
+    Predict next month's issuance for ALL items, served from the forecast
+    snapshot (see /forecast/all).
     """
-    try:
-        hist_raw = load_history_from_db()
-        if hist_raw.empty:
-            hist_raw = load_history_from_excel()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
-
     stock_df = _get_stock_from_db()
     if stock_df.empty:
         actor_id = _actor_id_from_cookie(access_token)
@@ -287,60 +342,29 @@ def next_month_all_items(
         )
         return {"count": 0, "rows": []}
 
-    stock_df = stock_df.copy()
-    stock_df["key"] = stock_df["item_name"].astype(str).str.strip().str.casefold()
-
-    db_key_to_name = {k: n for k, n in zip(stock_df["key"], stock_df["item_name"])}
-
-    def map_to_db_name(raw: str) -> str | None:
-        if raw is None:
-            return None
-        key = str(raw).strip().casefold()
-        if key in db_key_to_name:
-            return db_key_to_name[key]
-        return None
-
-    hist = hist_raw.copy()
-    hist["canonical_name"] = hist["item_name"].apply(map_to_db_name)
-    hist = hist.dropna(subset=["canonical_name"])
+    try:
+        snap = forecast_snapshot.current(recompute=recompute)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Data load failed: {e}")
 
-    if hist.empty:
+    if not snap["next_month_all"]:
         actor_id = _actor_id_from_cookie(access_token)
         log_activity(
             actor_id,
             "Predictive Restock",
             "Ran manual next-month forecast for ALL items (no matching history).",
         )
-        return {"count": 0, "rows": []}
-
-    hist["item_name"] = hist["canonical_name"]
-    hist = (
-        hist.groupby(["date", "item_name"], as_index=False)["quantity"]
-        .sum()
-        .reset_index(drop=True)
-    )
-
-    stock_map = {
-        n.strip().casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-
-    rows = []
-    for name in sorted(hist["item_name"].unique().tolist(), key=str.casefold):
-        try:
-            pred = forecast_next_month_safe(hist, name)
-        except Exception:
-            continue
-        current = int(stock_map.get(name.strip().casefold(), 0))
-        rows.append(
-            {
-                "item_name": name,
-                "current_stock": current,
-                "next_month_forecast": int(pred),
-            }
-        )
-
-    rows.sort(key=lambda r: r["next_month_forecast"], reverse=True)
+        return {"count": 0, "rows": [], "snapshot": forecast_snapshot.freshness(snap, stock_df)}
+
+    stock_map = _stock_map(stock_df)
+    rows = [
+        {
+            "item_name": r["item_name"],
+            "current_stock": int(stock_map.get(r["item_name"].strip().casefold(), 0)),
+            "next_month_forecast": r["next_month_forecast"],
+        }
+        for r in snap["next_month_all"]
+    ]
 
     actor_id = _actor_id_from_cookie(access_token)
     log_activity(
@@ -349,4 +373,4 @@ def next_month_all_items(
         "Ran manual next-month forecast for ALL items (predictive/next_month/all).",
     )
 
-    return {"count": len(rows), "rows": rows}
+    return {"count": len(rows), "rows": rows, "snapshot": forecast_snapshot.freshness(snap, stock_df)}
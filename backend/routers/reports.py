@@ -1,10 +1,13 @@
 import logging
-from fastapi import APIRouter, HTTPException, Query, Cookie
+from datetime import date
 
-from db import get_db
+from fastapi import APIRouter, HTTPException, Query, Cookie, Depends
+
+from db import get_readonly_db_conn
 from security.jwt_tools import verify_token
 from security.deps import COOKIE_NAME_AT
 from routers.activity_logger import log_activity
+from services.order_archive import order_tables
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
@@ -26,16 +29,23 @@ def get_monthly_report(
     year: int = Query(..., ge=2000, le=2100),
     month: int = Query(..., ge=1, le=12),
     access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_readonly_db_conn),
 ):
     """
     Monthly report based on ORDER + ORDER_LINE + ITEM.
+
+    Reads from the replica when available, so the activity row is written
+    through its own primary connection rather than the request's.
     """
-    conn = get_db()
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    orders, lines = order_tables(start)
+
     cur = conn.cursor(dictionary=True)
 
     try:
         cur.execute(
-            """
+            f"""
             SELECT
                 DATE(o.transaction_date)      AS date,
                 o.customer_name               AS payer,
@@ -48,11 +58,11 @@ def get_monthly_report(
                     WHEN i.category = 'Souvenir' THEN '-'
                     ELSE o.OR_number
                 END                           AS or_number
-            FROM `order` o
-            JOIN order_line ol ON ol.order_id = o.order_id
+            FROM {orders} o
+            JOIN {lines} ol ON ol.order_id = o.order_id
             JOIN item i        ON i.item_id = ol.item_id
-            WHERE YEAR(o.transaction_date) = %s
-              AND MONTH(o.transaction_date) = %s
+            WHERE o.transaction_date >= %s
+              AND o.transaction_date < %s
               AND (
                     (o.OR_number IS NOT NULL AND o.OR_number <> '-')
                     OR i.category = 'Souvenir'
@@ -61,7 +71,7 @@ def get_monthly_report(
                      o.order_id,
                      ol.order_line_id
             """,
-            (year, month),
+            (start, end),
         )
         rows = cur.fetchall()
 
@@ -81,4 +91,3 @@ def get_monthly_report(
             cur.close()
         except Exception:
             pass
-        conn.close()
@@ -1,128 +1,157 @@
 # backend/routers/sales.py
 
 from fastapi import APIRouter, HTTPException
-from db import get_db
+from fastapi.concurrency import run_in_threadpool
+
+from db import get_db, is_retryable_error, retry_transaction
+from db_async import has_async_db, acquire, dict_cursor, retry_transaction_async
 from schemas import SaleCreateIn
+from services.inventory_locks import lock_items, lock_items_async
+from services.order_archive import reaches_archive
 
 router = APIRouter(prefix="/api/sales", tags=["Sales"])
 
 
-@router.get("/catalog")
-def get_catalog():
-    """Minimal item list for selects."""
-    conn = get_db()
-    cur = conn.cursor(dictionary=True)
+# SQL shared by the sync and async implementations below.
+CATALOG_SQL = """
+    SELECT item_id, name, price, stock_quantity
+    FROM item
+    ORDER BY name
+"""
 
-    cur.execute(
-        """
-        SELECT item_id, name, price, stock_quantity
-        FROM item
-        ORDER BY name
-        """
-    )
-    rows = cur.fetchall()
+CHECK_USER_SQL = "SELECT user_id FROM `user` WHERE user_id = %s"
 
-    cur.close()
-    conn.close()
-    return rows
+# Use backticks for `order` (reserved word)
+INSERT_ORDER_SQL = """
+    INSERT INTO `order` (user_id, total_price, OR_number, customer_name, transaction_date)
+    VALUES (%s, %s, %s, %s, NULL)
+"""
 
+INSERT_LINE_SQL = """
+    INSERT INTO order_line (order_id, item_id, quantity)
+    VALUES (%s, %s, %s)
+"""
 
-@router.post("/")
-def create_sale(payload: SaleCreateIn):
-    """
-    Create a POS sale (used by normal sales and Job Orders):
-
-    - Inserts into `order` + `order_line`
-    - Validates stock (but does NOT deduct yet)
-    - DOES NOT set transaction_date (left as NULL)
 
-      * Normal sales: date set in /orders/{order_id}/add_or
-      * Job Orders:   date set in /orders/{order_id}/set_joborder_date
-    """
-    # Validate payload
+def _validate_sale_payload(payload: SaleCreateIn) -> None:
     if not payload.items:
         raise HTTPException(status_code=400, detail="No items provided.")
 
     if any(i.quantity <= 0 for i in payload.items):
         raise HTTPException(status_code=400, detail="Quantities must be positive.")
 
+
+def _check_item_row(row, it) -> float:
+    """
+    Validate one locked item row against the requested line; return line total.
+    """
+    if not row:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Item {it.item_id} not found.",
+        )
+
+    if row["stock_quantity"] < it.quantity:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Insufficient stock for item {it.item_id}.",
+        )
+
+    return float(row["price"]) * it.quantity
+
+
+def _sale_total(payload: SaleCreateIn, locked) -> float:
+    total = 0.0
+    for it in payload.items:
+        total += _check_item_row(locked.get(it.item_id), it)
+    return total
+
+
+def _sale_response(order_id: int, total: float, payload: SaleCreateIn) -> dict:
+    return {
+        "sale_id": order_id,
+        "total_price": round(total, 2),
+        "items": [i.dict() for i in payload.items],
+    }
+
+
+# =====================================================================
+#  CATALOG
+# =====================================================================
+def get_catalog_sync():
+    """Minimal item list for selects (blocking mysql.connector path)."""
     conn = get_db()
     cur = conn.cursor(dictionary=True)
-
     try:
-        conn.start_transaction()
+        cur.execute(CATALOG_SQL)
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
 
-        # 1) Validate stock & compute total (but do NOT deduct yet)
-        total = 0.0
-        for it in payload.items:
-            cur.execute(
-                """
-                SELECT item_id, price, stock_quantity
-                FROM item
-                WHERE item_id = %s
-                FOR UPDATE
-                """,
-                (it.item_id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Item {it.item_id} not found.",
-                )
 
-            if row["stock_quantity"] < it.quantity:
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"Insufficient stock for item {it.item_id}.",
-                )
+@router.get("/catalog")
+async def get_catalog():
+    """Minimal item list for selects."""
+    if not has_async_db():
+        return await run_in_threadpool(get_catalog_sync)
+
+    async with acquire() as conn:
+        async with dict_cursor(conn) as cur:
+            await cur.execute(CATALOG_SQL)
+            return await cur.fetchall()
+
+
+# =====================================================================
+#  CREATE SALE
+# =====================================================================
+@retry_transaction("create_sale")
+def create_sale_sync(payload: SaleCreateIn):
+    """
+    Blocking implementation of POST /api/sales/ (see create_sale).
+    """
+    _validate_sale_payload(payload)
 
-            total += float(row["price"]) * it.quantity
+    conn = get_db()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        conn.start_transaction()
+
+        # 1) Lock item rows (ascending item_id), validate stock & compute
+        #    total (but do NOT deduct yet)
+        locked = lock_items(conn, (it.item_id for it in payload.items))
+        total = _sale_total(payload, locked)
 
         # 2) Validate user_id
-        cur.execute(
-            "SELECT user_id FROM `user` WHERE user_id = %s",
-            (payload.user_id,),
-        )
+        cur.execute(CHECK_USER_SQL, (payload.user_id,))
         if not cur.fetchone():
             raise HTTPException(
                 status_code=400, detail=f"Invalid user_id {payload.user_id}"
             )
 
         # 3) Insert order header (transaction_date = NULL)
-        #    Use backticks for `order` (reserved word)
         cur.execute(
-            """
-            INSERT INTO `order` (user_id, total_price, OR_number, customer_name, transaction_date)
-            VALUES (%s, %s, %s, %s, NULL)
-            """,
+            INSERT_ORDER_SQL,
             (payload.user_id, total, payload.OR_number, payload.customer_name),
         )
         order_id = cur.lastrowid
 
         # 4) Insert lines (NO stock update here)
         for it in payload.items:
-            cur.execute(
-                """
-                INSERT INTO order_line (order_id, item_id, quantity)
-                VALUES (%s, %s, %s)
-                """,
-                (order_id, it.item_id, it.quantity),
-            )
+            cur.execute(INSERT_LINE_SQL, (order_id, it.item_id, it.quantity))
 
         conn.commit()
 
-        return {
-            "sale_id": order_id,
-            "total_price": round(total, 2),
-            "items": [i.dict() for i in payload.items],
-        }
+        return _sale_response(order_id, total, payload)
 
     except HTTPException:
         conn.rollback()
         raise
     except Exception as e:
         conn.rollback()
+        if is_retryable_error(e):
+            raise  # deadlock / lock wait timeout -> retry_transaction
         # This is what becomes your 500
         raise HTTPException(status_code=500, detail=f"Server error: {e}")
     finally:
@@ -133,9 +162,74 @@ def create_sale(payload: SaleCreateIn):
         conn.close()
 
 
+@router.post("/")
+async def create_sale(payload: SaleCreateIn):
+    """
+    Create a POS sale (used by normal sales and Job Orders):
+
+    - Inserts into `order` + `order_line`
+    - Validates stock (but does NOT deduct yet)
+    - DOES NOT set transaction_date (left as NULL)
+
+      * Normal sales: date set in /orders/{order_id}/add_or
+      * Job Orders:   date set in /orders/{order_id}/set_joborder_date
+    """
+    if not has_async_db():
+        return await run_in_threadpool(create_sale_sync, payload)
+
+    _validate_sale_payload(payload)
+    return await _create_sale_async(payload)
+
+
+@retry_transaction_async("create_sale")
+async def _create_sale_async(payload: SaleCreateIn):
+    async with acquire() as conn:
+        async with dict_cursor(conn) as cur:
+            try:
+                await conn.begin()
+
+                # 1) Lock item rows (ascending item_id), validate stock &
+                #    compute total (but do NOT deduct yet)
+                locked = await lock_items_async(
+                    cur, (it.item_id for it in payload.items)
+                )
+                total = _sale_total(payload, locked)
+
+                # 2) Validate user_id
+                await cur.execute(CHECK_USER_SQL, (payload.user_id,))
+                if not await cur.fetchone():
+                    raise HTTPException(
+                        status_code=400, detail=f"Invalid user_id {payload.user_id}"
+                    )
+
+                # 3) Insert order header (transaction_date = NULL)
+                await cur.execute(
+                    INSERT_ORDER_SQL,
+                    (payload.user_id, total, payload.OR_number, payload.customer_name),
+                )
+                order_id = cur.lastrowid
+
+                # 4) Insert lines (NO stock update here)
+                for it in payload.items:
+                    await cur.execute(INSERT_LINE_SQL, (order_id, it.item_id, it.quantity))
+
+                await conn.commit()
+
+                return _sale_response(order_id, total, payload)
+
+            except HTTPException:
+                await conn.rollback()
+                raise
+            except Exception as e:
+                await conn.rollback()
+                if is_retryable_error(e):
+                    raise
+                raise HTTPException(status_code=500, detail=f"Server error: {e}")
+
+
 @router.get("/{sale_id}")
 def get_sale(sale_id: int):
-    """Fetch a sale header + lines."""
+    """Fetch a sale header + lines (from the archive for closed years)."""
     conn = get_db()
     cur = conn.cursor(dictionary=True)
 
@@ -145,6 +239,12 @@ def get_sale(sale_id: int):
         (sale_id,),
     )
     order = cur.fetchone()
+    lines_table = "order_line"
+
+    if not order and reaches_archive():
+        cur.execute("SELECT * FROM order_archive WHERE order_id = %s", (sale_id,))
+        order = cur.fetchone()
+        lines_table = "order_line_archive"
 
     if not order:
         cur.close()
@@ -152,14 +252,14 @@ def get_sale(sale_id: int):
         raise HTTPException(status_code=404, detail="Sale not found.")
 
     cur.execute(
-        """
+        f"""
         SELECT
             ol.order_line_id,
             ol.item_id,
             i.name,
             i.price,
             ol.quantity
-        FROM order_line ol
+        FROM {lines_table} ol
         JOIN item i ON i.item_id = ol.item_id
         WHERE ol.order_id = %s
         """,
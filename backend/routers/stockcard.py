@@ -2,13 +2,14 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Cookie
+from fastapi import APIRouter, HTTPException, Cookie, Depends
 from pydantic import BaseModel
 
-from db import get_db  # your existing get_db()
+from db import get_db_conn  # one pooled connection per request
 from security.jwt_tools import verify_token
 from security.deps import COOKIE_NAME_AT
 from routers.activity_logger import log_activity
+from services.order_archive import HOT_LINES, order_tables, reaches_archive
 
 router = APIRouter(prefix="/stockcard", tags=["Stock Card"])
 
@@ -72,16 +73,19 @@ def _actor_id_from_cookie(access_token: str | None) -> Optional[int]:
 # ---------- GET /stockcard/{item_id} ----------
 
 @router.get("/{item_id}", response_model=StockCardResponse)
-def get_stock_card(item_id: int, access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT)):
+def get_stock_card(
+    item_id: int,
+    access_token: str | None = Cookie(default=None, alias=COOKIE_NAME_AT),
+    conn=Depends(get_db_conn),
+):
     """
     Returns:
     - header: item info + opening_balance + current_stock
     - movements: one row per order_line for this item
     Balance per row is computed in the frontend.
     """
-    conn = get_db()
+    cur = conn.cursor(dictionary=True)
     try:
-        cur = conn.cursor(dictionary=True)
 
         # 1️⃣ Get item
         cur.execute(
@@ -99,10 +103,11 @@ def get_stock_card(item_id: int, access_token: str | None = Cookie(default=None,
         current_stock = int(item["stock_quantity"] or 0)
         reorder_level = int(item["reorder_level"] or 0)
 
-        # 2️⃣ Get all issuance history (order_line)
+        # 2️⃣ Get all issuance history (order_line), archived years included
         #    reference_no is taken ONLY from order_line.reference_no
+        orders, lines = order_tables()
         cur.execute(
-            """
+            f"""
             SELECT 
                 o.order_id,
                 o.transaction_date,
@@ -112,8 +117,8 @@ def get_stock_card(item_id: int, access_token: str | None = Cookie(default=None,
                 ol.office,
                 ol.days_to_consume,
                 ol.receipt_qty
-            FROM `order_line` ol
-            JOIN `order` o ON o.order_id = ol.order_id
+            FROM {lines} ol
+            JOIN {orders} o ON o.order_id = ol.order_id
             WHERE ol.item_id = %s
             ORDER BY o.transaction_date ASC, o.order_id ASC
             """,
@@ -204,24 +209,32 @@ def get_stock_card(item_id: int, access_token: str | None = Cookie(default=None,
             actor_id,
             "Stock Card",
             f"Generated stock card for item #{item['item_id']} ({item['name']}).",
+            conn=conn,
         )
 
         return StockCardResponse(header=header, movements=movements)
     finally:
-        conn.close()
+        cur.close()
 
 
 # ---------- PUT /stockcard/{item_id} ----------
 
 @router.put("/{item_id}")
-def update_stock_card(item_id: int, payload: StockCardUpdateRequest):
+def update_stock_card(
+    item_id: int,
+    payload: StockCardUpdateRequest,
+    conn=Depends(get_db_conn),
+):
     """
     Save manual edits from the Stock Card into order_line.
-    Only updates existing rows (by order_line_id).
+    Only updates existing rows (by order_line_id). Rows of archived years
+    (listed by the GET too) are updated in order_line_archive.
     """
-    conn = get_db()
+    # None of these columns feed the issuance rollup, so archived lines can
+    # be edited in place.
+    tables = [HOT_LINES, "order_line_archive"] if reaches_archive() else [HOT_LINES]
+    cur = conn.cursor()
     try:
-        cur = conn.cursor()
 
         for m in payload.movements:
             reference_no = m.reference_no if m.reference_no else None
@@ -229,27 +242,31 @@ def update_stock_card(item_id: int, payload: StockCardUpdateRequest):
             days_to_consume = m.days_to_consume
             receipt_qty = m.receipt_qty
 
-            cur.execute(
-                """
-                UPDATE `order_line`
-                SET reference_no = %s,
-                    office = %s,
-                    days_to_consume = %s,
-                    receipt_qty = %s
-                WHERE order_line_id = %s
-                  AND item_id = %s
-                """,
-                (
-                    reference_no,
-                    office,
-                    days_to_consume,
-                    receipt_qty,
-                    m.id,
-                    item_id,
-                ),
-            )
+            for table in tables:
+                cur.execute(
+                    f"""
+                    UPDATE {table}
+                    SET reference_no = %s,
+                        office = %s,
+                        days_to_consume = %s,
+                        receipt_qty = %s
+                    WHERE order_line_id = %s
+                      AND item_id = %s
+                    """,
+                    (
+                        reference_no,
+                        office,
+                        days_to_consume,
+                        receipt_qty,
+                        m.id,
+                        item_id,
+                    ),
+                )
 
         conn.commit()
         return {"status": "ok", "updated": True}
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        cur.close()
@@ -0,0 +1,116 @@
+-- backend/schema_sqlite.sql
+-- Local SQLite copy of the iTrack schema, used when DB_BACKEND=sqlite
+-- (see db_sqlite.py). Mirrors the MySQL tables the routers touch and the
+-- indexes from migrations/0001_hot_predicate_indexes.sql.
+-- Declared types matter: DATETIME / DATE / DECIMAL columns are converted
+-- back to Python datetime / date / Decimal like mysql.connector does.
+
+CREATE TABLE IF NOT EXISTS roles (
+    roles_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    role_name  VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `user` (
+    user_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    roles_id  INTEGER REFERENCES roles (roles_id),
+    username  VARCHAR(100) NOT NULL,
+    email     VARCHAR(255) NOT NULL UNIQUE,
+    password  VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS item (
+    item_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    name            VARCHAR(255) NOT NULL,
+    unit            VARCHAR(50),
+    category        VARCHAR(100),
+    price           DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    stock_quantity  INTEGER NOT NULL DEFAULT 0,
+    reorder_level   INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS `order` (
+    order_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id           INTEGER NOT NULL REFERENCES `user` (user_id),
+    total_price       DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    OR_number         VARCHAR(100),
+    customer_name     VARCHAR(255),
+    transaction_date  DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS order_line (
+    order_line_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id         INTEGER NOT NULL REFERENCES `order` (order_id) ON DELETE CASCADE,
+    item_id          INTEGER NOT NULL REFERENCES item (item_id),
+    quantity         INTEGER NOT NULL,
+    reference_no     VARCHAR(100),
+    office           VARCHAR(255),
+    days_to_consume  DOUBLE,
+    receipt_qty      DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS activity_logs (
+    log_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id      INTEGER REFERENCES `user` (user_id) ON DELETE SET NULL,
+    action       VARCHAR(100) NOT NULL,
+    description  TEXT,
+    timestamp    DATETIME NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_txdate_total ON `order` (transaction_date, total_price);
+CREATE INDEX IF NOT EXISTS idx_order_or_number ON `order` (OR_number, total_price);
+CREATE INDEX IF NOT EXISTS idx_order_line_order_item ON order_line (order_id, item_id, quantity);
+CREATE INDEX IF NOT EXISTS idx_order_line_item_order ON order_line (item_id, order_id, quantity);
+CREATE INDEX IF NOT EXISTS idx_item_category ON item (category);
+CREATE INDEX IF NOT EXISTS idx_item_name_catalog ON item (name, price, stock_quantity);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp ON activity_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_action_ts ON activity_logs (action, timestamp);
+CREATE INDEX IF NOT EXISTS idx_user_email ON `user` (email);
+
+-- Archive of closed years (migrations/0002_order_archive.sql,
+-- scripts/archive_orders.py). Same column order as the hot tables.
+CREATE TABLE IF NOT EXISTS order_archive (
+    order_id          INTEGER PRIMARY KEY,
+    user_id           INTEGER NOT NULL,
+    total_price       DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    OR_number         VARCHAR(100),
+    customer_name     VARCHAR(255),
+    transaction_date  DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS order_line_archive (
+    order_line_id    INTEGER PRIMARY KEY,
+    order_id         INTEGER NOT NULL,
+    item_id          INTEGER NOT NULL,
+    quantity         INTEGER NOT NULL,
+    reference_no     VARCHAR(100),
+    office           VARCHAR(255),
+    days_to_consume  DOUBLE,
+    receipt_qty      DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS order_archive_state (
+    id               INTEGER PRIMARY KEY,
+    archived_before  DATE,
+    updated_at       DATETIME
+);
+
+INSERT OR IGNORE INTO order_archive_state (id, archived_before, updated_at)
+VALUES (1, NULL, NULL);
+
+CREATE INDEX IF NOT EXISTS idx_order_archive_txdate ON order_archive (transaction_date, total_price);
+CREATE INDEX IF NOT EXISTS idx_order_archive_or_number ON order_archive (OR_number, total_price);
+CREATE INDEX IF NOT EXISTS idx_order_line_archive_order_item ON order_line_archive (order_id, item_id, quantity);
+CREATE INDEX IF NOT EXISTS idx_order_line_archive_item_order ON order_line_archive (item_id, order_id, quantity);
+
+-- Monthly issuance rollup (migrations/0003_item_monthly_issuance.sql,
+-- services/issuance_rollup.py). Filled by scripts/seed_local_db.py; run
+-- scripts/rebuild_issuance_rollup.py on databases seeded before it existed.
+CREATE TABLE IF NOT EXISTS item_monthly_issuance (
+    item_id     INTEGER  NOT NULL,
+    month       DATE     NOT NULL,
+    quantity    INTEGER  NOT NULL DEFAULT 0,
+    updated_at  DATETIME NOT NULL,
+    PRIMARY KEY (item_id, month)
+);
+
+CREATE INDEX IF NOT EXISTS idx_item_monthly_issuance_updated ON item_monthly_issuance (updated_at);
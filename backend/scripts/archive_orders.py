@@ -0,0 +1,138 @@
+"""
+Move finalized orders of closed years out of `order` / order_line into
+order_archive / order_line_archive (migration 0002).
+
+By default the current and the previous year stay hot (--keep-years 2); every
+order with transaction_date before Jan 1 of the oldest kept year is moved.
+Pending orders (transaction_date NULL) are never moved.
+
+The boundary in order_archive_state is raised first. The script then waits
+ARCHIVE_BOUNDARY_TTL seconds (how long services/order_archive.py caches the
+boundary; use the same value as the API) so that no process still holds the
+old one, and only then moves the rows, in batches of one transaction each.
+Readers that trust the boundary thus always find every row in one of the two
+places. Re-running is safe; an interrupted run just continues.
+
+Run from backend/:
+  python -m scripts.archive_orders --dry-run
+  python -m scripts.archive_orders --keep-years 2 --batch-size 500
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db  # noqa: E402
+from services.order_archive import BOUNDARY_SQL, BOUNDARY_TTL, as_date  # noqa: E402
+
+PER_YEAR_SQL = """
+    SELECT YEAR(transaction_date) AS yr, COUNT(*) AS orders
+    FROM `order`
+    WHERE transaction_date < %s
+    GROUP BY YEAR(transaction_date)
+    ORDER BY yr
+"""
+
+NEXT_BATCH_SQL = """
+    SELECT order_id
+    FROM `order`
+    WHERE transaction_date < %s
+    ORDER BY order_id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+SET_BOUNDARY_SQL = """
+    UPDATE order_archive_state
+    SET archived_before = %s,
+        updated_at = %s
+    WHERE id = 1
+"""
+
+
+def move_batch(cur, order_ids) -> None:
+    marks = ", ".join(["%s"] * len(order_ids))
+    ids = tuple(order_ids)
+    cur.execute(f"INSERT INTO order_archive SELECT * FROM `order` WHERE order_id IN ({marks})", ids)
+    cur.execute(
+        f"INSERT INTO order_line_archive SELECT * FROM order_line WHERE order_id IN ({marks})", ids
+    )
+    cur.execute(f"DELETE FROM order_line WHERE order_id IN ({marks})", ids)
+    cur.execute(f"DELETE FROM `order` WHERE order_id IN ({marks})", ids)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--keep-years", type=int, default=2, help="years kept hot, incl. the current one")
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    if args.keep_years < 1:
+        ap.error("--keep-years must be at least 1 (the current year is never closed)")
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(BOUNDARY_SQL)
+        row = cur.fetchone()
+        if row is None:
+            sys.exit("order_archive_state is empty; run `python -m scripts.migrate` first.")
+        current = as_date(row[0])
+
+        boundary = date(date.today().year - args.keep_years + 1, 1, 1)
+        if current is not None and current > boundary:
+            boundary = current  # never move the boundary back
+
+        cur.execute(PER_YEAR_SQL, (boundary,))
+        per_year = cur.fetchall()
+        print(f"Archive boundary: {current} -> {boundary}")
+        for yr, n in per_year:
+            print(f"  {yr}: {n} orders to move")
+
+        if args.dry_run or (not per_year and current == boundary):
+            return
+
+        # 1) Raise the boundary first: readers start including the archive
+        cur.execute(SET_BOUNDARY_SQL, (boundary, datetime.now()))
+        conn.commit()
+
+        # ...and wait until every process's cached boundary has expired
+        # (also on a re-run: the last run may have stopped while waiting)
+        if per_year:
+            wait = BOUNDARY_TTL + 1
+            print(f"Waiting {wait:.0f}s for cached archive boundaries to expire...")
+            time.sleep(wait)
+
+        # 2) Move rows, one transaction per batch
+        moved = 0
+        while True:
+            conn.start_transaction()
+            cur.execute(NEXT_BATCH_SQL, (boundary, args.batch_size))
+            order_ids = [r[0] for r in cur.fetchall()]
+            if not order_ids:
+                conn.rollback()
+                break
+            move_batch(cur, order_ids)
+            conn.commit()
+            moved += len(order_ids)
+            print(f"  moved {moved} orders", end="\r")
+
+        print(f"\nDone: {moved} orders archived before {boundary}.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ if str(BACKEND_ROOT) not in sys.path:
     sys.path.append(str(BACKEND_ROOT))
 
 from services.predictive_service import (  # noqa: E402
-    load_history_from_db,
+    load_monthly_history_from_db,
     load_history_from_excel,
     to_monthly,
     fallback_next_month,
@@ -134,7 +134,7 @@ def main():
     # Load history
     hist = None
     if args.source in ("auto", "db"):
-        hist = load_history_from_db()
+        hist = load_monthly_history_from_db()
     if (hist is None or hist.empty) and args.source in ("auto", "csv"):
         hist = load_history_from_excel()
 
@@ -142,7 +142,7 @@ def main():
         print("No history found (DB/CSV). Aborting.")
         sys.exit(1)
 
-    monthly = to_monthly(hist)
+    monthly = to_monthly(hist)  # DB history is already monthly; this only aggregates the CSV
     results = backtest(monthly, horizon=args.horizon, min_months=args.min_months)
 
     if not results:
@@ -0,0 +1,115 @@
+"""
+Compare the sync (threadpool + mysql.connector) and async (aiomysql) DB paths
+for the hot POS endpoints under concurrent terminals.
+
+Run from backend/ against a real database:
+  python -m scripts.bench_db_paths --terminals 50 --requests 20
+  python -m scripts.bench_db_paths --terminals 50 --sale-item 1 --sale-user 1
+
+--sale-item/--sale-user also time create_sale. Those sales stay unfinalized
+(no OR / transaction_date), so run it against a scratch database.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+import anyio
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db_async import has_async_db, close_async_pool  # noqa: E402
+from routers.sales import (  # noqa: E402
+    get_catalog,
+    get_catalog_sync,
+    create_sale,
+    create_sale_sync,
+)
+from schemas import SaleCreateIn  # noqa: E402
+
+
+def summarize(label: str, latencies: List[float], wall: float) -> None:
+    lat_ms = sorted(x * 1000 for x in latencies)
+    p95 = lat_ms[int(0.95 * (len(lat_ms) - 1))]
+    print(
+        f"{label:<28} n={len(lat_ms):<6} wall={wall:7.2f}s "
+        f"rps={len(lat_ms) / wall:8.1f} p50={statistics.median(lat_ms):7.2f}ms "
+        f"p95={p95:7.2f}ms"
+    )
+
+
+async def run_terminals(
+    terminals: int, requests: int, call: Callable[[], Awaitable[object]]
+) -> tuple[List[float], float]:
+    latencies: List[float] = []
+
+    async def terminal():
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(terminals):
+            tg.start_soon(terminal)
+    return latencies, time.perf_counter() - t0
+
+
+async def bench(args) -> None:
+    # Starlette runs sync endpoints on anyio's default limiter (40 threads).
+    limiter = anyio.CapacityLimiter(args.threads)
+
+    def sync_call(fn, *a):
+        return lambda: anyio.to_thread.run_sync(fn, *a, limiter=limiter)
+
+    cases = [("catalog sync", sync_call(get_catalog_sync)), ("catalog async", get_catalog)]
+
+    if args.sale_item and args.sale_user:
+        payload = SaleCreateIn(
+            user_id=args.sale_user,
+            customer_name="bench",
+            items=[{"item_id": args.sale_item, "quantity": 1}],
+        )
+        cases += [
+            ("create_sale sync", sync_call(create_sale_sync, payload)),
+            ("create_sale async", lambda: create_sale(payload)),
+        ]
+
+    print(
+        f"terminals={args.terminals} requests/terminal={args.requests} "
+        f"threadpool={args.threads}"
+    )
+    for label, call in cases:
+        await call()  # warm pools
+        latencies, wall = await run_terminals(args.terminals, args.requests, call)
+        summarize(label, latencies, wall)
+
+    await close_async_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async DB paths.")
+    parser.add_argument("--terminals", type=int, default=50, help="Concurrent POS terminals")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per terminal")
+    parser.add_argument("--threads", type=int, default=40, help="Threadpool size for the sync path")
+    parser.add_argument("--sale-item", type=int, default=None, help="item_id used for create_sale")
+    parser.add_argument("--sale-user", type=int, default=None, help="user_id used for create_sale")
+    args = parser.parse_args()
+
+    if not has_async_db():
+        print("aiomysql is not installed (or DB_ASYNC_ENABLED=0). Aborting.")
+        sys.exit(1)
+
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark: monthly history for the predictive module, by path.
+
+  daily       the old loader: lines grouped by DATE() in SQL, then
+              pd.to_datetime + Period conversion in to_monthly()
+  sql-month   lines grouped by item and month in SQL (no rollup)
+  rollup      item_monthly_issuance grouped by item name and month in SQL
+  cached      load_monthly_history_from_db() with a warm history cache
+
+Reports rows transferred from the database and end-to-end time (query,
+fetch, frame building) per path, and checks every path returns the same
+monthly frame.
+
+Run from backend/ (DB_BACKEND=sqlite works after scripts.seed_local_db):
+  python -m scripts.bench_monthly_history --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Tuple
+
+import pandas as pd
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db  # noqa: E402
+from services.order_archive import order_tables  # noqa: E402
+from services.predictive_service import (  # noqa: E402
+    load_monthly_history_from_db,
+    monthly_frame,
+    to_monthly,
+)
+
+DAILY_SQL = """
+    SELECT DATE(o.transaction_date) AS date,
+           i.name AS item_name,
+           SUM(ol.quantity) AS quantity
+    FROM {lines} ol
+    JOIN {orders} o ON o.order_id = ol.order_id
+    JOIN item i ON i.item_id = ol.item_id
+    WHERE o.transaction_date IS NOT NULL
+    GROUP BY DATE(o.transaction_date), i.name
+    ORDER BY DATE(o.transaction_date)
+"""
+
+SQL_MONTH_SQL = """
+    SELECT i.name AS item_name,
+           YEAR(o.transaction_date) AS yr,
+           MONTH(o.transaction_date) AS mo,
+           SUM(ol.quantity) AS y
+    FROM {lines} ol
+    JOIN {orders} o ON o.order_id = ol.order_id
+    JOIN item i ON i.item_id = ol.item_id
+    WHERE o.transaction_date IS NOT NULL
+    GROUP BY i.name, YEAR(o.transaction_date), MONTH(o.transaction_date)
+"""
+
+ROLLUP_SQL = """
+    SELECT i.name AS item_name, r.month AS ds, SUM(r.quantity) AS y
+    FROM item_monthly_issuance r
+    JOIN item i ON i.item_id = r.item_id
+    WHERE r.quantity <> 0
+    GROUP BY i.name, r.month
+"""
+
+
+def fetch(sql: str):
+    orders, lines = order_tables()
+    conn = get_db(readonly=True)
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.format(orders=orders, lines=lines))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _clean(df: pd.DataFrame) -> pd.DataFrame:
+    df["item_name"] = df["item_name"].astype(str).str.strip()
+    df["y"] = pd.to_numeric(df["y"], errors="coerce").fillna(0).astype(float)
+    return df
+
+
+def daily_path() -> Tuple[pd.DataFrame, int]:
+    rows = fetch(DAILY_SQL)
+    df = pd.DataFrame(rows, columns=["date", "item_name", "quantity"])
+    df["item_name"] = df["item_name"].astype(str).str.strip()
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(float)
+    return to_monthly(df), len(rows)
+
+
+def sql_month_path() -> Tuple[pd.DataFrame, int]:
+    rows = fetch(SQL_MONTH_SQL)
+    df = _clean(pd.DataFrame(rows, columns=["item_name", "yr", "mo", "y"]))
+    df["ds"] = pd.to_datetime(pd.DataFrame({"year": df["yr"], "month": df["mo"], "day": 1}))
+    return monthly_frame(df), len(rows)
+
+
+def rollup_path() -> Tuple[pd.DataFrame, int]:
+    rows = fetch(ROLLUP_SQL)
+    df = _clean(pd.DataFrame(rows, columns=["item_name", "ds", "y"]))
+    df["ds"] = pd.to_datetime(df["ds"])
+    return monthly_frame(df), len(rows)
+
+
+def cached_path() -> Tuple[pd.DataFrame, int]:
+    from services import history_cache
+
+    monthly = load_monthly_history_from_db()
+    return monthly, history_cache.cache_info()["last_refresh"]["rows"]
+
+
+def run(fn: Callable[[], Tuple[pd.DataFrame, int]], repeat: int):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, times
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Monthly history: daily path vs SQL month grouping.")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    load_monthly_history_from_db()  # warm the cache first
+    paths = [
+        ("daily", daily_path),
+        ("sql-month", sql_month_path),
+        ("rollup", rollup_path),
+        ("cached", cached_path),
+    ]
+
+    reference = None
+    for label, fn in paths:
+        (monthly, rows), times = run(fn, args.repeat)
+        ms = [t * 1000 for t in times]
+        print(
+            f"{label:<10} rows={rows:>8} monthly={len(monthly):>7} "
+            f"median={statistics.median(ms):9.1f}ms min={min(ms):9.1f}ms"
+        )
+        monthly = monthly.reset_index(drop=True)[["item_name", "month", "y", "ds"]]
+        if reference is None:
+            reference = monthly
+        else:
+            pd.testing.assert_frame_equal(monthly, reference, check_dtype=False)
+    print("monthly frames identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: hot statements over the text protocol vs the per-connection
+prepared-statement registry (db.prepared_cursor).
+
+Everything runs inside a transaction that is rolled back, so the database is
+left untouched.
+
+Run from backend/ against a real database:
+  python -m scripts.bench_prepared --item-id 1 --iterations 5000
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db, prepared_cursor  # noqa: E402
+from routers.orders import DEDUCT_STOCK_SQL  # noqa: E402
+from routers.activity_logger import INSERT_ACTIVITY_SQL  # noqa: E402
+from services.inventory_locks import LOCK_ITEM_SQL  # noqa: E402
+
+
+def time_calls(fn: Callable[[], None], iterations: int) -> List[float]:
+    out = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def report(label: str, samples: List[float]) -> None:
+    us = sorted(x * 1e6 for x in samples)
+    p95 = us[int(0.95 * (len(us) - 1))]
+    print(f"{label:<34} mean={statistics.mean(us):8.1f}us p50={statistics.median(us):8.1f}us p95={p95:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text vs prepared statement micro-benchmark.")
+    parser.add_argument("--item-id", type=int, default=1, help="Existing item_id to lock/update")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = get_db()
+    try:
+        conn.start_transaction()
+        text_cur = conn.cursor(dictionary=True)
+
+        cases = [
+            ("lock item (FOR UPDATE)", LOCK_ITEM_SQL, (args.item_id,), True),
+            ("deduct stock (UPDATE)", DEDUCT_STOCK_SQL, (0, args.item_id), False),
+            ("log activity (INSERT)", INSERT_ACTIVITY_SQL, (None, "Bench", "bench", "2000-01-01"), False),
+        ]
+
+        for label, sql, params, returns_rows in cases:
+            def run_text():
+                text_cur.execute(sql, params)
+                if returns_rows:
+                    text_cur.fetchall()
+
+            def run_prepared():
+                cur = prepared_cursor(conn, sql, dictionary=returns_rows)
+                cur.execute(sql, params)
+                if returns_rows:
+                    cur.fetchall()
+                cur.close()
+
+            run_text()
+            run_prepared()  # prepare once, outside the timing
+            report(f"{label} text", time_calls(run_text, args.iterations))
+            report(f"{label} prepared", time_calls(run_prepared, args.iterations))
+
+        text_cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: building the per-item training series with one casefold scan per
+eligible item (the old train_models_for_eligible_items loop) vs a single
+groupby (predictive_service.series_by_key).
+
+Only the series preparation is timed; no Prophet fits run. The data is
+synthetic, so no database is needed.
+
+Run from backend/:
+  python -m scripts.bench_train_grouping --items 5000 --months 60
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from services.predictive_service import eligible_items, series_by_key, to_monthly  # noqa: E402
+
+
+def synthetic_history(items: int, months: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Item {i:05d}" for i in range(items)])
+    days = pd.date_range("2000-01-01", periods=months, freq="MS") + pd.Timedelta(days=14)
+    return pd.DataFrame(
+        {
+            "item_name": np.repeat(names, months),
+            "date": np.tile(days.values, items),
+            "quantity": rng.integers(0, 50, size=items * months),
+        }
+    )
+
+
+def per_item_scan(monthly: pd.DataFrame, names):
+    return {
+        name: monthly.loc[monthly["item_name"].str.casefold() == name.casefold()].copy()
+        for name in names
+    }
+
+
+def grouped(monthly: pd.DataFrame, names):
+    series = series_by_key(monthly)
+    return {name: series[name.casefold()] for name in names}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-item casefold scans vs one groupby.")
+    ap.add_argument("--items", type=int, default=5000)
+    ap.add_argument("--months", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--skip-scan", action="store_true", help="time only the groupby")
+    args = ap.parse_args()
+
+    monthly = to_monthly(synthetic_history(args.items, args.months, args.seed))
+    names = eligible_items(monthly)
+    print(f"{len(monthly)} monthly rows, {len(names)} eligible items")
+
+    t0 = time.perf_counter()
+    new = grouped(monthly, names)
+    t_group = time.perf_counter() - t0
+    print(f"{'single groupby':<20} {t_group:8.3f}s")
+
+    if args.skip_scan:
+        return
+
+    t0 = time.perf_counter()
+    old = per_item_scan(monthly, names)
+    t_scan = time.perf_counter() - t0
+    print(f"{'per-item scan':<20} {t_scan:8.3f}s  ({t_scan / t_group:.0f}x)")
+
+    for name in names:
+        pd.testing.assert_frame_equal(old[name], new[name])
+    print("series identical")
+
+
+if __name__ == "__main__":
+    main()
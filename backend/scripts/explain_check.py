@@ -0,0 +1,150 @@
+"""
+EXPLAIN the hot queries and fail when any of them full-scans a big table.
+
+A plan row with type=ALL on a table whose estimated rows >= --min-rows is a
+failure. Tiny tables are ignored: MySQL rightly prefers a scan there.
+
+Run from backend/ (after `python -m scripts.migrate`):
+  python -m scripts.explain_check
+  python -m scripts.explain_check --min-rows 500
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+from typing import List, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db  # noqa: E402
+from routers.sales import CATALOG_SQL  # noqa: E402
+from routers.orders import (  # noqa: E402
+    OR_DUPLICATE_SQL,
+    SOUVENIR_COUNT_SQL,
+    ORDER_LINES_SQL,
+    ORDER_SUMMARY_SQL,
+)
+from services.inventory_locks import LOCK_ITEM_SQL  # noqa: E402
+
+
+def hot_queries() -> List[Tuple[str, str, tuple]]:
+    """
+    (label, sql, sample params). Inline router SQL is mirrored here; keep in sync.
+    """
+    today = date.today()
+    month_start = today.replace(day=1)
+    year_start, year_end = date(today.year, 1, 1), date(today.year + 1, 1, 1)
+
+    return [
+        ("sales.catalog", CATALOG_SQL, ()),
+        ("sales.lock_item", LOCK_ITEM_SQL, (1,)),
+        ("orders.or_duplicate", OR_DUPLICATE_SQL, ("OR-0001", 1)),
+        ("orders.souvenir_count", SOUVENIR_COUNT_SQL, (1,)),
+        ("orders.lines", ORDER_LINES_SQL, (1,)),
+        ("orders.summary", ORDER_SUMMARY_SQL, (1,)),
+        (
+            "reports.monthly",
+            """
+            SELECT o.order_id, ol.quantity, i.name
+            FROM `order` o
+            JOIN order_line ol ON ol.order_id = o.order_id
+            JOIN item i        ON i.item_id = ol.item_id
+            WHERE o.transaction_date >= %s
+              AND o.transaction_date < %s
+            ORDER BY o.transaction_date ASC, o.order_id, ol.order_line_id
+            """,
+            (month_start, today),
+        ),
+        (
+            "dashboard.sales",
+            """
+            SELECT MONTH(transaction_date) AS month, SUM(total_price) AS total
+            FROM `order`
+            WHERE transaction_date >= %s AND transaction_date < %s
+            GROUP BY MONTH(transaction_date)
+            """,
+            (year_start, year_end),
+        ),
+        (
+            "dashboard.top_items",
+            """
+            SELECT i.name, SUM(ol.quantity) AS total_sold
+            FROM order_line ol
+            JOIN `order` o ON o.order_id = ol.order_id
+            JOIN item i ON i.item_id = ol.item_id
+            WHERE o.transaction_date >= %s AND o.transaction_date < %s
+            GROUP BY i.item_id
+            ORDER BY total_sold DESC
+            LIMIT 3
+            """,
+            (year_start, year_end),
+        ),
+        (
+            "stockcard.movements",
+            """
+            SELECT o.order_id, o.transaction_date, ol.order_line_id, ol.quantity
+            FROM order_line ol
+            JOIN `order` o ON o.order_id = ol.order_id
+            WHERE ol.item_id = %s
+            ORDER BY o.transaction_date ASC, o.order_id ASC
+            """,
+            (1,),
+        ),
+        (
+            "activity_logs.page",
+            """
+            SELECT al.log_id, al.action, al.timestamp
+            FROM activity_logs al
+            WHERE al.action = %s AND al.timestamp >= %s
+            ORDER BY al.timestamp DESC
+            LIMIT 10
+            """,
+            ("Login", month_start),
+        ),
+        (
+            "auth.login",
+            "SELECT u.user_id FROM `user` u WHERE u.email = %s",
+            ("someone@example.com",),
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-based full-scan check.")
+    parser.add_argument("--min-rows", type=int, default=1000, help="Ignore full scans of smaller tables")
+    args = parser.parse_args()
+
+    conn = get_db()
+    cur = conn.cursor(dictionary=True)
+    failures = []
+    try:
+        for label, sql, params in hot_queries():
+            cur.execute("EXPLAIN " + sql, params)
+            plan = cur.fetchall()
+            for row in plan:
+                scan = row.get("type")
+                est_rows = int(row.get("rows") or 0)
+                bad = scan == "ALL" and est_rows >= args.min_rows
+                flag = "FULL SCAN" if bad else "ok"
+                print(
+                    f"{label:<26} {str(row.get('table')):<12} type={str(scan):<7} "
+                    f"key={str(row.get('key')):<28} rows={est_rows:<8} {flag}"
+                )
+                if bad:
+                    failures.append((label, row.get("table")))
+    finally:
+        cur.close()
+        conn.close()
+
+    if failures:
+        print(f"\n{len(failures)} full scan(s): " + ", ".join(f"{l} on {t}" for l, t in failures))
+        sys.exit(1)
+    print("\nNo full scans on large tables.")
+
+
+if __name__ == "__main__":
+    main()
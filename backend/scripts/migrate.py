@@ -0,0 +1,202 @@
+"""
+Apply versioned SQL migrations from backend/migrations/ in order.
+
+Files are named NNNN_description.sql and applied once each; applied versions
+are recorded in the schema_migrations table together with a checksum.
+
+Run from backend/:
+  python -m scripts.migrate             # apply pending migrations
+  python -m scripts.migrate --status    # list applied / pending
+  python -m scripts.migrate --dry-run   # print what would run
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db  # noqa: E402
+
+MIGRATIONS_DIR = BACKEND_ROOT / "migrations"
+
+_FILE_RE = re.compile(r"^(\d{4})_([\w\-]+)\.sql$")
+_CREATE_INDEX_RE = re.compile(
+    r"^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\((.+)\)\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def discover() -> List[Tuple[str, str, Path]]:
+    """
+    [(version, name, path)] sorted by version.
+    """
+    out = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        m = _FILE_RE.match(path.name)
+        if not m:
+            print(f"Skipping unrecognised file name: {path.name}")
+            continue
+        out.append((m.group(1), m.group(2), path))
+    return out
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Split a migration file on ';' at end of line. '--' comment lines are dropped.
+    Good enough for our DDL files (no stored procedures / DELIMITER blocks).
+    """
+    lines = [ln for ln in sql.splitlines() if not ln.strip().startswith("--")]
+    statements, buf = [], []
+    for ln in lines:
+        buf.append(ln)
+        if ln.rstrip().endswith(";"):
+            stmt = "\n".join(buf).strip().rstrip(";").strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def ensure_tracking_table(cur) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    VARCHAR(16)  NOT NULL PRIMARY KEY,
+            name       VARCHAR(255) NOT NULL,
+            checksum   CHAR(64)     NOT NULL,
+            applied_at DATETIME     NOT NULL
+        )
+        """
+    )
+
+
+def applied_versions(cur) -> Dict[str, str]:
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return {str(v): c for v, c in cur.fetchall()}
+
+
+def _existing_indexes(cur, table: str) -> Dict[str, Tuple[bool, List[str]]]:
+    """
+    {index_name: (is_unique, [columns in order])} for a table in this schema.
+    """
+    cur.execute(
+        """
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (table,),
+    )
+    out: Dict[str, Tuple[bool, List[str]]] = {}
+    for name, non_unique, column in cur.fetchall():
+        unique, cols = out.get(name, (int(non_unique) == 0, []))
+        cols.append(str(column).lower())
+        out[name] = (unique, cols)
+    return out
+
+
+def index_already_covered(cur, stmt: str) -> str | None:
+    """
+    For CREATE INDEX statements: name of an existing index that makes this one
+    redundant (same name, or leading columns cover it), else None.
+    """
+    m = _CREATE_INDEX_RE.match(stmt)
+    if not m:
+        return None
+    want_unique = bool(m.group(1))
+    name, table = m.group(2), m.group(3)
+    want_cols = [
+        re.sub(r"\(.*\)", "", c).strip(" `").lower() for c in m.group(4).split(",")
+    ]
+
+    for existing, (unique, cols) in _existing_indexes(cur, table).items():
+        if existing == name:
+            return existing
+        if cols[: len(want_cols)] == want_cols and (unique or not want_unique):
+            return existing
+    return None
+
+
+def apply_file(conn, version: str, name: str, path: Path, dry_run: bool) -> None:
+    cur = conn.cursor()
+    try:
+        for stmt in split_statements(path.read_text(encoding="utf-8")):
+            covered_by = index_already_covered(cur, stmt)
+            first_line = stmt.splitlines()[0]
+            if covered_by:
+                print(f"  skip  {first_line}  (covered by {covered_by})")
+                continue
+            print(f"  {'would run' if dry_run else 'run'}   {first_line}")
+            if not dry_run:
+                cur.execute(stmt)
+
+        if not dry_run:
+            cur.execute(
+                """
+                INSERT INTO schema_migrations (version, name, checksum, applied_at)
+                VALUES (%s, %s, %s, NOW())
+                """,
+                (version, name, checksum(path)),
+            )
+            conn.commit()
+    finally:
+        cur.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned SQL migrations.")
+    parser.add_argument("--status", action="store_true", help="Show applied/pending and exit")
+    parser.add_argument("--dry-run", action="store_true", help="Print statements without running them")
+    args = parser.parse_args()
+
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        ensure_tracking_table(cur)
+        done = applied_versions(cur)
+    finally:
+        cur.close()
+
+    try:
+        pending = []
+        for version, name, path in discover():
+            if version in done:
+                state = "applied"
+                if done[version] != checksum(path):
+                    state = "applied (CHANGED since apply!)"
+                print(f"{version} {name}: {state}")
+            else:
+                print(f"{version} {name}: pending")
+                pending.append((version, name, path))
+
+        if args.status:
+            return
+        if not pending:
+            print("Nothing to apply.")
+            return
+
+        for version, name, path in pending:
+            print(f"Applying {version} {name} ...")
+            apply_file(conn, version, name, path, dry_run=args.dry_run)
+        print("Done." if not args.dry_run else "Dry run only; nothing changed.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
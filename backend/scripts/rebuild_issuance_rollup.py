@@ -0,0 +1,44 @@
+"""
+Recompute item_monthly_issuance (migration 0003) from the order lines,
+including the archive. Only rows whose total differs are written; months that
+no longer have issuances are set to 0.
+
+Needed after past orders or order lines were edited outside the app, and on
+SQLite databases seeded before the rollup existed. Safe to run while the app
+is up: finalizations wait for it and add on top of the rebuilt totals.
+
+Run from backend/:
+  python -m scripts.rebuild_issuance_rollup --dry-run
+  python -m scripts.rebuild_issuance_rollup
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db import get_db  # noqa: E402
+from services.issuance_rollup import rebuild  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--dry-run", action="store_true", help="count the differences, write nothing")
+    args = ap.parse_args()
+
+    conn = get_db()
+    try:
+        result = rebuild(conn, dry_run=args.dry_run)
+    finally:
+        conn.close()
+
+    verb = "would change" if args.dry_run else "changed"
+    print(f"item_monthly_issuance: {result['rows']} item-months, {result['changed']} rows {verb}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Fill the embedded SQLite database (DB_BACKEND=sqlite, see db_sqlite.py) with
+deterministic data for offline benchmarks and load tests.
+
+  - roles Admin / Staff and one admin user (admin@itrack.local / admin)
+  - every item in data/sales_history.csv, plus --extra-items synthetic ones
+  - the CSV history as finalized orders (one order line per CSV row)
+  - --orders extra random orders over the last --years years, a share of
+    them left pending (no OR_number / transaction_date)
+  - item_monthly_issuance rebuilt from those orders
+
+Same --seed and --anchor, same database. Run from backend/:
+  python -m scripts.seed_local_db --reset --orders 20000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from db_sqlite import connect_sqlite, sqlite_path  # noqa: E402
+from services.issuance_rollup import rebuild as rebuild_rollup  # noqa: E402
+
+HISTORY_CSV = BACKEND_ROOT / "data" / "sales_history.csv"
+CATEGORIES = ["Office Supplies", "Uniform", "Souvenir", "Books"]
+
+
+def load_history():
+    with HISTORY_CSV.open(newline="", encoding="utf-8") as fh:
+        return [
+            (row["Items"].strip(), row["Date"], float(row["Issuances"] or 0))
+            for row in csv.DictReader(fh)
+        ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--orders", type=int, default=5000, help="extra random orders")
+    ap.add_argument("--extra-items", type=int, default=0)
+    ap.add_argument("--years", type=int, default=3)
+    ap.add_argument("--pending-share", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--anchor", help="YYYY-MM-DD the random orders count back from (default: today)")
+    ap.add_argument("--reset", action="store_true", help="delete the database file first")
+    args = ap.parse_args()
+
+    path = sqlite_path()
+    if args.reset and path != ":memory:":
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    rng = random.Random(args.seed)
+    history = load_history()
+
+    conn = connect_sqlite(path)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+
+        cur.executemany("INSERT INTO roles (role_name) VALUES (%s)", [("Admin",), ("Staff",)])
+        try:
+            from passlib.hash import argon2
+
+            password = argon2.hash("admin")
+        except Exception:
+            password = "!"  # no passlib: seeded admin cannot log in
+        cur.execute(
+            "INSERT INTO `user` (roles_id, username, email, password) VALUES (%s, %s, %s, %s)",
+            (1, "admin", "admin@itrack.local", password),
+        )
+        user_id = cur.lastrowid
+
+        names = sorted({name for name, _, _ in history})
+        names += [f"SYNTHETIC ITEM {i:05d}" for i in range(args.extra_items)]
+        item_ids = {}
+        for name in names:
+            cur.execute(
+                """
+                INSERT INTO item (name, unit, category, price, stock_quantity, reorder_level)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    name,
+                    "pcs",
+                    rng.choice(CATEGORIES),
+                    round(rng.uniform(5, 500), 2),
+                    rng.randint(1_000, 100_000),
+                    rng.randint(5, 50),
+                ),
+            )
+            item_ids[name] = cur.lastrowid
+
+        def add_order(when, lines, finalized=True):
+            cur.execute(
+                """
+                INSERT INTO `order` (user_id, total_price, OR_number, customer_name, transaction_date)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (
+                    user_id,
+                    0,
+                    f"OR-{rng.randrange(10**9):09d}" if finalized else None,
+                    f"Customer {rng.randint(1, 500)}",
+                    when if finalized else None,
+                ),
+            )
+            order_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO order_line (order_id, item_id, quantity) VALUES (%s, %s, %s)",
+                [(order_id, item_id, qty) for item_id, qty in lines],
+            )
+
+        for name, day, qty in history:
+            if qty > 0:
+                when = datetime.fromisoformat(day).replace(hour=9)
+                add_order(when, [(item_ids[name], int(qty))])
+
+        ids = list(item_ids.values())
+        now = datetime.fromisoformat(args.anchor) if args.anchor else datetime.now().replace(microsecond=0)
+        span = timedelta(days=365 * args.years).total_seconds()
+        for _ in range(args.orders):
+            when = now - timedelta(seconds=rng.uniform(0, span))
+            lines = [(i, rng.randint(1, 10)) for i in rng.sample(ids, k=min(len(ids), rng.randint(1, 4)))]
+            add_order(when, lines, finalized=rng.random() >= args.pending_share)
+
+        # Header totals from the lines, like create_sale computes them
+        cur.execute(
+            """
+            UPDATE `order`
+            SET total_price = (
+                SELECT COALESCE(SUM(ol.quantity * i.price), 0)
+                FROM order_line ol
+                JOIN item i ON i.item_id = ol.item_id
+                WHERE ol.order_id = `order`.order_id
+            )
+            """
+        )
+        conn.commit()
+
+        rebuild_rollup(conn)
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"Seeded {path}: {len(item_ids)} items, {len(history) + args.orders} orders.")
+
+
+if __name__ == "__main__":
+    main()
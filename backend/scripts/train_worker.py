@@ -0,0 +1,221 @@
+"""
+Predictive training in its own process: fits the Prophet models, saves
+them as a new model version (models/, plus status and the forecast snapshot)
+and exits. The API never trains in-process; services/training_jobs.py
+starts this worker for every job and only loads the finished version
+afterwards.
+
+Limits:
+  PREDICTIVE_TRAIN_MEMORY_MB      resident memory (RSS) ceiling for the
+                                  worker together with its fit pool and
+                                  cmdstan processes (default 4096, 0 = none).
+                                  Polled every second; past it the worker
+                                  kills its children and exits with code 3.
+                                  Children are only counted where /proc
+                                  exists (Linux); elsewhere the worker's own
+                                  peak RSS is checked, and nothing on Windows.
+  PREDICTIVE_FIT_TIMEOUT_SECONDS  per-fit timeout (services/prophet_fit.py)
+
+One run at a time: the worker holds an OS lock (training_jobs.TRAIN_LOCK_FILE)
+while it trains and saves, and exits with code 4 without training if another
+process holds it.
+
+With --events the worker reports to its parent as JSON lines on stdout
+({"event": "progress" | "summary" | "error" | "already_running", ...};
+anything else the libraries print goes to stderr) and stops early when it
+reads "cancel", or end of input, on stdin. Models fitted until then are
+still saved.
+
+Run from backend/ (e.g. from cron instead of the in-app schedule):
+  python -m scripts.train_worker --source db
+  python -m scripts.train_worker --source csv --full
+  python -m scripts.train_worker --source db --item "Polo Shirt"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.append(str(BACKEND_ROOT))
+
+from services.predictive_service import (  # noqa: E402
+    train_from_csv_and_persist,
+    train_from_db_and_persist,
+)
+from services.training_jobs import training_lock  # noqa: E402
+
+TARGETS = {
+    "csv": train_from_csv_and_persist,
+    "db": train_from_db_and_persist,
+}
+
+MEMORY_MB = int(os.getenv("PREDICTIVE_TRAIN_MEMORY_MB", "4096"))
+
+
+MEMORY_POLL_SECONDS = 1.0
+
+
+def _process_tree() -> List[int]:
+    """This process and its descendants (Linux /proc); just this one elsewhere."""
+    root = os.getpid()
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return [root]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # "pid (comm) state ppid ..."; comm may contain spaces or parentheses
+        ppid = int(stat[stat.rindex(b")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    tree, todo = [], [root]
+    while todo:
+        pid = todo.pop()
+        tree.append(pid)
+        todo.extend(children.get(pid, ()))
+    return tree
+
+
+def _rss_bytes(pids: List[int]) -> int:
+    page = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+def _own_peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _watch_memory(mb: int, emit) -> None:
+    """Stop the worker and its children once their RSS passes `mb`."""
+    limit = mb * 1024 * 1024
+    has_proc = os.path.isdir("/proc")
+    while True:
+        time.sleep(MEMORY_POLL_SECONDS)
+        pids = _process_tree() if has_proc else [os.getpid()]
+        used = _rss_bytes(pids) if has_proc else _own_peak_rss_bytes()
+        if used is None:
+            logging.warning("train_worker: no memory ceiling on this platform")
+            return
+        if used <= limit:
+            continue
+        error = f"memory ceiling reached ({used // (1024 * 1024)} MB RSS > {mb} MB)"
+        if emit:
+            emit("error", error=error)
+        logging.error("train_worker: %s", error)
+        for pid in pids[1:]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        os._exit(3)
+
+
+def _event_stream():
+    """Private copy of stdout for events; fd 1 itself now goes to stderr."""
+    out = os.fdopen(os.dup(1), "w", buffering=1, encoding="utf-8")
+    os.dup2(2, 1)
+
+    def emit(event: str, **data) -> None:
+        out.write(json.dumps({"event": event, **data}, default=str) + "\n")
+
+    return emit
+
+
+def _watch_stdin(cancel: threading.Event) -> None:
+    # "cancel", or the parent going away (EOF), stops the run
+    for line in sys.stdin:
+        if line.strip() == "cancel":
+            break
+    cancel.set()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--source", choices=sorted(TARGETS), default="db")
+    ap.add_argument("--full", action="store_true", help="refit every item, even unchanged ones")
+    ap.add_argument("--item", action="append", dest="items", help="train only this item (repeatable)")
+    ap.add_argument("--events", action="store_true", help="JSON-lines progress on stdout, cancel on stdin")
+    ap.add_argument("--memory-mb", type=int, default=MEMORY_MB)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    emit = _event_stream() if args.events else None
+
+    lock = training_lock()
+    if not lock.acquire():
+        if emit:
+            emit("already_running")
+        logging.warning("train_worker: another process is already training")
+        return 4
+    if args.memory_mb > 0:
+        threading.Thread(
+            target=_watch_memory, args=(args.memory_mb, emit), daemon=True
+        ).start()
+
+    cancel = threading.Event()
+    if args.events:
+        threading.Thread(target=_watch_stdin, args=(cancel,), daemon=True).start()
+
+    def progress(done, total, result):
+        if emit is None:
+            return
+        failure = {result.name: result.error} if result is not None and result.error else None
+        emit("progress", done=done, total=total, failure=failure)
+
+    try:
+        summary = TARGETS[args.source](
+            full=args.full, progress=progress, cancel=cancel, items=args.items
+        )
+    except MemoryError:
+        error = "out of memory"
+        if emit:
+            emit("error", error=error)
+        logging.error("train_worker: %s", error)
+        return 3
+    except Exception as exc:
+        if emit:
+            emit("error", error=f"{type(exc).__name__}: {exc}")
+        logging.exception("train_worker: training failed")
+        return 1
+
+    if emit:
+        emit("summary", summary=summary)
+    else:
+        print(
+            f"{summary['status']}: {len(summary.get('trained', []))} trained, "
+            f"{len(summary.get('skipped', []))} skipped, cache size {summary.get('cache_size')}."
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
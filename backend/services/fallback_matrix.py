@@ -0,0 +1,93 @@
+# backend/services/fallback_matrix.py
+"""
+The sparse-item fallback for the whole catalog at once.
+
+predictive_service.fallback_next_month works on one item's monthly rows:
+the average of the last 3 non-zero months (last non-zero month if fewer,
+0 if none). For the catalog-wide endpoints this module lays the monthly
+history out as a dense item x month matrix (0 where an item has no row) and
+computes, for every item in one NumPy pass:
+
+  - n_months / total        rows observed and their sum
+  - sparse                  n_months < 12: forecasts use the fallback
+  - eligible                the training rule (>= 12 months or total >= 10)
+  - fallback                fallback_next_month for the item
+  - last_month              the item's last observed month, where its
+                            6-month fallback plan (the same value each
+                            month) starts
+
+Items are keyed by casefolded name like HistorySnapshot.series; months of
+two spellings of one name are summed.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+PLAN_MONTHS = 6
+MIN_PROPHET_MONTHS = 12
+
+
+@dataclass(frozen=True)
+class FallbackMatrix:
+    keys: List[str]            # row order: casefolded item names
+    months: pd.PeriodIndex     # column order
+    y: np.ndarray              # items x months, float, 0 where no row
+    n_months: np.ndarray       # rows observed per item
+    total: np.ndarray
+    sparse: np.ndarray         # bool
+    eligible: np.ndarray       # bool
+    fallback: np.ndarray       # int64
+    last_month: List[pd.Period]
+    index: Dict[str, int]
+
+    def row(self, item_name: str) -> int | None:
+        return self.index.get(item_name.casefold())
+
+
+def build_fallback_matrix(monthly: pd.DataFrame) -> FallbackMatrix:
+    """monthly: to_monthly() frame (item_name, month, y, ds)."""
+    keys_col = monthly["item_name"].str.casefold()
+    item_codes, keys = pd.factorize(keys_col, sort=False)
+    month_codes, months = pd.factorize(monthly["month"], sort=True)
+    n_items, n_cols = len(keys), len(months)
+
+    y_vals = monthly["y"].to_numpy(dtype=np.float64)
+    y = np.zeros((n_items, n_cols), dtype=np.float64)
+    np.add.at(y, (item_codes, month_codes), np.nan_to_num(y_vals))
+
+    # Row counts follow item_df["y"].dropna() in the per-item functions
+    observed = ~np.isnan(y_vals)
+    n_months = np.bincount(item_codes[observed], minlength=n_items)
+    total = y.sum(axis=1)
+    last_col = np.full(n_items, -1, dtype=np.int64)
+    np.maximum.at(last_col, item_codes, month_codes)
+
+    # Last three non-zero months: rank non-zero cells from the right
+    nonzero = y > 0
+    rank = np.cumsum(nonzero[:, ::-1], axis=1)[:, ::-1]
+    last = [np.where(nonzero & (rank == k), y, 0.0).sum(axis=1) for k in (1, 2, 3)]
+    count = nonzero.sum(axis=1)
+
+    # Same summation order (oldest first) and rounding (half to even) as
+    # fallback_next_month
+    avg3 = np.rint(((last[2] + last[1]) + last[0]) / 3)
+    fallback = np.where(count >= 3, avg3, np.where(count >= 1, np.rint(last[0]), 0.0))
+
+    keys = [str(k) for k in keys]
+    months = pd.PeriodIndex(months)
+    return FallbackMatrix(
+        keys=keys,
+        months=months,
+        y=y,
+        n_months=n_months,
+        total=total,
+        sparse=n_months < MIN_PROPHET_MONTHS,
+        eligible=(n_months >= 12) | (total >= 10),
+        fallback=fallback.astype(np.int64),
+        last_month=[months[c] for c in last_col],
+        index={k: i for i, k in enumerate(keys)},
+    )
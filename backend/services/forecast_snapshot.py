@@ -0,0 +1,183 @@
+# backend/services/forecast_snapshot.py
+"""
+Precomputed forecasts for the bulk endpoints (/predictive/forecast/all and
+/predictive/next_month/all).
+
+Every training run (train_from_db_and_persist, /predictive/train/all) ends
+with refresh(): the 6-month forecast of every item (forecast_catalog) and
+next month's forecast of every catalog item (next_month_forecasts) are
+computed once and written to exports/forecast_snapshot.json, atomically and
+with a version number that goes up on every write (under an OS lock, as
+API workers and the training worker all save snapshots). The endpoints only add
+current stock on top: restock plans are derived from the stored forecasts on
+each request (restock_summary), since stock moves with every order.
+
+freshness() reports when a snapshot was computed and whether it is stale:
+new history since (history cache version), models retrained since, catalog
+names changed, or a new month begun. ?recompute=true on the endpoints
+recomputes and saves the snapshot before serving it.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from services.predictive_service import (
+    EXPORT_DIR,
+    HistorySnapshot,
+    canonical_snapshot,
+    forecast_catalog,
+    get_history_snapshot,
+    get_train_status,
+    load_history_from_excel,
+    load_stock_from_db,
+    next_month_forecasts,
+)
+from utils.atomic_file import FileLock, replace_atomically
+
+SNAPSHOT_FILE = EXPORT_DIR / "forecast_snapshot.json"
+LOCK_FILE = EXPORT_DIR / "forecast_snapshot.lock"
+FORMAT_VERSION = 1
+
+_LOCK = threading.Lock()
+# mtime_ns, snapshot: the last file read or written
+_STATE: Dict[str, Any] = {}
+
+
+def _history() -> HistorySnapshot:
+    hist = get_history_snapshot()
+    if hist.empty:
+        hist = HistorySnapshot.from_frame(load_history_from_excel())
+    return hist
+
+
+def _catalog_key(names: List[str]) -> str:
+    keys = sorted({str(n).strip().casefold() for n in names})
+    return hashlib.sha1("\n".join(keys).encode("utf-8")).hexdigest()
+
+
+def _current_month() -> str:
+    return str(pd.Timestamp.today().to_period("M"))
+
+
+def compute(history: Optional[HistorySnapshot] = None, stock_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Forecast every item from the current history and models (not saved)."""
+    t0 = time.perf_counter()
+    history = history if history is not None else _history()
+    if stock_df is None:
+        stock_df = load_stock_from_db()
+    catalog = stock_df["item_name"].tolist()
+
+    forecast_all = forecast_catalog(history)
+    next_month_all: List[Dict[str, Any]] = []
+    if catalog:
+        canonical = canonical_snapshot(history, catalog)
+        if not canonical.empty:
+            next_month_all = next_month_forecasts(canonical)
+
+    status = get_train_status()
+    return {
+        "format": FORMAT_VERSION,
+        "generated_utc": datetime.now(timezone.utc).isoformat(),
+        "month": _current_month(),
+        "history_version": history.version,
+        "models_trained_utc": status.get("last_trained_utc"),
+        "model_version": status.get("model_version"),
+        "catalog_key": _catalog_key(catalog),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "forecast_all": forecast_all,
+        "next_month_all": next_month_all,
+    }
+
+
+def _load_locked() -> Optional[Dict[str, Any]]:
+    try:
+        mtime = SNAPSHOT_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _STATE.get("mtime_ns") == mtime:
+        return _STATE["snapshot"]
+    try:
+        obj = json.loads(SNAPSHOT_FILE.read_text())
+    except Exception:
+        return None  # unreadable: recomputed on demand
+    if not isinstance(obj, dict) or obj.get("format") != FORMAT_VERSION:
+        return None
+    _STATE.update(mtime_ns=mtime, snapshot=obj)
+    return obj
+
+
+def load() -> Optional[Dict[str, Any]]:
+    """The saved snapshot, or None if there is none (yet)."""
+    with _LOCK:
+        return _load_locked()
+
+
+def save(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Write `snapshot` as the next version (write to a temp file, then rename)."""
+    with _LOCK, FileLock(LOCK_FILE):
+        previous = _load_locked()
+        snapshot["version"] = int((previous or {}).get("version", 0)) + 1
+        replace_atomically(SNAPSHOT_FILE, lambda tmp: tmp.write_text(json.dumps(snapshot)))
+        _STATE.update(mtime_ns=SNAPSHOT_FILE.stat().st_mtime_ns, snapshot=snapshot)
+    return snapshot
+
+
+def refresh() -> Dict[str, Any]:
+    return save(compute())
+
+
+def current(recompute: bool = False) -> Dict[str, Any]:
+    """The saved snapshot; computed and saved first if missing or recompute=True."""
+    snapshot = None if recompute else load()
+    return snapshot if snapshot is not None else refresh()
+
+
+def refresh_after_training() -> Dict[str, Any]:
+    """
+    refresh() at the end of a training run. The models are saved by then, so
+    a failure here is reported in the result instead of raised; the
+    endpoints serve the previous snapshot (flagged stale) meanwhile.
+    """
+    try:
+        snapshot = refresh()
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+    return {
+        "status": "ok",
+        "version": snapshot["version"],
+        "items": len(snapshot["forecast_all"]),
+        "seconds": snapshot["seconds"],
+    }
+
+
+def freshness(snapshot: Dict[str, Any], stock_df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """When `snapshot` was computed and what has changed since (stale_reasons)."""
+    reasons = []
+    try:
+        if get_history_snapshot().version != snapshot.get("history_version"):
+            reasons.append("history")
+    except Exception:
+        pass  # history unavailable: nothing to compare against
+    # model_version also changes when a cancelled run saves what it fitted
+    if get_train_status().get("model_version") != snapshot.get("model_version"):
+        reasons.append("models")
+    if stock_df is not None and _catalog_key(stock_df["item_name"].tolist()) != snapshot.get("catalog_key"):
+        reasons.append("catalog")
+    if _current_month() != snapshot.get("month"):
+        reasons.append("month")
+    return {
+        "version": snapshot.get("version"),
+        "generated_utc": snapshot.get("generated_utc"),
+        "history_version": snapshot.get("history_version"),
+        "models_trained_utc": snapshot.get("models_trained_utc"),
+        "model_version": snapshot.get("model_version"),
+        "stale": bool(reasons),
+        "stale_reasons": reasons,
+    }
@@ -0,0 +1,239 @@
+# backend/services/history_cache.py
+"""
+Issuance history for the predictive module (monthly totals per item, as a
+"daily" frame dated on the 1st and as the to_monthly() frame), kept in memory
+and on disk and advanced by a watermark instead of re-reading everything on
+every call.
+
+The source is the item_monthly_issuance rollup (migration 0003,
+services/issuance_rollup.py). The watermark is a cutoff on its updated_at:
+a load reads only the rollup rows stamped since the previous cutoff and
+replaces them in the cached rows, then moves the cutoff to DB NOW() minus
+HISTORY_CACHE_SETTLE_SECONDS (default 120). Rows stamped inside that window
+are read again on the next call, so transactions still in flight and replica
+lag (DB_REPLICA_MAX_LAG) are never skipped. Item names are re-read on every
+load (one row per item), so renames show up right away.
+
+Edits the rollup does not see (order lines changed in the database by hand)
+need scripts/rebuild_issuance_rollup.py; its writes are stamped and picked up
+like any other. load_daily(rebuild=True) (POST /predictive/history/rebuild)
+re-reads the whole rollup; that also happens every
+HISTORY_CACHE_REBUILD_HOURS (default 24) and when the cache on disk was built
+from a different database.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import joblib
+import pandas as pd
+
+from db import get_db, use_sqlite
+from utils.atomic_file import replace_atomically
+
+CACHE_FILE = Path(__file__).resolve().parents[1] / "exports" / "history_cache.pkl"
+FORMAT_VERSION = 3
+
+_SETTLE = float(os.getenv("HISTORY_CACHE_SETTLE_SECONDS", "120"))
+_REBUILD_HOURS = float(os.getenv("HISTORY_CACHE_REBUILD_HOURS", "24"))
+
+DAILY_COLUMNS = ["date", "item_name", "quantity"]
+ROLLUP_COLUMNS = ["item_id", "month", "quantity"]
+
+DB_NOW_SQL = "SELECT NOW()"
+
+ITEM_NAMES_SQL = "SELECT item_id, name FROM item"
+
+FULL_ROLLUP_SQL = "SELECT item_id, month, quantity FROM item_monthly_issuance"
+
+CHANGED_ROLLUP_SQL = """
+    SELECT item_id, month, quantity
+    FROM item_monthly_issuance
+    WHERE updated_at >= %s
+"""
+
+_LOCK = threading.Lock()
+# source, cutoff, built_at, data_version, rollup, names, daily, monthly, last_refresh
+_STATE: Dict[str, Any] = {}
+
+
+def _source_id() -> str:
+    """Which database the cache describes; a mismatch forces a rebuild."""
+    if use_sqlite():
+        from db_sqlite import sqlite_path
+
+        return f"sqlite:{sqlite_path()}"
+    return "mysql:{}:{}/{}".format(
+        os.getenv("DB_HOST", "127.0.0.1"), os.getenv("DB_PORT", "3306"), os.getenv("DB_NAME", "itrack")
+    )
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _rollup_frame(rows) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+    df["item_id"] = df["item_id"].astype("int64")
+    df["month"] = pd.to_datetime(df["month"])
+    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(float)
+    return df.set_index(["item_id", "month"])
+
+
+def _build_frames(rollup: pd.DataFrame, names: Dict[int, str]) -> None:
+    """rollup + item names -> the cached monthly and daily frames."""
+    from services.predictive_service import monthly_frame
+
+    df = rollup[rollup["quantity"] != 0].reset_index()
+    df["item_name"] = df["item_id"].map(names)
+    df = df.dropna(subset=["item_name"])  # items deleted since
+    df["item_name"] = df["item_name"].astype(str).str.strip()
+
+    # Rollup rows are already months; only items sharing a name are merged
+    monthly = monthly_frame(df.rename(columns={"month": "ds", "quantity": "y"}))
+    daily = monthly.rename(columns={"y": "quantity"})
+    daily["date"] = daily["ds"].dt.date
+    _STATE["monthly"] = monthly
+    _STATE["daily"] = daily.sort_values("date", kind="stable").reset_index(drop=True)[DAILY_COLUMNS]
+    # Derived from the content, so every process holding the same history
+    # (each refreshes on its own) reports the same version
+    row_hashes = pd.util.hash_pandas_object(_STATE["monthly"], index=False).to_numpy()
+    _STATE["data_version"] = hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+
+def _load_from_disk(source: str) -> None:
+    if _STATE or not CACHE_FILE.exists():
+        return
+    try:
+        obj = joblib.load(CACHE_FILE)
+    except Exception:
+        return  # unreadable cache: rebuilt below
+    if isinstance(obj, dict) and obj.get("format") == FORMAT_VERSION and obj.get("source") == source:
+        _STATE.update(obj)
+
+
+def _save_to_disk() -> None:
+    # Only a shortcut for the next start; the refresh succeeded either way
+    try:
+        replace_atomically(CACHE_FILE, lambda tmp: joblib.dump({**_STATE, "format": FORMAT_VERSION}, tmp))
+    except Exception as exc:
+        logging.warning("History cache: could not save %s: %s", CACHE_FILE, exc)
+
+
+def _needs_rebuild(source: str, now_utc: datetime) -> bool:
+    if not _STATE or _STATE.get("source") != source:
+        return True
+    if _REBUILD_HOURS <= 0:
+        return False
+    return now_utc - _STATE["built_at"] >= timedelta(hours=_REBUILD_HOURS)
+
+
+def _refresh(rebuild: bool) -> None:
+    source = _source_id()
+    _load_from_disk(source)
+    now_utc = datetime.now(timezone.utc)
+    full = rebuild or _needs_rebuild(source, now_utc)
+
+    t0 = time.perf_counter()
+    conn = get_db(readonly=True)
+    cur = conn.cursor()
+    try:
+        cur.execute(DB_NOW_SQL)
+        db_now = _as_datetime(cur.fetchone()[0]).replace(microsecond=0)
+        cutoff = db_now - timedelta(seconds=_SETTLE)
+
+        cur.execute(ITEM_NAMES_SQL)
+        names = {int(i): str(n) for i, n in cur.fetchall()}
+
+        if full:
+            cur.execute(FULL_ROLLUP_SQL)
+        else:
+            cur.execute(CHANGED_ROLLUP_SQL, (_STATE["cutoff"],))
+        changed = _rollup_frame(cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+
+    if full:
+        _STATE.clear()
+        _STATE.update(source=source, built_at=now_utc, rollup=changed)
+    elif not changed.empty:
+        rollup = _STATE["rollup"]
+        _STATE["rollup"] = pd.concat([rollup[~rollup.index.isin(changed.index)], changed])
+
+    dirty = full or not changed.empty or names != _STATE.get("names")
+    if dirty:
+        _STATE["names"] = names
+        _build_frames(_STATE["rollup"], names)
+    _STATE["cutoff"] = max(cutoff, _STATE.get("cutoff", cutoff))
+    _STATE["last_refresh"] = {
+        "mode": "rebuild" if full else "delta",
+        "rows": int(len(changed)),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "at_utc": now_utc.isoformat(),
+        # DB clock at the read: everything committed before it is in the frames
+        "db_now": db_now.isoformat(sep=" "),
+    }
+    if dirty:
+        _save_to_disk()
+
+
+def load_daily(rebuild: bool = False) -> pd.DataFrame:
+    """
+    Issuances per item and month, in load_history_from_db() form.
+    Columns: date (datetime.date, 1st of the month), item_name (str),
+    quantity (float).
+    """
+    with _LOCK:
+        _refresh(rebuild)
+        return _STATE["daily"].copy()
+
+
+def load_monthly(rebuild: bool = False) -> pd.DataFrame:
+    """Same history as load_daily(), in predictive_service.to_monthly() form."""
+    with _LOCK:
+        _refresh(rebuild)
+        return _STATE["monthly"].copy()
+
+
+def load_versioned(rebuild: bool = False) -> Tuple[str, pd.DataFrame]:
+    """
+    (version, monthly frame) without copying. The version changes whenever
+    the history does and is the same in every process holding the same
+    history; the frame itself is never modified in place, so callers may
+    keep it as long as they treat it as read-only.
+    """
+    with _LOCK:
+        _refresh(rebuild)
+        return _version(), _STATE["monthly"]
+
+
+def _version() -> str:
+    return _STATE["data_version"]
+
+
+def cache_info() -> Dict[str, Any]:
+    with _LOCK:
+        if not _STATE:
+            return {"loaded": False, "path": str(CACHE_FILE)}
+        return {
+            "loaded": True,
+            "path": str(CACHE_FILE),
+            "source": _STATE["source"],
+            "watermark": {"updated_at": _STATE["cutoff"].isoformat(sep=" ")},
+            "version": _version(),
+            "built_at_utc": _STATE["built_at"].isoformat(),
+            "rollup_rows": int(len(_STATE["rollup"])),
+            "daily_rows": int(len(_STATE["daily"])),
+            "monthly_rows": int(len(_STATE["monthly"])),
+            "last_refresh": _STATE.get("last_refresh"),
+        }
@@ -0,0 +1,166 @@
+# backend/services/issuance_rollup.py
+"""
+item_monthly_issuance: issued quantity per (item_id, month), maintained at
+finalization (migration 0003).
+
+An order counts once it has a transaction_date, in the month of that date.
+add_or and set_joborder_date call record_order() in their own transaction
+right after setting it; add_or on an order that already had a date first
+takes it out of its old month. delete_order takes a finalized order out.
+
+Rows are upserted in ascending item_id order, after the item rows are locked
+(services/inventory_locks.py), so the rollup adds no new lock-order cycles.
+Every write stamps updated_at, which services/history_cache.py uses as its
+watermark. Rows are never deleted, only set to 0.
+
+rebuild() recomputes the table from order lines (incl. the archive); see
+scripts/rebuild_issuance_rollup.py.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from db import prepared_cursor
+from services.order_archive import ALL_LINES, ALL_ORDERS, as_date
+
+ORDER_DATE_SQL = "SELECT transaction_date FROM `order` WHERE order_id = %s"
+
+ORDER_ITEM_TOTALS_SQL = """
+    SELECT item_id, SUM(quantity) AS quantity
+    FROM order_line
+    WHERE order_id = %s
+    GROUP BY item_id
+    ORDER BY item_id
+"""
+
+ADD_ISSUANCE_SQL = """
+    INSERT INTO item_monthly_issuance (item_id, month, quantity, updated_at)
+    VALUES (%s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        quantity = quantity + VALUES(quantity),
+        updated_at = VALUES(updated_at)
+"""
+
+SET_ISSUANCE_SQL = """
+    INSERT INTO item_monthly_issuance (item_id, month, quantity, updated_at)
+    VALUES (%s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        quantity = VALUES(quantity),
+        updated_at = VALUES(updated_at)
+"""
+
+LOCK_ROLLUP_SQL = """
+    SELECT item_id, month, quantity
+    FROM item_monthly_issuance
+    ORDER BY item_id, month
+    FOR UPDATE
+"""
+
+RECOMPUTE_SQL = f"""
+    SELECT ol.item_id,
+           YEAR(o.transaction_date) AS yr,
+           MONTH(o.transaction_date) AS mo,
+           SUM(ol.quantity) AS quantity
+    FROM {ALL_LINES} ol
+    JOIN {ALL_ORDERS} o ON o.order_id = ol.order_id
+    WHERE o.transaction_date IS NOT NULL
+    GROUP BY ol.item_id, YEAR(o.transaction_date), MONTH(o.transaction_date)
+"""
+
+
+def month_start(value) -> date:
+    d = as_date(value)
+    return d.replace(day=1)
+
+
+def _value(row, key: str, idx: int):
+    return row[key] if isinstance(row, dict) else row[idx]
+
+
+def _order_changes(cursor, order_id: int, sign: int, when) -> List[Tuple[int, date, int]]:
+    if when is None:
+        cursor.execute(ORDER_DATE_SQL, (order_id,))
+        row = cursor.fetchone()
+        when = _value(row, "transaction_date", 0) if row else None
+        if when is None:
+            return []  # still pending: nothing issued yet
+    month = month_start(when)
+    cursor.execute(ORDER_ITEM_TOTALS_SQL, (order_id,))
+    return [
+        (int(_value(r, "item_id", 0)), month, sign * int(_value(r, "quantity", 1)))
+        for r in cursor.fetchall()
+    ]
+
+
+def record_order(conn, order_id: int, sign: int = 1, when: Optional[datetime] = None) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) an order's lines in the rollup, in the
+    month of `when` (default: the order's current transaction_date). Runs in
+    the caller's transaction.
+    """
+    cur = conn.cursor()
+    try:
+        changes = _order_changes(cur, order_id, sign, when)
+    finally:
+        cur.close()
+    if not changes:
+        return
+    cur = prepared_cursor(conn, ADD_ISSUANCE_SQL)
+    try:
+        for params in changes:
+            cur.execute(ADD_ISSUANCE_SQL, params)
+    finally:
+        cur.close()
+
+
+async def record_order_async(cursor, order_id: int, sign: int = 1, when=None) -> None:
+    """Same as record_order on an aiomysql cursor."""
+    if when is None:
+        await cursor.execute(ORDER_DATE_SQL, (order_id,))
+        row = await cursor.fetchone()
+        when = _value(row, "transaction_date", 0) if row else None
+        if when is None:
+            return
+    month = month_start(when)
+    await cursor.execute(ORDER_ITEM_TOTALS_SQL, (order_id,))
+    for r in await cursor.fetchall():
+        await cursor.execute(
+            ADD_ISSUANCE_SQL,
+            (int(_value(r, "item_id", 0)), month, sign * int(_value(r, "quantity", 1))),
+        )
+
+
+def rebuild(conn, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Recompute every (item_id, month) from the order lines and write the rows
+    that differ (stale ones are set to 0). The rollup rows stay locked for the
+    whole transaction, so finalizations queue behind it and land on top of the
+    recomputed totals.
+    """
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        cur.execute(LOCK_ROLLUP_SQL)
+        current = {(int(i), as_date(m)): int(q) for i, m, q in cur.fetchall()}
+
+        cur.execute(RECOMPUTE_SQL)
+        wanted = {(int(i), date(int(y), int(m), 1)): int(q) for i, y, m, q in cur.fetchall()}
+
+        changes = [(i, m, q) for (i, m), q in wanted.items() if current.get((i, m)) != q]
+        changes += [(i, m, 0) for (i, m), q in current.items() if q != 0 and (i, m) not in wanted]
+        changes.sort()
+
+        if dry_run:
+            conn.rollback()
+        else:
+            if changes:
+                cur.executemany(SET_ISSUANCE_SQL, changes)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return {"rows": len(wanted), "changed": len(changes), "dry_run": int(dry_run)}
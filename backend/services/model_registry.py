@@ -0,0 +1,232 @@
+# backend/services/model_registry.py
+"""
+The trained Prophet models of this process, loaded once and shared by
+/predictive (services/predictive_service.py) and /predict
+(utils/predict_core.py).
+
+The models are read on first use (or at startup) from the model version the
+status file points at, or from the unversioned model.pkl before the first
+versioned save. reload_if_changed() swaps in a newer version saved by any
+worker's training; the scheduler tick calls it, so both routers serve
+retrained models without a restart. Training and on-demand fits add models
+with put().
+
+memory() reports each model's size (its pickled size, which tracks what a
+Prophet model holds: the fitted parameters and the training frame). It is
+measured on first request per model, not at load.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import pickle
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+# Model persistence (written by predictive_service.save_models_to_disk).
+# Every save writes a new version to MODEL_DIR (model-<version>.pkl plus its
+# fingerprints, model-<version>.json) and then points STATUS_FILE at it;
+# files are never rewritten in place, so a reader sees the old version or the
+# new one, never half of one. MODEL_PKL gets a copy of the latest version
+# (same temp-file-then-rename) for older readers.
+MODEL_PKL = BACKEND_ROOT / "model.pkl"
+MODEL_DIR = BACKEND_ROOT / "models"
+STATUS_FILE = BACKEND_ROOT / "exports" / "predictive_status.json"
+# Per-item series fingerprints of the models in MODEL_PKL before versioned
+# artifacts (incremental training); still read when no version is recorded
+FINGERPRINT_FILE = BACKEND_ROOT / "model_fingerprints.json"
+
+# Key a model file holding one bare Prophet model (not a per-item dict) is
+# served under
+DEFAULT_MODEL = "default_model"
+
+_LOCK = threading.Lock()
+# one load at a time, so concurrent first uses read the file once
+_LOAD_LOCK = threading.RLock()
+# models: key (item name, casefolded) -> Prophet
+# fingerprints: key -> {"fingerprint": ..., "trained_utc": ...}
+# version / mtime_ns / path / loaded_utc: what the models were loaded from
+_STATE: Dict[str, Any] = {"models": {}, "fingerprints": {}, "loaded": False}
+# key -> (id(model), pickled bytes), filled by memory()
+_SIZES: Dict[str, Tuple[int, int]] = {}
+
+
+def read_status() -> Dict[str, Any]:
+    try:
+        return json.loads(STATUS_FILE.read_text())
+    except Exception:
+        return {}
+
+
+def _key(name: str) -> str:
+    return str(name).casefold()
+
+
+def _model_files(status: Dict[str, Any]) -> Tuple[Optional[str], Path, Path]:
+    """(version, models, fingerprints) the status points at; unversioned MODEL_PKL otherwise."""
+    version, name = status.get("model_version"), status.get("model_file")
+    if version and name and (MODEL_DIR / name).exists():
+        path = MODEL_DIR / name
+        return version, path, path.with_suffix(".json")
+    return None, MODEL_PKL, FINGERPRINT_FILE
+
+
+def load() -> Dict[str, Any]:
+    """
+    Load the current model version (if any) and swap it in.
+
+    The models and their fingerprints are read completely first and then
+    replace the previous ones in one step, so requests keep forecasting with
+    the old models meanwhile. If the file cannot be read the models already
+    loaded stay in place.
+    """
+    with _LOAD_LOCK:
+        return _load_locked()
+
+
+def _load_locked() -> Dict[str, Any]:
+    version, path, fp_path = _model_files(read_status())
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+        obj = joblib.load(path)
+    except Exception as exc:
+        if not isinstance(exc, FileNotFoundError):
+            logging.warning("Could not load models from %s (keeping the loaded ones): %s", path, exc)
+        _STATE["loaded"] = True
+        return _STATE["models"]
+    if isinstance(obj, dict):
+        models = {_key(k): v for k, v in obj.items()}
+    elif hasattr(obj, "predict"):
+        models = {DEFAULT_MODEL: obj}
+    else:
+        models = {}
+
+    # Fingerprints only describe models that are still loaded; a missing or
+    # unreadable file just means the next incremental run refits everything.
+    fingerprints: Dict[str, Dict[str, str]] = {}
+    try:
+        obj = json.loads(fp_path.read_text())
+        fingerprints = {_key(k): v for k, v in obj.items() if _key(k) in models}
+    except Exception:
+        pass
+
+    with _LOCK:
+        _STATE.update(
+            models=models,
+            fingerprints=fingerprints,
+            loaded=True,
+            version=version,
+            mtime_ns=mtime_ns,
+            path=str(path),
+            loaded_utc=datetime.now(timezone.utc).isoformat(),
+        )
+    return models
+
+
+def ensure_loaded() -> Dict[str, Any]:
+    """The loaded models; load() on first use."""
+    if not _STATE["loaded"]:
+        with _LOAD_LOCK:
+            if not _STATE["loaded"]:
+                _load_locked()
+    return _STATE["models"]
+
+
+def reload_if_changed() -> bool:
+    """load() if a newer model version was saved since the last load."""
+    version, path, _ = _model_files(read_status())
+    if version is not None:
+        if _STATE["loaded"] and version == _STATE.get("version"):
+            return False
+    else:
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if _STATE["loaded"] and mtime_ns == _STATE.get("mtime_ns"):
+            return False
+    before = (_STATE.get("version"), _STATE.get("mtime_ns"))
+    load()
+    return (_STATE.get("version"), _STATE.get("mtime_ns")) != before
+
+
+def models() -> Dict[str, Any]:
+    """All loaded models by key. Read it, don't keep it: a reload replaces it."""
+    return ensure_loaded()
+
+
+def get(name: str) -> Optional[Any]:
+    return ensure_loaded().get(_key(name))
+
+
+def names() -> List[str]:
+    return sorted(ensure_loaded())
+
+
+def fingerprints() -> Dict[str, Dict[str, str]]:
+    ensure_loaded()
+    return _STATE["fingerprints"]
+
+
+def fingerprint(name: str) -> Optional[Dict[str, str]]:
+    return fingerprints().get(_key(name))
+
+
+def put(name: str, model: Any, fingerprint: Optional[Dict[str, str]] = None) -> None:
+    """Add or replace one model (training, on-demand fits)."""
+    ensure_loaded()
+    with _LOCK:
+        _STATE["models"][_key(name)] = model
+        if fingerprint is not None:
+            _STATE["fingerprints"][_key(name)] = fingerprint
+
+
+def mark_saved(version: str) -> None:
+    """The loaded models were just saved as `version`; no reload needed for it."""
+    with _LOCK:
+        _STATE.update(version=version, mtime_ns=None, path=str(MODEL_DIR / f"model-{version}.pkl"))
+
+
+def loaded_version() -> Optional[str]:
+    return _STATE.get("version")
+
+
+def _model_bytes(model: Any) -> int:
+    try:
+        return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def memory() -> Dict[str, Any]:
+    """Size of every loaded model, largest first, and the total."""
+    current = dict(ensure_loaded())
+    sizes: Dict[str, int] = {}
+    for key, model in current.items():
+        cached = _SIZES.get(key)
+        if cached is None or cached[0] != id(model):
+            cached = (id(model), _model_bytes(model))
+            _SIZES[key] = cached
+        sizes[key] = cached[1]
+    for key in set(_SIZES) - set(current):
+        _SIZES.pop(key, None)
+    return {
+        "total_bytes": sum(sizes.values()),
+        "models": dict(sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)),
+    }
+
+
+def info() -> Dict[str, Any]:
+    return {
+        "count": len(_STATE["models"]),
+        "loaded": _STATE["loaded"],
+        "version": _STATE.get("version"),
+        "path": _STATE.get("path"),
+        "loaded_utc": _STATE.get("loaded_utc"),
+    }
@@ -0,0 +1,104 @@
+# backend/services/order_archive.py
+"""
+Which tables a read of `order` / order_line has to look at.
+
+Closed years are moved to order_archive / order_line_archive by
+scripts/archive_orders.py (migration 0002). order_archive_state.archived_before
+is the boundary: finalized orders dated before it are in the archive, the rest
+(including every pending order) in the hot tables.
+
+Readers call order_tables(start) with the first date they need:
+  - start on/after the boundary (or nothing archived yet) -> hot tables only
+  - start before it, or None (whole history)              -> hot + archive
+
+The boundary is cached for ARCHIVE_BOUNDARY_TTL seconds (default 60). The
+archive script raises it *before* moving rows and then waits that long (plus
+a second), so every process has re-read it before the first row moves; a
+reader may union the archive for a while without needing to, but it never
+misses rows. The script and the API must therefore run with the same
+ARCHIVE_BOUNDARY_TTL.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+from db import get_db
+
+HOT_ORDERS = "`order`"
+HOT_LINES = "order_line"
+ALL_ORDERS = "(SELECT * FROM `order` UNION ALL SELECT * FROM order_archive)"
+ALL_LINES = "(SELECT * FROM order_line UNION ALL SELECT * FROM order_line_archive)"
+
+BOUNDARY_SQL = "SELECT archived_before FROM order_archive_state WHERE id = 1"
+
+BOUNDARY_TTL = float(os.getenv("ARCHIVE_BOUNDARY_TTL", "60"))
+_LOCK = threading.Lock()
+_CACHE = {"value": None, "loaded_at": 0.0}
+
+
+def as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _load_boundary() -> Optional[date]:
+    try:
+        conn = get_db()
+    except Exception:
+        return None
+    cur = conn.cursor()
+    try:
+        cur.execute(BOUNDARY_SQL)
+        row = cur.fetchone()
+        return as_date(row[0]) if row else None
+    except Exception:
+        # Migration 0002 not applied yet: nothing is archived.
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def archived_before() -> Optional[date]:
+    """The archive boundary, or None when nothing has been archived."""
+    now = time.monotonic()
+    with _LOCK:
+        if now - _CACHE["loaded_at"] < BOUNDARY_TTL:
+            return _CACHE["value"]
+    value = _load_boundary()
+    with _LOCK:
+        _CACHE["value"] = value
+        _CACHE["loaded_at"] = now
+    return value
+
+
+def invalidate_boundary_cache() -> None:
+    with _LOCK:
+        _CACHE["loaded_at"] = 0.0
+
+
+def reaches_archive(start=None) -> bool:
+    boundary = archived_before()
+    if boundary is None:
+        return False
+    start = as_date(start)
+    return start is None or start < boundary
+
+
+def order_tables(start=None) -> Tuple[str, str]:
+    """
+    (orders, lines) table expressions for a read starting at `start`
+    (None = whole history). Use as `FROM {orders} o JOIN {lines} ol ...`.
+    """
+    if reaches_archive(start):
+        return ALL_ORDERS, ALL_LINES
+    return HOT_ORDERS, HOT_LINES
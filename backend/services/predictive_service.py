@@ -2,16 +2,35 @@
 from __future__ import annotations
 
 import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 import json
 
+import numpy as np
 import pandas as pd
-from prophet import Prophet
 import joblib
 
 from db import get_db
+from services import history_cache, model_registry
+from services.model_registry import MODEL_DIR, MODEL_PKL, STATUS_FILE, read_status as _read_status
+from services.fallback_matrix import PLAN_MONTHS, FallbackMatrix, build_fallback_matrix
+from services.prophet_fit import (
+    FitResult,
+    fit_items,
+    fit_monthly_prophet as _fit_monthly_prophet,
+    series_fingerprint,
+    summarize_fits,
+    train_workers,
+)
+from utils.atomic_file import replace_atomically as _replace_atomically
 
 # -----------------------------------
 # Paths (change filename if needed)
@@ -22,14 +41,18 @@ DATA_FILE = (
 EXPORT_DIR = Path(__file__).resolve().parents[1] / "exports"
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 
-# Model persistence
-MODEL_PKL = Path(__file__).resolve().parents[1] / "model.pkl"
-STATUS_FILE = EXPORT_DIR / "predictive_status.json"
+# Model versions kept in MODEL_DIR (the latest and a few before it, for
+# workers still loading one)
+MODEL_KEEP_VERSIONS = max(1, int(os.getenv("PREDICTIVE_MODEL_KEEP_VERSIONS", "3")))
 
-# -----------------------------------
-# Simple in-memory model cache
-# -----------------------------------
-ITEM_MODELS: Dict[str, Prophet] = {}  # key: item_name (lowercase), value: trained Prophet
+# Incremental training refits a model whose series is unchanged once it is
+# older than this many days (0 = never refit unchanged items)
+MODEL_MAX_AGE_DAYS = float(os.getenv("PREDICTIVE_MODEL_MAX_AGE_DAYS", "30"))
+
+# The trained models themselves live in services/model_registry.py
+
+# Fit timings of the last training run (see prophet_fit.summarize_fits)
+LAST_TRAIN_REPORT: Dict[str, Any] = {}
 
 
 # -----------------------------------
@@ -128,44 +151,53 @@ def load_history_from_excel(
 
 
 # -----------------------------------
-# Load history directly from DB (order/order_line/item)
+# Load history from DB (item_monthly_issuance rollup)
 # -----------------------------------
-def load_history_from_db() -> pd.DataFrame:
+def load_history_from_db(rebuild: bool = False) -> pd.DataFrame:
+    """
+    Historical issuances from the item_monthly_issuance rollup (migration
+    0003; read replica when available), one row per item and month.
+    Returns columns: date (datetime.date, 1st of the month), item_name (str),
+    quantity (float). Includes archived years; pending orders don't count.
+
+    Served by services/history_cache.py: only rollup rows changed since the
+    last call are read. rebuild=True re-reads the whole rollup.
+    """
+    return history_cache.load_daily(rebuild=rebuild)
+
+
+def load_monthly_history_from_db(rebuild: bool = False) -> pd.DataFrame:
     """
-    Pull historical issuances straight from MySQL.
-    Returns columns: date (datetime.date), item_name (str), quantity (float).
+    Same history already in to_monthly() form (['item_name', 'month', 'y', 'ds']).
+    The months are grouped in the database (item_monthly_issuance); no daily
+    rows, pd.to_datetime or per-row Period conversion on the way.
     """
+    return history_cache.load_monthly(rebuild=rebuild)
+
+
+def load_stock_from_db() -> pd.DataFrame:
+    """The item catalog with current stock: columns item_name, stock_quantity."""
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT DATE(o.transaction_date) AS date,
-               i.name AS item_name,
-               SUM(ol.quantity) AS quantity
-        FROM order_line ol
-        JOIN `order` o ON o.order_id = ol.order_id
-        JOIN item i ON i.item_id = ol.item_id
-        GROUP BY DATE(o.transaction_date), i.name
-        ORDER BY DATE(o.transaction_date)
-        """
-    )
+    cur = conn.cursor(dictionary=True)
+    cur.execute("SELECT name AS item_name, stock_quantity FROM item")
     rows = cur.fetchall()
     cur.close()
     conn.close()
 
-    df = pd.DataFrame(rows, columns=["date", "item_name", "quantity"])
-    if df.empty:
-        return df
+    if not rows:
+        return pd.DataFrame(columns=["item_name", "stock_quantity"])
 
+    df = pd.DataFrame(rows)
     df["item_name"] = df["item_name"].astype(str).str.strip()
-    df["date"] = pd.to_datetime(df["date"]).dt.date
-    df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(float)
     return df
 
 
 # -----------------------------------
 # Monthly aggregation & eligibility
 # -----------------------------------
+MONTHLY_COLUMNS = ["item_name", "month", "y", "ds"]
+
+
 def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
     """
     Convert daily history to monthly totals per item.
@@ -173,7 +205,11 @@ def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
       - 'month' is pandas.Period('M')
       - 'ds' is Month Start timestamp (required by Prophet)
       - 'y' is monthly quantity
+    A frame that is already monthly (load_monthly_history_from_db) is
+    returned as is.
     """
+    if set(MONTHLY_COLUMNS).issubset(history_df.columns):
+        return history_df
     df = history_df.copy()
     df["date"] = pd.to_datetime(df["date"])
     df["month"] = df["date"].dt.to_period("M")  # IMPORTANT: just "M", not "MS"
@@ -187,6 +223,20 @@ def to_monthly(history_df: pd.DataFrame) -> pd.DataFrame:
     return monthly  # item_name, month, y, ds
 
 
+def monthly_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of ['item_name', 'ds', 'y'] with ds on a month start (an item/month
+    may repeat) -> one row per item and month, in to_monthly() form.
+    """
+    monthly = (
+        df.groupby(["item_name", "ds"], as_index=False)["y"].sum()
+        .sort_values(["item_name", "ds"])
+        .reset_index(drop=True)
+    )
+    monthly["month"] = monthly["ds"].dt.to_period("M")
+    return monthly[MONTHLY_COLUMNS]
+
+
 def eligible_items(monthly_df: pd.DataFrame, min_months: int = 12, min_sum: int = 10) -> List[str]:
     """
     Implements your Colab rule:
@@ -198,59 +248,214 @@ def eligible_items(monthly_df: pd.DataFrame, min_months: int = 12, min_sum: int
     return elig["item_name"].tolist()
 
 
+def series_by_key(monthly_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    One pass over the monthly frame: casefolded item name -> that item's rows
+    (all casings merged, row order kept). Same rows as filtering with
+    item_name.str.casefold() == name.casefold(), without a scan per item.
+    """
+    keys = monthly_df["item_name"].str.casefold()
+    return {key: grp for key, grp in monthly_df.groupby(keys, sort=False)}
+
+
 # -----------------------------------
 # Prophet model utilities (monthly)
 # -----------------------------------
-def _fit_monthly_prophet(monthly_item_df: pd.DataFrame) -> Prophet:
-    """
-    Train Prophet on MONTHLY data for a single item.
-    Expects columns ['ds', 'y'].
-
-    We keep settings mild to avoid "exploding" forecasts:
-      - yearly seasonality only
-      - multiplicative seasonality (good for scale changes)
-      - moderate changepoint_prior_scale
-    """
-    # Ensure one row per month (in case of duplicates)
-    monthly_item_df = (
-        monthly_item_df
-        .groupby(pd.Grouper(key="ds", freq="MS"))["y"]
-        .sum()
-        .reset_index()
-    )
-
-    m = Prophet(
-        yearly_seasonality=True,
-        weekly_seasonality=False,
-        daily_seasonality=False,
-        seasonality_mode="multiplicative",
-        changepoint_prior_scale=0.2,
-    )
-    m.fit(monthly_item_df[["ds", "y"]])
-    return m
-
-
-def train_models_for_eligible_items(history_df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+# _fit_monthly_prophet lives in services/prophet_fit.py (imported above) so
+# training pool workers don't import this module.
+def _model_is_current(key: str, fingerprint: str, now: datetime) -> bool:
+    if model_registry.get(key) is None:
+        return False
+    entry = model_registry.fingerprint(key)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    if MODEL_MAX_AGE_DAYS <= 0:
+        return True
+    try:
+        trained_at = datetime.fromisoformat(entry["trained_utc"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return (now - trained_at).total_seconds() < MODEL_MAX_AGE_DAYS * 86400
+
+
+def train_models_for_eligible_items(
+    history_df: pd.DataFrame | None,
+    workers: int | None = None,
+    full: bool = True,
+    monthly: pd.DataFrame | None = None,
+    progress: Optional[Callable[[int, int, Optional[FitResult]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    items: Optional[List[str]] = None,
+) -> Tuple[List[str], List[str]]:
     """
     Train and cache (in-memory) Prophet models for all ELIGIBLE items, per your rule.
     Returns (trained_items, skipped_items).
+
+    With full=False an item keeps its cached model when its monthly series
+    has the same fingerprint as at its last fit and the model is younger than
+    PREDICTIVE_MODEL_MAX_AGE_DAYS; such items count as trained (reused).
+
+    With workers > 1 (default PREDICTIVE_TRAIN_WORKERS) items are fitted on a
+    process pool. Per-item fit times, the speedup and the reused / refit
+    counts land in LAST_TRAIN_REPORT; items whose fit fails are reported
+    there and counted as skipped.
+
+    Pass `monthly` (to_monthly() form) instead of history_df when it is
+    already at hand, e.g. from load_monthly_history_from_db().
+
+    progress(done, total, result) is called once before the first fit
+    (result None) and after every fit; total counts the items being fitted,
+    not the reused ones. Setting `cancel` stops after the fits in flight:
+    items never fitted are skipped and LAST_TRAIN_REPORT["cancelled"] is True.
+
+    `items` limits the run to those names (casefold match); other cached
+    models are left as they are.
     """
-    monthly = to_monthly(history_df)
+    if monthly is None:
+        monthly = to_monthly(history_df)
     names = eligible_items(monthly)
+    if items is not None:
+        wanted = {str(n).casefold() for n in items}
+        names = [n for n in names if n.casefold() in wanted]
+    series = series_by_key(monthly)
+    now = datetime.now(timezone.utc)
 
-    trained, skipped = [], []
+    tasks, skipped, reused, fingerprints = [], [], [], {}
     for name in names:
-        item_df = monthly.loc[monthly["item_name"].str.casefold() == name.casefold()].copy()
+        item_df = series[name.casefold()]
         # Guard: Prophet needs >= 2 non-NaN rows
         if item_df["y"].dropna().shape[0] < 2:
             skipped.append(name)
             continue
+        fingerprints[name] = series_fingerprint(item_df)
+        if not full and _model_is_current(name.casefold(), fingerprints[name], now):
+            reused.append(name)
+            continue
+        tasks.append((name, item_df[["ds", "y"]]))
+
+    workers = workers or train_workers()
+    t0 = time.perf_counter()
+    results = []
+    if progress is not None:
+        progress(0, len(tasks), None)
+    for res in fit_items(tasks, workers, cancel=cancel):
+        results.append(res)
+        if res.model is not None:
+            model_registry.put(
+                res.name,
+                res.model,
+                fingerprint={"fingerprint": fingerprints[res.name], "trained_utc": now.isoformat()},
+            )
+        if progress is not None:
+            progress(len(results), len(tasks), res)
+    wall = time.perf_counter() - t0
+
+    fitted = {r.name for r in results if r.model is not None}
+    refit = [name for name, _ in tasks if name in fitted]
+    skipped += [name for name, _ in tasks if name not in fitted]
+    done = set(refit) | set(reused)
+    trained = [name for name in names if name in done]
+
+    LAST_TRAIN_REPORT.clear()
+    LAST_TRAIN_REPORT.update(summarize_fits(results, wall, min(workers, max(1, len(tasks)))))
+    LAST_TRAIN_REPORT.update(
+        {
+            "mode": "full" if full else "incremental",
+            "reused_count": len(reused),
+            "refit_count": len(refit),
+            "cancelled": len(results) < len(tasks),
+            "scope": "catalog" if items is None else "items",
+        }
+    )
+    return trained, skipped
 
-        model = _fit_monthly_prophet(item_df[["ds", "y"]])
-        ITEM_MODELS[name.casefold()] = model
-        trained.append(name)
 
-    return trained, skipped
+# -----------------------------------
+# Shared history snapshot (forecast endpoints)
+# -----------------------------------
+@dataclass(frozen=True)
+class HistorySnapshot:
+    """
+    Monthly history (to_monthly() form) plus a per-item index, built once and
+    shared read-only by every forecast over the same data. `version` is the
+    history cache version it was built from ("" for ad-hoc frames, e.g. CSV).
+    """
+
+    monthly: pd.DataFrame
+    series: Dict[str, pd.DataFrame]  # key: item_name.casefold()
+    version: str = ""
+
+    @classmethod
+    def from_frame(cls, history_df: pd.DataFrame, version: str = "") -> "HistorySnapshot":
+        monthly = to_monthly(history_df)
+        return cls(monthly, series_by_key(monthly), version)
+
+    @property
+    def empty(self) -> bool:
+        return self.monthly.empty
+
+    def item_names(self) -> List[str]:
+        return sorted(self.monthly["item_name"].unique().tolist(), key=str.casefold)
+
+    def item(self, item_name: str) -> pd.DataFrame:
+        """One item's monthly rows (a copy; empty if unknown), casefold match."""
+        grp = self.series.get(item_name.casefold())
+        return grp.copy() if grp is not None else self.monthly.iloc[0:0].copy()
+
+    @cached_property
+    def fallback(self) -> FallbackMatrix:
+        """Catalog-wide fallback / eligibility (services/fallback_matrix.py), built on first use."""
+        return build_fallback_matrix(self.monthly)
+
+
+_SNAPSHOT_LOCK = threading.Lock()
+_SNAPSHOT: Dict[str, HistorySnapshot] = {}
+_SNAPSHOT_KEYS: Dict[str, Any] = {}
+
+
+def get_history_snapshot(rebuild: bool = False) -> HistorySnapshot:
+    """
+    Snapshot of the DB history, reused across requests until the history
+    cache picks up new data (its version changes).
+    """
+    version, monthly = history_cache.load_versioned(rebuild=rebuild)
+    with _SNAPSHOT_LOCK:
+        snap = _SNAPSHOT.get("db")
+        if snap is None or snap.version != version:
+            snap = HistorySnapshot(monthly, series_by_key(monthly), version)
+            _SNAPSHOT["db"] = snap
+    return snap
+
+
+def as_snapshot(history: pd.DataFrame | HistorySnapshot) -> HistorySnapshot:
+    if isinstance(history, HistorySnapshot):
+        return history
+    return HistorySnapshot.from_frame(history)
+
+
+def canonical_snapshot(history: HistorySnapshot, catalog_names: List[str]) -> HistorySnapshot:
+    """
+    History restricted to items in the catalog, renamed to the catalog's
+    spelling (matched on strip + casefold) and merged per name. Cached per
+    (history version, catalog) like get_history_snapshot.
+    """
+    by_key = {str(n).strip().casefold(): n for n in catalog_names}
+    cache_key = (history.version, tuple(sorted(by_key.items())))
+    with _SNAPSHOT_LOCK:
+        snap = _SNAPSHOT.get("canonical")
+        if history.version and snap is not None and _SNAPSHOT_KEYS.get("canonical") == cache_key:
+            return snap
+
+    monthly = history.monthly.copy()
+    monthly["item_name"] = monthly["item_name"].astype(str).str.strip().str.casefold().map(by_key)
+    monthly = monthly.dropna(subset=["item_name"])
+    snap = HistorySnapshot.from_frame(monthly_frame(monthly), version=history.version)
+
+    if history.version:
+        with _SNAPSHOT_LOCK:
+            _SNAPSHOT["canonical"] = snap
+            _SNAPSHOT_KEYS["canonical"] = cache_key
+    return snap
 
 
 def list_cached_models() -> List[str]:
@@ -258,50 +463,94 @@ def list_cached_models() -> List[str]:
     Return list of item names with a cached Prophet model.
     """
     # We stored keys as lowercase; just return them as-is
-    return sorted(ITEM_MODELS.keys())
+    return model_registry.names()
 
 
 # -----------------------------------
 # Persistence helpers
 # -----------------------------------
 def _write_status(summary: Dict[str, Any]) -> None:
-    STATUS_FILE.write_text(json.dumps(summary, indent=2))
+    _replace_atomically(STATUS_FILE, lambda tmp: tmp.write_text(json.dumps(summary, indent=2)))
 
 
-def save_models_to_disk(source: str, trained: List[str], skipped: List[str]) -> None:
-    """
-    Persist ITEM_MODELS to model.pkl and store a small status JSON.
-    """
-    MODEL_PKL.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(ITEM_MODELS, MODEL_PKL)
+def _new_model_version() -> str:
+    # sorts by time; the suffix keeps two saves in the same instant apart
+    return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:6]}"
+
+
+def _prune_model_versions(keep: str) -> None:
+    versions = sorted(MODEL_DIR.glob("model-*.pkl"), reverse=True)
+    for path in versions[MODEL_KEEP_VERSIONS:]:
+        if path.stem == f"model-{keep}":
+            continue
+        for old in (path, path.with_suffix(".json")):
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                pass  # still open elsewhere (Windows): next save retries
+
+
+def save_models_to_disk(
+    source: str,
+    trained: List[str],
+    skipped: List[str],
+    history_watermark: Optional[str] = None,
+    items: Optional[List[str]] = None,
+    cancelled: bool = False,
+) -> str:
+    """
+    Persist the registry's models as a new model version and store a small status JSON
+    pointing at it (model_version, model_file). Returns the version.
+
+    history_watermark is the DB time the trained-on DB history was read at
+    (history_cache last_refresh db_now); services/retrain_trigger.py counts
+    order lines finalized after it. A run limited to `items` keeps the catalog watermark
+    of the last full-catalog run and records its own for those items only.
+    A cancelled run keeps the previous watermarks and last_trained_utc: its
+    models are saved, but it did not train on the new history.
+    """
+    version = _new_model_version()
+    model_file = MODEL_DIR / f"model-{version}.pkl"
+    _replace_atomically(model_file, lambda tmp: joblib.dump(model_registry.models(), tmp))
+    _replace_atomically(
+        model_file.with_suffix(".json"),
+        lambda tmp: tmp.write_text(json.dumps(model_registry.fingerprints(), indent=2, sort_keys=True)),
+    )
+    _replace_atomically(MODEL_PKL, lambda tmp: shutil.copyfile(model_file, tmp))
+
     now = datetime.utcnow().replace(tzinfo=timezone.utc).isoformat()
+    previous = _read_status()
     status = {
         "last_trained_utc": now,
+        "last_saved_utc": now,
         "source": source,
         "trained_count": len(trained),
         "skipped_count": len(skipped),
-        "cache_size": len(ITEM_MODELS),
+        "reused_count": LAST_TRAIN_REPORT.get("reused_count", 0),
+        "refit_count": LAST_TRAIN_REPORT.get("refit_count", len(trained)),
+        "cache_size": len(model_registry.models()),
         "model_path": str(MODEL_PKL),
+        "model_version": version,
+        "model_file": model_file.name,
+        "previous_model_version": previous.get("model_version"),
+        "train_report": dict(LAST_TRAIN_REPORT),
+        "history_watermark": history_watermark,
+        "item_watermarks": {},
     }
+    if cancelled:
+        status["last_trained_utc"] = previous.get("last_trained_utc")
+        status["history_watermark"] = previous.get("history_watermark")
+        status["item_watermarks"] = dict(previous.get("item_watermarks") or {})
+    elif items is not None:
+        status["history_watermark"] = previous.get("history_watermark")
+        status["item_watermarks"] = dict(previous.get("item_watermarks") or {})
+        if history_watermark is not None:
+            status["item_watermarks"].update({str(n).casefold(): history_watermark for n in items})
+    # Publishing the status is what makes the version current for every worker
     _write_status(status)
-
-
-def load_models_from_disk() -> Dict[str, Prophet]:
-    """
-    Load persisted models (if any) into ITEM_MODELS.
-    """
-    if not MODEL_PKL.exists():
-        return ITEM_MODELS
-    try:
-        obj = joblib.load(MODEL_PKL)
-        if isinstance(obj, dict):
-            ITEM_MODELS.clear()
-            for k, v in obj.items():
-                ITEM_MODELS[str(k).casefold()] = v
-    except Exception:
-        # Ignore load failures; continue with empty cache
-        ITEM_MODELS.clear()
-    return ITEM_MODELS
+    model_registry.mark_saved(version)
+    _prune_model_versions(keep=version)
+    return version
 
 
 def get_train_status() -> Dict[str, Any]:
@@ -309,7 +558,7 @@ def get_train_status() -> Dict[str, Any]:
     Return a lightweight status snapshot: cache size, model file mtime, last train metadata.
     """
     status: Dict[str, Any] = {
-        "cache_size": len(ITEM_MODELS),
+        "cache_size": len(model_registry.models()),
         "model_path": str(MODEL_PKL),
         "model_file_exists": MODEL_PKL.exists(),
         "model_file_mtime_utc": None,
@@ -323,32 +572,83 @@ def get_train_status() -> Dict[str, Any]:
             status.update(json.loads(STATUS_FILE.read_text()))
         except Exception:
             pass
+    # What this process serves; model_version is the latest one saved
+    status["loaded_model_version"] = model_registry.loaded_version()
+    status["history_cache"] = history_cache.cache_info()
     return status
 
 
-def train_from_db_and_persist() -> Dict[str, Any]:
-    """
-    Train using live DB history, update cache, and persist to disk.
-    Returns a summary dict.
-    """
-    hist = load_history_from_db()
-    if hist.empty:
-        return {"status": "empty", "trained": [], "skipped": [], "cache_size": len(ITEM_MODELS)}
+def _train_and_persist(
+    source: str,
+    history_df: pd.DataFrame | None,
+    monthly: pd.DataFrame | None,
+    full: bool,
+    progress: Optional[Callable[[int, int, Optional[FitResult]], None]],
+    cancel: Optional[threading.Event],
+    items: Optional[List[str]] = None,
+    history_watermark: Optional[str] = None,
+) -> Dict[str, Any]:
+    trained, skipped = train_models_for_eligible_items(
+        history_df, full=full, monthly=monthly, progress=progress, cancel=cancel, items=items
+    )
+    cancelled = bool(LAST_TRAIN_REPORT.get("cancelled"))
+    # A cancelled run still saves the models it fitted (the next incremental
+    # run reuses them and fits the rest); one that fitted none saves nothing.
+    if not cancelled or LAST_TRAIN_REPORT.get("refit_count"):
+        save_models_to_disk(
+            source=source,
+            trained=trained,
+            skipped=skipped,
+            history_watermark=history_watermark,
+            items=items,
+            cancelled=cancelled,
+        )
+
+    # Bulk endpoints serve forecasts precomputed from the new models
+    from services import forecast_snapshot
 
-    trained, skipped = train_models_for_eligible_items(hist)
-    save_models_to_disk(source="db_auto", trained=trained, skipped=skipped)
     return {
-        "status": "ok",
+        "status": "cancelled" if cancelled else "ok",
         "trained": trained,
         "trained_count": len(trained),
         "skipped": skipped,
         "skipped_count": len(skipped),
-        "cache_size": len(ITEM_MODELS),
+        "cache_size": len(model_registry.models()),
+        "train_report": dict(LAST_TRAIN_REPORT),
+        "forecast_snapshot": (
+            {"status": "skipped"} if cancelled else forecast_snapshot.refresh_after_training()
+        ),
     }
 
 
-# Attempt to load persisted models on import
-load_models_from_disk()
+def train_from_db_and_persist(
+    full: bool = False,
+    progress: Optional[Callable[[int, int, Optional[FitResult]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    items: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Train using live DB history, update cache, and persist to disk.
+    Incremental unless full=True (see train_models_for_eligible_items, also
+    for progress / cancel / items). Ends by refreshing the forecast snapshot
+    (services/forecast_snapshot.py). Returns a summary dict.
+    """
+    monthly = load_monthly_history_from_db()
+    if monthly.empty:
+        return {"status": "empty", "trained": [], "skipped": [], "cache_size": len(model_registry.models())}
+    watermark = (history_cache.cache_info().get("last_refresh") or {}).get("db_now")
+    return _train_and_persist("db_auto", None, monthly, full, progress, cancel, items, watermark)
+
+
+def train_from_csv_and_persist(
+    full: bool = False,
+    progress: Optional[Callable[[int, int, Optional[FitResult]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    items: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Same as train_from_db_and_persist, from DATA_FILE (the manual CSV/XLSX)."""
+    df = load_history_from_excel()
+    return _train_and_persist("csv_manual", df, None, full, progress, cancel, items)
 
 
 # -----------------------------------
@@ -373,16 +673,17 @@ def fallback_next_month(item_df: pd.DataFrame) -> int:
     return int(round(sum(recent) / len(recent)))
 
 
-def forecast_next_month_safe(history_df: pd.DataFrame, item_name: str) -> int:
+def forecast_next_month_safe(history: pd.DataFrame | HistorySnapshot, item_name: str) -> int:
     """
     Returns ONLY next month's forecast (integer).
     Uses Prophet only if data is rich enough (>= 12 months).
     Otherwise uses a safe moving-average fallback.
 
     This is what powers /predictive/next_month endpoints.
+    `history` is a HistorySnapshot (get_history_snapshot) or a daily/monthly
+    frame; loops over many items should pass one snapshot.
     """
-    monthly = to_monthly(history_df)
-    item_df = monthly.loc[monthly["item_name"].str.casefold() == item_name.casefold()].copy()
+    item_df = as_snapshot(history).item(item_name)
 
     if item_df.empty:
         return 0
@@ -396,12 +697,12 @@ def forecast_next_month_safe(history_df: pd.DataFrame, item_name: str) -> int:
 
     # Try Prophet for richer histories
     key = item_name.casefold()
-    model = ITEM_MODELS.get(key)
+    model = model_registry.get(key)
 
     try:
         if model is None:
             model = _fit_monthly_prophet(item_df[["ds", "y"]])
-            ITEM_MODELS[key] = model
+            model_registry.put(key, model)
 
         future = model.make_future_dataframe(periods=1, freq="MS", include_history=False)
         fc = model.predict(future)
@@ -418,7 +719,9 @@ def forecast_next_month_safe(history_df: pd.DataFrame, item_name: str) -> int:
 # -----------------------------------
 # 6-MONTH FORECAST (used by /predictive/forecast/item + /forecast/all)
 # -----------------------------------
-def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str) -> pd.DataFrame:
+def forecast_next_6_months_for_itemname(
+    history: pd.DataFrame | HistorySnapshot, item_name: str
+) -> pd.DataFrame:
     """
     Output monthly forecast DF: [month(YYYY-MM), forecast_qty] for next 6 months.
 
@@ -426,8 +729,7 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
     - If item has >= 12 months of data → use Prophet over 6 months
     - If < 12 months → use the same fallback (moving average) for *each* of the next 6 months.
     """
-    monthly = to_monthly(history_df)
-    item_df = monthly.loc[monthly["item_name"].str.casefold() == item_name.casefold()].copy()
+    item_df = as_snapshot(history).item(item_name)
     if item_df.empty:
         raise ValueError(f"No history found for item: {item_name}")
 
@@ -448,7 +750,7 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
 
     # Use Prophet for 6 months when history is rich
     key = item_name.casefold()
-    model = ITEM_MODELS.get(key)
+    model = model_registry.get(key)
 
     if model is None:
         if item_df["y"].dropna().shape[0] < 2:
@@ -456,7 +758,7 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
             raise ValueError(f"Insufficient data to train a model for item: {item_name}")
 
         model = _fit_monthly_prophet(item_df[["ds", "y"]])
-        ITEM_MODELS[key] = model
+        model_registry.put(key, model)
 
     future = model.make_future_dataframe(periods=6, freq="MS", include_history=False)
     fc = model.predict(future)[["ds", "yhat"]].copy()
@@ -475,7 +777,9 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
 
 
 # Override with a version that rebases stale histories to the current month for display
-def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str) -> pd.DataFrame:
+def forecast_next_6_months_for_itemname(
+    history: pd.DataFrame | HistorySnapshot, item_name: str
+) -> pd.DataFrame:
     """
     Output monthly forecast DF: [month(YYYY-MM), forecast_qty] for next 6 months.
 
@@ -484,8 +788,7 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
     - If < 12 months, use the same fallback (moving average) for *each* of the next 6 months.
     - If the last observed month is far in the past, rebase the month labels to start at the current month.
     """
-    monthly = to_monthly(history_df)
-    item_df = monthly.loc[monthly["item_name"].str.casefold() == item_name.casefold()].copy()
+    item_df = as_snapshot(history).item(item_name)
     if item_df.empty:
         raise ValueError(f"No history found for item: {item_name}")
 
@@ -506,12 +809,12 @@ def forecast_next_6_months_for_itemname(history_df: pd.DataFrame, item_name: str
 
     # Prophet path (richer history)
     key = item_name.casefold()
-    model = ITEM_MODELS.get(key)
+    model = model_registry.get(key)
     if model is None:
         if item_df["y"].dropna().shape[0] < 2:
             raise ValueError(f"Insufficient data to train a model for item: {item_name}")
         model = _fit_monthly_prophet(item_df[["ds", "y"]])
-        ITEM_MODELS[key] = model
+        model_registry.put(key, model)
 
     future = model.make_future_dataframe(periods=6, freq="MS", include_history=False)
     fc = model.predict(future)[["ds", "yhat"]].copy()
@@ -596,40 +899,118 @@ def export_month_plan(item_name: str, plan_df: pd.DataFrame, filetype: str = "cs
     return str(out)
 
 
-def all_items_summary(history_df: pd.DataFrame, stock_df: pd.DataFrame) -> pd.DataFrame:
+def forecast_catalog(history: pd.DataFrame | HistorySnapshot) -> List[Dict[str, Any]]:
     """
-    Build one row per item_name:
-      [item_name, current_stock, total_6mo_forecast, first_month_restock, total_recommended_restock]
-    If an item isn't in stock_df, assume current_stock=0.
-    Uses the same 6-month forecast function above (with fallback for sparse items).
+    The 6-month forecast of every item in the history, in item_names() order:
+      [{item_name, months: [YYYY-MM, ...], forecast_qty: [int, ...]}]
+    Same numbers as forecast_next_6_months_for_itemname; sparse items (< 12
+    months) come straight from the fallback matrix. Items whose forecast
+    fails are left out.
     """
-    stock_map = {
-        str(n).strip().casefold(): int(q)
-        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
-    }
-    rows = []
-    for name in sorted(history_df["item_name"].unique().tolist(), key=str.casefold):
+    history = as_snapshot(history)
+    fb = history.fallback
+    current_month = pd.Timestamp.today().to_period("M")
+    out = []
+    for name in history.item_names():
+        r = fb.row(name)
+        if fb.sparse[r]:
+            start = max(current_month, fb.last_month[r])
+            out.append(
+                {
+                    "item_name": name,
+                    "months": [str(start + k) for k in range(1, PLAN_MONTHS + 1)],
+                    "forecast_qty": [int(fb.fallback[r])] * PLAN_MONTHS,
+                }
+            )
+            continue
         try:
-            monthly = forecast_next_6_months_for_itemname(history_df, name)
+            monthly = forecast_next_6_months_for_itemname(history, name)
         except Exception:
             # skip items that fail for any reason
             continue
-
-        current = int(stock_map.get(name.casefold(), 0))
-        plan = recommended_restock_plan(monthly, current)
-
-        total_fc = float(monthly["forecast_qty"].sum())
-        total_restock = int(plan["recommended_restock"].sum()) if not plan.empty else 0
-        first_restock = int(plan.iloc[0]["recommended_restock"]) if not plan.empty else 0
-
-        rows.append(
+        out.append(
             {
                 "item_name": name,
-                "current_stock": current,
-                "total_6mo_forecast": int(round(total_fc)),
-                "first_month_restock": first_restock,
-                "total_recommended_restock": total_restock,
+                "months": monthly["month"].astype(str).tolist(),
+                "forecast_qty": [int(q) for q in monthly["forecast_qty"]],
             }
         )
+    return out
 
-    return pd.DataFrame(rows)
+
+def restock_summary(forecasts: List[Dict[str, Any]], stock_map: Dict[str, int]) -> List[Dict[str, Any]]:
+    """
+    recommended_restock_plan for every forecast_catalog() entry at once, from
+    current stock (stock_map: item_name.casefold() -> quantity, 0 if absent):
+      [{item_name, current_stock, total_6mo_forecast, first_month_restock,
+        total_recommended_restock}]
+    Forecasts of different lengths (stale histories get filler months) are
+    padded with zero-demand months, which never restock.
+    """
+    width = max((len(f["forecast_qty"]) for f in forecasts), default=0)
+    demand = np.zeros((len(forecasts), width), dtype=np.int64)
+    for i, f in enumerate(forecasts):
+        demand[i, : len(f["forecast_qty"])] = f["forecast_qty"]
+    stock = np.array(
+        [stock_map.get(f["item_name"].casefold(), 0) for f in forecasts], dtype=np.int64
+    )
+
+    restock = np.zeros_like(demand)
+    level = stock.copy()
+    for k in range(width):
+        end = level - demand[:, k]
+        restock[:, k] = np.maximum(0, -end)
+        level = np.maximum(0, end)
+
+    first = restock[:, 0] if width else np.zeros(len(forecasts), dtype=np.int64)
+    totals = restock.sum(axis=1)
+    demand_totals = demand.sum(axis=1)
+    return [
+        {
+            "item_name": f["item_name"],
+            "current_stock": int(stock[i]),
+            "total_6mo_forecast": int(demand_totals[i]),
+            "first_month_restock": int(first[i]),
+            "total_recommended_restock": int(totals[i]),
+        }
+        for i, f in enumerate(forecasts)
+    ]
+
+
+def all_items_summary(
+    history: pd.DataFrame | HistorySnapshot, stock_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Build one row per item_name:
+      [item_name, current_stock, total_6mo_forecast, first_month_restock, total_recommended_restock]
+    If an item isn't in stock_df, assume current_stock=0.
+    Forecasts come from forecast_catalog(), restock from restock_summary().
+    """
+    stock_map = {
+        str(n).strip().casefold(): int(q)
+        for n, q in zip(stock_df["item_name"], stock_df["stock_quantity"])
+    }
+    return pd.DataFrame(restock_summary(forecast_catalog(history), stock_map))
+
+
+def next_month_forecasts(history: HistorySnapshot) -> List[Dict[str, Any]]:
+    """
+    Next month's forecast for every item in the history, largest first:
+      [{item_name, next_month_forecast}]
+    Sparse items (< 12 months) use the vectorized fallback; items whose
+    forecast fails are left out.
+    """
+    fb = history.fallback
+    rows = []
+    for name in history.item_names():
+        r = fb.row(name)
+        if fb.sparse[r]:
+            pred = fb.fallback[r]
+        else:
+            try:
+                pred = forecast_next_month_safe(history, name)
+            except Exception:
+                continue
+        rows.append({"item_name": name, "next_month_forecast": int(pred)})
+    rows.sort(key=lambda r: r["next_month_forecast"], reverse=True)
+    return rows
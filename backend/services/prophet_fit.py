@@ -0,0 +1,180 @@
+# backend/services/prophet_fit.py
+"""
+Per-item Prophet fitting, sequential or on a process pool.
+
+Kept separate from predictive_service on purpose: pool workers import only
+this module (Prophet + pandas), not the DB layer or the model cache.
+
+Settings:
+  PREDICTIVE_TRAIN_WORKERS  worker processes (default 1 = fit in-process)
+  PREDICTIVE_STAN_THREADS   cmdstan / BLAS threads per worker (default 1), so
+                            N workers use N cores instead of oversubscribing
+  PREDICTIVE_FIT_TIMEOUT_SECONDS
+                            cmdstan is killed after this long on one fit
+                            (default 300, 0 = no limit); the item then fails
+                            with a TimeoutError like any other failed fit
+"""
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+
+# Bump when fit_monthly_prophet's settings change: every fingerprint changes
+# with it, so incremental training refits everything once.
+FIT_VERSION = 1
+
+_THREAD_ENV = ("STAN_NUM_THREADS", "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def train_workers() -> int:
+    return max(1, int(os.getenv("PREDICTIVE_TRAIN_WORKERS", "1")))
+
+
+def stan_threads() -> int:
+    return max(1, int(os.getenv("PREDICTIVE_STAN_THREADS", "1")))
+
+
+def fit_timeout() -> Optional[float]:
+    seconds = float(os.getenv("PREDICTIVE_FIT_TIMEOUT_SECONDS", "300"))
+    return seconds if seconds > 0 else None
+
+
+def fit_monthly_prophet(monthly_item_df: pd.DataFrame) -> Prophet:
+    """
+    Train Prophet on MONTHLY data for a single item.
+    Expects columns ['ds', 'y'].
+
+    We keep settings mild to avoid "exploding" forecasts:
+      - yearly seasonality only
+      - multiplicative seasonality (good for scale changes)
+      - moderate changepoint_prior_scale
+    """
+    # Ensure one row per month (in case of duplicates)
+    monthly_item_df = (
+        monthly_item_df
+        .groupby(pd.Grouper(key="ds", freq="MS"))["y"]
+        .sum()
+        .reset_index()
+    )
+
+    m = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=False,
+        daily_seasonality=False,
+        seasonality_mode="multiplicative",
+        changepoint_prior_scale=0.2,
+    )
+    timeout = fit_timeout()
+    # Passed through to cmdstanpy's optimize()
+    m.fit(monthly_item_df[["ds", "y"]], **({"timeout": timeout} if timeout else {}))
+    return m
+
+
+def series_fingerprint(monthly_item_df: pd.DataFrame) -> str:
+    """
+    Hash of the series fit_monthly_prophet would see (months merged the same
+    way) plus FIT_VERSION. Equal fingerprints -> refitting gives the same model.
+    """
+    monthly = (
+        monthly_item_df
+        .groupby(pd.Grouper(key="ds", freq="MS"))["y"]
+        .sum()
+    )
+    h = hashlib.sha1(f"v{FIT_VERSION}".encode())
+    h.update(monthly.index.values.astype("datetime64[ns]").astype(np.int64).tobytes())
+    h.update(monthly.to_numpy(dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+@dataclass
+class FitResult:
+    name: str
+    model: Optional[Prophet]
+    seconds: float
+    error: Optional[str] = None
+
+
+def _pin_threads(threads: int) -> None:
+    # cmdstan is a subprocess of the worker and inherits these
+    for var in _THREAD_ENV:
+        os.environ[var] = str(threads)
+
+
+def _fit_one(task: Tuple[str, pd.DataFrame]) -> FitResult:
+    name, item_df = task
+    t0 = time.perf_counter()
+    try:
+        model = fit_monthly_prophet(item_df)
+        return FitResult(name, model, time.perf_counter() - t0)
+    except Exception as exc:
+        return FitResult(name, None, time.perf_counter() - t0, f"{type(exc).__name__}: {exc}")
+
+
+def fit_items(
+    tasks: Iterable[Tuple[str, pd.DataFrame]],
+    workers: Optional[int] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[FitResult]:
+    """
+    Fit one model per (name, monthly ['ds', 'y'] frame); yields results as
+    they finish (pool order, not input order). A failing fit yields a result
+    with .error set instead of raising.
+
+    Once `cancel` is set no new fit starts; fits already running finish and
+    are yielded first.
+    """
+    tasks = list(tasks)
+    workers = min(workers or train_workers(), max(1, len(tasks)))
+
+    if workers == 1:
+        for task in tasks:
+            if cancel is not None and cancel.is_set():
+                return
+            yield _fit_one(task)
+        return
+
+    # spawn, not fork: the API process has threads (pool, event loop)
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_pin_threads,
+        initargs=(stan_threads(),),
+    ) as pool:
+        futures = [pool.submit(_fit_one, task) for task in tasks]
+        try:
+            for fut in as_completed(futures):
+                yield fut.result()
+                if cancel is not None and cancel.is_set():
+                    break
+        finally:
+            # Queued fits never start; shutdown then waits for running ones only
+            for fut in futures:
+                fut.cancel()
+
+
+def summarize_fits(results: Iterable[FitResult], wall_seconds: float, workers: int) -> dict:
+    """Per-item fit times and speedup (sum of fit time / wall time)."""
+    results = list(results)
+    fit_seconds = {r.name: round(r.seconds, 3) for r in results if r.error is None}
+    total = sum(fit_seconds.values())
+    return {
+        "workers": workers,
+        "stan_threads": stan_threads(),
+        "items_fitted": len(fit_seconds),
+        "wall_seconds": round(wall_seconds, 3),
+        "fit_seconds_total": round(total, 3),
+        "speedup": round(total / wall_seconds, 2) if wall_seconds > 0 else None,
+        "fit_seconds": fit_seconds,
+        "failed": {r.name: r.error for r in results if r.error is not None},
+    }
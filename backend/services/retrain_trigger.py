@@ -0,0 +1,130 @@
+# backend/services/retrain_trigger.py
+"""
+Event-driven retraining: retrain when enough new issuances came in, not only
+on the schedule.
+
+add_or and set_joborder_date stamp transaction_date = NOW() when they
+finalize an order, so the order lines finalized since the models were
+trained are those dated at or after the DB time the last DB training read
+its history at (history_watermark in the status file). On every scheduler
+tick the leader (services/train_scheduler.py) counts them per item and
+retrains:
+
+  - the catalog (incremental: only items whose series changed are refit)
+    once the total reaches PREDICTIVE_RETRAIN_LINES (default 500), or else
+  - just the items with at least PREDICTIVE_RETRAIN_ITEM_LINES (default 100)
+    lines of their own.
+
+Items retrained on their own count from their own watermark (item_watermarks)
+until the next catalog run. Nothing triggers within
+PREDICTIVE_RETRAIN_MIN_MINUTES (default 60) of the last training; a
+threshold of 0 turns that trigger off. A CSV training sets no watermark, so
+counting starts with the next DB training.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from db import get_db
+from services.predictive_service import get_train_status
+
+CATALOG_LINES = int(os.getenv("PREDICTIVE_RETRAIN_LINES", "500"))
+ITEM_LINES = int(os.getenv("PREDICTIVE_RETRAIN_ITEM_LINES", "100"))
+MIN_MINUTES = float(os.getenv("PREDICTIVE_RETRAIN_MIN_MINUTES", "60"))
+
+LINES_SINCE_SQL = """
+    SELECT i.name, COUNT(*) AS line_count
+    FROM order_line ol
+    JOIN `order` o ON o.order_id = ol.order_id
+    JOIN item i ON i.item_id = ol.item_id
+    WHERE o.transaction_date >= %s
+    GROUP BY i.name
+"""
+
+
+def _lines_since(since: str) -> Dict[str, int]:
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute(LINES_SINCE_SQL, (since,))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+    counts: Dict[str, int] = {}
+    for name, n in rows:
+        key = str(name).strip().casefold()
+        counts[key] = counts.get(key, 0) + int(n)
+    return counts
+
+
+def pending_lines(status: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Order lines finalized since the models' history: {since, total, items}."""
+    status = status if status is not None else get_train_status()
+    since = status.get("history_watermark")
+    if not since:
+        return {"since": None, "total": 0, "items": {}}
+
+    counts = _lines_since(since)
+    # Items retrained on their own since the catalog run: one query per
+    # distinct watermark (usually one), keeping only those items' counts
+    by_watermark: Dict[str, list] = {}
+    for key, item_since in (status.get("item_watermarks") or {}).items():
+        if key in counts and item_since > since:
+            by_watermark.setdefault(item_since, []).append(key)
+    for item_since, keys in by_watermark.items():
+        later = _lines_since(item_since)
+        for key in keys:
+            counts[key] = later.get(key, 0)
+
+    counts = {k: n for k, n in counts.items() if n > 0}
+    return {"since": since, "total": sum(counts.values()), "items": counts}
+
+
+def _recently_trained(status: Dict[str, Any]) -> bool:
+    last = status.get("last_trained_utc")
+    if MIN_MINUTES <= 0 or not isinstance(last, str):
+        return False
+    try:
+        trained = datetime.fromisoformat(last.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    return datetime.now(timezone.utc) - trained < timedelta(minutes=MIN_MINUTES)
+
+
+def decide() -> Optional[Dict[str, Any]]:
+    """
+    {"scope": "catalog", "lines": n} or {"scope": "items", "items": [...],
+    "lines": {item: n}} when a retrain is due, else None.
+    """
+    if CATALOG_LINES <= 0 and ITEM_LINES <= 0:
+        return None
+    status = get_train_status()
+    if _recently_trained(status):
+        return None
+    pending = pending_lines(status)
+    if CATALOG_LINES > 0 and pending["total"] >= CATALOG_LINES:
+        return {"scope": "catalog", "lines": pending["total"]}
+    if ITEM_LINES > 0:
+        hot = {k: n for k, n in pending["items"].items() if n >= ITEM_LINES}
+        if hot:
+            return {"scope": "items", "items": sorted(hot), "lines": hot}
+    return None
+
+
+def info() -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "catalog_lines": CATALOG_LINES,
+        "item_lines": ITEM_LINES,
+        "min_minutes": MIN_MINUTES,
+    }
+    try:
+        pending = pending_lines()
+    except Exception as exc:
+        out["error"] = str(exc)
+        return out
+    top = sorted(pending["items"].items(), key=lambda kv: kv[1], reverse=True)[:10]
+    out.update(since=pending["since"], pending_total=pending["total"], pending_top_items=dict(top))
+    return out
@@ -0,0 +1,398 @@
+# backend/services/train_scheduler.py
+"""
+Scheduled predictive retraining that is safe with several API workers.
+
+Every API process runs run_forever(), but only the elected leader starts
+training: each tick (PREDICTIVE_SCHEDULER_TICK_SECONDS, default 30) a
+process tries to take or keep the leader lock, and only the holder submits
+jobs (services/training_jobs.py, which runs the isolated worker). The lock
+is held for as long as the process lives, so leadership moves only when the
+leader goes away.
+
+  PREDICTIVE_SCHEDULER_LOCK       mysql: GET_LOCK on a dedicated connection,
+                                  one leader across all workers and nodes
+                                  sharing the database (default);
+                                  file: an OS lock on exports/train_scheduler.lock,
+                                  one leader per host (default with DB_BACKEND=sqlite)
+  PREDICTIVE_TRAIN_SCHEDULE       5-field cron in server local time
+                                  (minute hour day-of-month month day-of-week;
+                                  *, lists, ranges, steps, @daily / @hourly /
+                                  @weekly / @monthly). Default "0 2 * * *";
+                                  "off" disables the scheduled runs.
+  PREDICTIVE_TRAIN_CATCHUP_HOURS  a slot missed while no leader was up is run
+                                  once when one is, if it is at most this old
+                                  (default 24; several missed slots run once)
+  PREDICTIVE_TRAIN_JITTER_SECONDS each run starts up to this much after its
+                                  slot, at random (default 300)
+
+The last slot run is kept in exports/train_scheduler.json (before the first
+run, the last training time from the status file counts). Every process
+swaps in a newer model version (predictive_service.save_models_to_disk) on
+its next tick, whichever worker's training saved it.
+
+Between slots the leader also retrains when enough new issuances came in
+(services/retrain_trigger.py); that works with the schedule off as well.
+A triggered job that fails or is cancelled leaves the pending lines as they
+were, so the trigger then waits PREDICTIVE_RETRAIN_MIN_MINUTES before it
+tries again (last_trigger in the state file records the outcome).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+from db import open_dedicated_connection, use_sqlite
+from services import model_registry, retrain_trigger, training_jobs
+from services.predictive_service import EXPORT_DIR, get_train_status
+from utils.atomic_file import FileLock, replace_atomically
+
+STATE_FILE = EXPORT_DIR / "train_scheduler.json"
+LOCK_FILE = EXPORT_DIR / "train_scheduler.lock"
+LOCK_NAME = "itrack_predictive_scheduler"
+
+SCHEDULE = os.getenv("PREDICTIVE_TRAIN_SCHEDULE", "0 2 * * *").strip()
+CATCHUP_HOURS = float(os.getenv("PREDICTIVE_TRAIN_CATCHUP_HOURS", "24"))
+JITTER_SECONDS = float(os.getenv("PREDICTIVE_TRAIN_JITTER_SECONDS", "300"))
+TICK_SECONDS = float(os.getenv("PREDICTIVE_SCHEDULER_TICK_SECONDS", "30"))
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+# -----------------------------------
+# Cron schedule
+# -----------------------------------
+def _parse_field(spec: str, lo: int, hi: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            start, end = (int(x) for x in rng.split("-", 1))
+        else:
+            start = end = int(rng)
+            if step:
+                end = hi  # "5/15" = from 5 every 15
+        stride = int(step) if step else 1
+        if start < lo or end > hi or start > end or stride < 1:
+            raise ValueError(f"Bad cron field {spec!r} (allowed {lo}-{hi})")
+        values.update(range(start, end + 1, stride))
+    return values
+
+
+class CronSchedule:
+    """A 5-field cron expression, matched against naive local datetimes."""
+
+    def __init__(self, expr: str):
+        self.expr = expr
+        fields = _ALIASES.get(expr, expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        # 0 and 7 are both Sunday
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        dom = dt.day in self.days
+        dow = (dt.weekday() + 1) % 7 in self.weekdays
+        # Like cron: with both fields restricted, either one matching is enough
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, dt: datetime) -> datetime:
+        """First matching minute strictly after dt."""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expr!r}")
+
+    def last_between(self, since: datetime, until: datetime) -> Optional[datetime]:
+        """Latest matching minute in (since, until], or None."""
+        found = None
+        t = self.next_after(since)
+        while t <= until:
+            found = t
+            t = self.next_after(t)
+        return found
+
+
+# -----------------------------------
+# Leader election
+# -----------------------------------
+class _MySQLLeader:
+    """
+    GET_LOCK held by a dedicated (unpooled) connection; released if it drops.
+
+    The connection is kept for the leader's lifetime, so a process that is
+    not the leader just retries GET_LOCK on it every tick. It is replaced
+    only when a ping fails (the server then dropped the lock with it).
+    """
+
+    kind = "mysql"
+
+    def __init__(self) -> None:
+        self.conn = None
+        self.held = False
+
+    def _scalar(self, sql: str):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(sql, (LOCK_NAME,))
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+
+    def _connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.ping()
+                return self.conn
+            except Exception as exc:
+                logging.warning("Scheduler: leader lock connection lost, reconnecting: %s", exc)
+                self._close()
+        self.conn = open_dedicated_connection()
+        return self.conn
+
+    def acquire(self) -> bool:
+        try:
+            self._connection()
+            if self.held and self._scalar("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()") == 1:
+                return True
+            self.held = self._scalar("SELECT GET_LOCK(%s, 0)") == 1
+            return self.held
+        except Exception as exc:
+            logging.warning("Scheduler: leader lock check failed: %s", exc)
+            self._close()
+            return False
+
+    def release(self) -> None:
+        if self.conn is not None and self.held:
+            try:
+                self._scalar("SELECT RELEASE_LOCK(%s)")
+            except Exception:
+                pass
+        self._close()
+
+    def _close(self) -> None:
+        self.held = False
+        if self.conn is None:
+            return
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+
+class _FileLeader(FileLock):
+    """An exclusive OS lock on LOCK_FILE, held open for the process lifetime."""
+
+    kind = "file"
+
+    def __init__(self) -> None:
+        super().__init__(LOCK_FILE)
+
+
+def _make_leader():
+    kind = os.getenv("PREDICTIVE_SCHEDULER_LOCK", "file" if use_sqlite() else "mysql").strip().lower()
+    if kind not in ("mysql", "file"):
+        raise ValueError(f"PREDICTIVE_SCHEDULER_LOCK must be mysql or file, not {kind!r}")
+    return _MySQLLeader() if kind == "mysql" else _FileLeader()
+
+
+# -----------------------------------
+# Scheduler state
+# -----------------------------------
+_STATE: Dict[str, Any] = {"leader": False, "pending": None}
+_LEADER = None
+
+
+def _local_now() -> datetime:
+    return datetime.now()
+
+
+def _read_state() -> Dict[str, Any]:
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except Exception:
+        return {}
+
+
+def _write_state(state: Dict[str, Any]) -> None:
+    replace_atomically(STATE_FILE, lambda tmp: tmp.write_text(json.dumps(state, indent=2)))
+
+
+def _last_slot_run() -> Optional[datetime]:
+    raw = _read_state().get("last_slot")
+    if raw:
+        return datetime.fromisoformat(raw)
+    # Never scheduled here yet: the last training of any kind counts
+    trained = get_train_status().get("last_trained_utc")
+    if isinstance(trained, str):
+        try:
+            return datetime.fromisoformat(trained.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+def _due(schedule: CronSchedule, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """(slot, fire_at) of the slot to run, if any is due or pending."""
+    since = now - timedelta(hours=CATCHUP_HOURS)
+    last = _last_slot_run()
+    if last is not None and last > since:
+        since = last
+    slot = schedule.last_between(since, now)
+    if slot is None:
+        return None
+    pending = _STATE["pending"]
+    if pending is None or pending[0] != slot:
+        pending = (slot, slot + timedelta(seconds=random.uniform(0, max(0.0, JITTER_SECONDS))))
+        _STATE["pending"] = pending
+    return pending
+
+
+def _record(**entries: Any) -> None:
+    state = _read_state()
+    state.update(entries)
+    _write_state(state)
+
+
+def _trigger_backing_off(now: datetime) -> bool:
+    """
+    True within retrain_trigger.MIN_MINUTES of a triggered job that did not
+    succeed; without new models the trigger would fire again every tick.
+    """
+    last = _read_state().get("last_trigger") or {}
+    if last.get("job_id") and "outcome" not in last:
+        job = training_jobs.get(last["job_id"])
+        if job is None or job.status in training_jobs.ACTIVE:
+            return False  # still running, or started before this process
+        last = {**last, "outcome": job.status, "finished_local": now.isoformat()}
+        _record(last_trigger=last)
+        if job.status != "succeeded":
+            logging.warning(
+                "Scheduler: triggered job %s %s; not retriggering for %.0f minutes.",
+                job.id,
+                job.status,
+                retrain_trigger.MIN_MINUTES,
+            )
+    if last.get("outcome") in (None, "succeeded") or not last.get("finished_local"):
+        return False
+    finished = datetime.fromisoformat(last["finished_local"])
+    return now - finished < timedelta(minutes=retrain_trigger.MIN_MINUTES)
+
+
+def tick(schedule: Optional[CronSchedule]) -> None:
+    """One scheduler round (blocking; run off the event loop)."""
+    global _LEADER
+    if _LEADER is None:
+        _LEADER = _make_leader()
+    leader = _LEADER.acquire()
+    if leader != _STATE["leader"]:
+        logging.info("Scheduler: %s leadership (%s lock).", "took" if leader else "lost", _LEADER.kind)
+    _STATE["leader"] = leader
+
+    if model_registry.reload_if_changed():
+        logging.info("Scheduler: loaded a newer model version.")
+    if not leader:
+        _STATE["pending"] = None
+        return
+
+    now = _local_now()
+    due = _due(schedule, now) if schedule is not None else None
+    if due is not None and now >= due[1]:
+        slot = due[0]
+        job, created = training_jobs.submit("db")
+        logging.info(
+            "Scheduler: slot %s -> training job %s%s.",
+            slot.isoformat(timespec="minutes"),
+            job.id,
+            "" if created else " (already running)",
+        )
+        _record(last_slot=slot.isoformat(), job_id=job.id, submitted_local=now.isoformat())
+        _STATE["pending"] = None
+        return
+
+    # New issuance volume (services/retrain_trigger.py); not while another
+    # process trains, its run may well cover the new lines
+    if _trigger_backing_off(now) or training_jobs.training_locked():
+        return
+    decision = retrain_trigger.decide()
+    if decision is None:
+        return
+    job, created = training_jobs.submit("db", items=decision.get("items"))
+    if created:
+        logging.info("Scheduler: %s retrain triggered by new issuances -> job %s.", decision["scope"], job.id)
+        _record(last_trigger={**decision, "job_id": job.id, "submitted_local": now.isoformat()})
+
+
+def _enabled() -> bool:
+    return SCHEDULE.lower() not in ("", "off", "none")
+
+
+async def run_forever() -> None:
+    schedule = CronSchedule(SCHEDULE) if _enabled() else None
+    if schedule is None:
+        logging.info("Scheduler: PREDICTIVE_TRAIN_SCHEDULE is off; retraining on new issuances only.")
+    await asyncio.sleep(5)  # allow app to finish startup
+    while True:
+        try:
+            await asyncio.to_thread(tick, schedule)
+        except Exception as exc:
+            logging.exception("Scheduler tick failed: %s", exc)
+        await asyncio.sleep(TICK_SECONDS)
+
+
+def stop() -> None:
+    """Give up leadership (app shutdown), so another process takes over at once."""
+    if _LEADER is not None:
+        _LEADER.release()
+    _STATE["leader"] = False
+
+
+def info() -> Dict[str, Any]:
+    enabled = _enabled()
+    out: Dict[str, Any] = {
+        "schedule": SCHEDULE if enabled else "off",
+        "lock": _LEADER.kind if _LEADER is not None else None,
+        "leader": _STATE["leader"],
+        "catchup_hours": CATCHUP_HOURS,
+        "jitter_seconds": JITTER_SECONDS,
+        **_read_state(),
+    }
+    if enabled:
+        now = _local_now()
+        pending = _STATE["pending"]
+        out["next_run_local"] = (
+            pending[1] if pending is not None else CronSchedule(SCHEDULE).next_after(now)
+        ).isoformat(timespec="seconds")
+    out["retrain_trigger"] = retrain_trigger.info()
+    return out
@@ -0,0 +1,261 @@
+# backend/services/training_jobs.py
+"""
+Background training jobs for the predictive module.
+
+POST /predictive/train/all starts a job and returns its id right away. Each
+job runs scripts/train_worker.py in a child process, so Prophet / cmdstan CPU
+and memory (bounded by PREDICTIVE_TRAIN_MEMORY_MB and
+PREDICTIVE_FIT_TIMEOUT_SECONDS) stay out of the API process; a thread here
+only follows the worker's progress and, once it succeeds, loads the
+model version it saved. One job runs at a time (they write the same artifacts):
+starting one while another is queued or running returns the active job.
+Across processes (other API workers, a worker started from cron) the worker
+holds an OS lock on TRAIN_LOCK_FILE while it trains and saves; a job that
+finds it held ends as "already_running" without training, and submit()
+reports that right away when it can see the lock taken.
+
+GET /predictive/jobs/{id} reports the status (queued, running, succeeded,
+failed, cancelled, already_running), items done / total, an ETA from the
+average fit time so far, per-item fit failures and, once finished, the
+training summary.
+POST /predictive/jobs/{id}/cancel asks the worker to stop: no new fit
+starts, fits in flight finish, and the models fitted so far are saved (the
+next incremental run fits the rest). If the API goes away the worker stops
+the same way.
+
+Jobs live in memory only; the last JOB_HISTORY finished jobs are kept.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import model_registry
+from utils.atomic_file import FileLock
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+WORKER_CMD = [sys.executable, "-m", "scripts.train_worker", "--events"]
+TRAIN_LOCK_FILE = BACKEND_ROOT / "exports" / "train.lock"
+
+JOB_HISTORY = 20
+
+# job kind = the worker's --source
+KINDS = ("csv", "db")
+
+ACTIVE = ("queued", "running")
+
+_LOCK = threading.Lock()
+_JOBS: "OrderedDict[str, TrainingJob]" = OrderedDict()
+
+
+def training_lock() -> FileLock:
+    """The lock a training run holds while it trains and saves."""
+    return FileLock(TRAIN_LOCK_FILE)
+
+
+def training_locked() -> bool:
+    """Whether some process is training right now (a probe; the worker decides)."""
+    lock = training_lock()
+    if not lock.acquire():
+        return True
+    lock.release()
+    return False
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class TrainingJob:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = "queued"
+    created_utc: str = field(default_factory=_now)
+    started_utc: Optional[str] = None
+    finished_utc: Optional[str] = None
+    done: int = 0
+    total: Optional[int] = None
+    failures: Dict[str, str] = field(default_factory=dict)
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _fit_started: Optional[float] = field(default=None, repr=False)
+    _proc: Optional[subprocess.Popen] = field(default=None, repr=False)
+
+    def progress(self, done: int, total: int, failure: Optional[Dict[str, str]]) -> None:
+        with _LOCK:
+            if self._fit_started is None:
+                self._fit_started = time.monotonic()
+            self.done, self.total = done, total
+            if failure:
+                self.failures.update(failure)
+
+    def request_cancel(self) -> None:
+        with _LOCK:
+            self.cancel_event.set()
+            proc = self._proc
+        if proc is not None:
+            _send_cancel(proc)
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.status != "running" or not self.done or self.total is None:
+            return None
+        elapsed = time.monotonic() - self._fit_started
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with _LOCK:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": dict(self.params),
+                "status": self.status,
+                "cancel_requested": self.cancel_event.is_set(),
+                "created_utc": self.created_utc,
+                "started_utc": self.started_utc,
+                "finished_utc": self.finished_utc,
+                "done": self.done,
+                "total": self.total,
+                "eta_seconds": self.eta_seconds(),
+                "failures": dict(self.failures),
+                "summary": self.summary,
+                "error": self.error,
+            }
+
+
+def _send_cancel(proc: subprocess.Popen) -> None:
+    try:
+        proc.stdin.write("cancel\n")
+        proc.stdin.flush()
+    except (OSError, ValueError):
+        pass  # worker already gone
+
+
+def _finish(job: TrainingJob, status: str, summary=None, error: Optional[str] = None) -> None:
+    with _LOCK:
+        job.status = status
+        job.summary = summary
+        job.error = error
+        job.finished_utc = _now()
+        job._proc = None
+
+
+def _run(job: TrainingJob) -> None:
+    cmd = [*WORKER_CMD, "--source", job.kind] + (["--full"] if job.params.get("full") else [])
+    for name in job.params.get("items") or []:
+        cmd += ["--item", name]
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=BACKEND_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+    except OSError as exc:
+        logging.exception("Training job %s: worker did not start", job.id)
+        _finish(job, "failed", error=f"Worker did not start: {exc}")
+        return
+    with _LOCK:
+        job.status = "running"
+        job.started_utc = _now()
+        job._proc = proc
+    if job.cancel_event.is_set():  # cancelled while starting
+        _send_cancel(proc)
+
+    summary, error, already_running = None, None, False
+    for line in proc.stdout:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        kind = event.get("event")
+        if kind == "progress":
+            job.progress(event["done"], event["total"], event.get("failure"))
+        elif kind == "summary":
+            summary = event["summary"]
+        elif kind == "error":
+            error = event["error"]
+        elif kind == "already_running":
+            already_running = True
+    code = proc.wait()
+
+    if already_running:
+        logging.info("Training job %s: another training run holds the lock.", job.id)
+        _finish(job, "already_running", error="Another process is already training")
+        return
+
+    if code != 0 or summary is None:
+        error = error or f"Worker exited with code {code}"
+        logging.error("Training job %s failed: %s", job.id, error)
+        _finish(job, "failed", error=error)
+        return
+
+    # The worker saved its models (also a cancelled run's); serve them now
+    model_registry.reload_if_changed()
+    _finish(job, "cancelled" if summary.get("status") == "cancelled" else "succeeded", summary=summary)
+
+
+def _prune() -> None:
+    finished = [jid for jid, j in _JOBS.items() if j.status not in ACTIVE]
+    for jid in finished[: max(0, len(finished) - JOB_HISTORY)]:
+        del _JOBS[jid]
+
+
+def submit(kind: str, **params: Any) -> Tuple[TrainingJob, bool]:
+    """
+    Start a training job of `kind` (see KINDS). Returns (job, created);
+    created is False when a job was already active and that job is returned,
+    or when another process is training (the job returned is then recorded
+    as already_running).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown training job kind: {kind}")
+    with _LOCK:
+        for job in _JOBS.values():
+            if job.status in ACTIVE:
+                return job, False
+        job = TrainingJob(id=uuid.uuid4().hex, kind=kind, params=params)
+        if training_locked():
+            # Another process's run: recorded, not started
+            job.status, job.finished_utc = "already_running", _now()
+            job.error = "Another process is already training"
+            _JOBS[job.id] = job
+            _prune()
+            return job, False
+        _JOBS[job.id] = job
+        _prune()
+    threading.Thread(target=_run, args=(job,), name=f"train-job-{job.id[:8]}", daemon=True).start()
+    return job, True
+
+
+def get(job_id: str) -> Optional[TrainingJob]:
+    with _LOCK:
+        return _JOBS.get(job_id)
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    with _LOCK:
+        jobs = list(_JOBS.values())
+    return [j.to_dict() for j in reversed(jobs)]
+
+
+def cancel(job_id: str) -> Optional[TrainingJob]:
+    """Ask a job to stop (no-op once it has finished). None if unknown."""
+    job = get(job_id)
+    if job is not None and job.status in ACTIVE:
+        job.request_cancel()
+    return job
@@ -0,0 +1,95 @@
+# backend/utils/atomic_file.py
+"""
+Files shared by several processes (API workers, the training worker).
+
+replace_atomically() replaces a file in one step: write to a temp file next
+to it, then rename. Readers see the old content or the new, never half of
+it. The temp name is per process, so writers never trip over each other's
+temp file; the last rename wins.
+
+FileLock is an exclusive OS lock (fcntl, msvcrt on Windows) for the
+read-modify-write cases where the last rename winning is not enough.
+"""
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+def replace_atomically(path: Path, write: Callable[[Path], Any]) -> None:
+    """write(tmp) next to `path`, then rename over it in one step."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        for attempt in range(5):
+            try:
+                os.replace(tmp, path)
+                break
+            except PermissionError:
+                # Windows refuses while another process has `path` open
+                if attempt == 4:
+                    raise
+                time.sleep(0.2)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class FileLock:
+    """An exclusive OS lock on `path`, held until release()."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.fh = None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """Take the lock; without `blocking`, False at once if another process holds it."""
+        if self.fh is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+
+                fh.seek(0)
+                # LK_LOCK retries for about 10 seconds, then raises
+                msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            fh.close()
+            if blocking:
+                raise
+            return False
+        self.fh = fh
+        return True
+
+    def release(self) -> None:
+        if self.fh is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+
+                self.fh.seek(0)
+                msvcrt.locking(self.fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(self.fh.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self.fh.close()
+        self.fh = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire(blocking=True)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
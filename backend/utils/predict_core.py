@@ -1,10 +1,10 @@
-from typing import List, Dict, Any, Optional, Union
-import os, math
+from typing import List, Dict, Any, Optional
 import pandas as pd
 from fastapi import HTTPException
-import joblib
 
 from db import get_db
+from services import model_registry
+from services.order_archive import order_tables
 
 # Prophet availability is optional
 try:
@@ -14,14 +14,8 @@ except Exception:
     Prophet = None  # type: ignore
     _HAS_PROPHET = False
 
-_PRETRAINED: Optional[Union["Prophet", Dict[str, "Prophet"]]] = None
-try:
-    PKL_PATH = os.path.join(os.path.dirname(__file__), "..", "model.pkl")
-    PKL_PATH = os.path.abspath(PKL_PATH)
-    if os.path.exists(PKL_PATH):
-        _PRETRAINED = joblib.load(PKL_PATH)
-except Exception:
-    _PRETRAINED = None
+# Pretrained models come from services/model_registry.py (the same copy
+# /predictive serves, reloaded after every training)
 
 def has_prophet() -> bool:
     return _HAS_PROPHET
@@ -39,13 +33,14 @@ def df_to_records(fc: pd.DataFrame) -> List[Dict[str, Any]]:
     return out.to_dict(orient="records")
 
 def fetch_daily_series(item_id: int) -> pd.DataFrame:
-    conn = get_db()
+    orders, lines = order_tables()  # whole history, archived years included
+    conn = get_db(readonly=True)
     cursor = conn.cursor()
     cursor.execute(
-        """
+        f"""
         SELECT DATE(o.transaction_date) AS ds, SUM(ol.quantity) AS y
-        FROM order_line ol
-        JOIN `order` o ON o.order_id = ol.order_id
+        FROM {lines} ol
+        JOIN {orders} o ON o.order_id = ol.order_id
         WHERE ol.item_id = %s
         GROUP BY DATE(o.transaction_date)
         ORDER BY ds
@@ -104,31 +99,22 @@ def forecast_with_moving_average(df: pd.DataFrame, horizon_days: int, window: in
     return df_to_records(fc)
 
 def forecast_with_pretrained(item_name: Optional[str], horizon_days: int) -> List[Dict[str, Any]]:
-    if _PRETRAINED is None:
+    names = model_registry.names()
+    if not names:
         raise HTTPException(status_code=404, detail="No pretrained model available on server.")
 
-    # dict[str, Prophet]
-    if isinstance(_PRETRAINED, dict):
-        if not item_name:
-            raise HTTPException(status_code=400, detail="item_name is required for pretrained dict model.")
-        if item_name not in _PRETRAINED:
-            raise HTTPException(status_code=404, detail=f"Pretrained model '{item_name}' not found.")
-        model = _PRETRAINED[item_name]
-        if not is_single_model(model):
-            raise HTTPException(status_code=500, detail=f"Stored object for '{item_name}' is not a valid Prophet model.")
-        return forecast_with_prophet_df(model, horizon_days)
-
-    # single model
-    if is_single_model(_PRETRAINED):
-        return forecast_with_prophet_df(_PRETRAINED, horizon_days)  # type: ignore[arg-type]
+    # single model file
+    if names == [model_registry.DEFAULT_MODEL]:
+        item_name = model_registry.DEFAULT_MODEL
 
-    raise HTTPException(status_code=500, detail="Pretrained object is not a valid Prophet model.")
+    if not item_name:
+        raise HTTPException(status_code=400, detail="item_name is required for pretrained dict model.")
+    model = model_registry.get(item_name)
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Pretrained model '{item_name}' not found.")
+    if not is_single_model(model):
+        raise HTTPException(status_code=500, detail=f"Stored object for '{item_name}' is not a valid Prophet model.")
+    return forecast_with_prophet_df(model, horizon_days)
 
 def model_items():
-    if _PRETRAINED is None:
-        return {"items": []}
-    if isinstance(_PRETRAINED, dict):
-        return {"items": list(_PRETRAINED.keys())}
-    if is_single_model(_PRETRAINED):
-        return {"items": ["default_model"]}
-    return {"items": []}
+    return {"items": model_registry.names()}
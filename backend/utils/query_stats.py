@@ -0,0 +1,317 @@
+# backend/utils/query_stats.py
+"""
+Per-statement timing for every cursor handed out by db.get_db() / db_async
+(pooled or not, including the embedded SQLite backend) and by the training
+scheduler's lock connection. Statements issued outside a request (scripts,
+the scheduler, background logging) are attributed to "background".
+
+Each statement records its latency (execute + fetch), row count and the
+endpoint that issued it. We keep:
+  - the N slowest statements seen (DB_SLOW_QUERY_BUFFER, default 50)
+  - a ring buffer of recent statements above DB_SLOW_QUERY_MS (default 200)
+  - per-SQL aggregates (count / total / max) for the DB_QUERY_STATS_MAX_STATEMENTS
+    (default 500) most recently used statements; SQL whose text varies
+    (IN (...) lists of different lengths) would otherwise grow it forever
+and log one JSON line per slow statement on the "itrack.sql" logger.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("itrack.sql")
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+BUFFER_SIZE = int(os.getenv("DB_SLOW_QUERY_BUFFER", "50"))
+MAX_STATEMENTS = max(1, int(os.getenv("DB_QUERY_STATS_MAX_STATEMENTS", "500")))
+ENABLED = os.getenv("DB_QUERY_STATS_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on")
+
+_REQUEST_SCOPE: ContextVar[Optional[dict]] = ContextVar("itrack_request_scope", default=None)
+
+_LOCK = threading.Lock()
+_SEQ = itertools.count()
+_SLOWEST: List[tuple] = []  # min-heap of (latency_ms, seq, record)
+_RECENT_SLOW: deque = deque(maxlen=BUFFER_SIZE)
+_BY_SQL: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # LRU, MAX_STATEMENTS entries
+
+
+# -----------------------------------
+# Endpoint attribution
+# -----------------------------------
+class QueryContextMiddleware:
+    """
+    ASGI middleware that remembers the current request's scope, so statements
+    can be attributed to their route ("GET /stockcard/{item_id}").
+    Starlette fills scope["route"] in place once routing is done.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _REQUEST_SCOPE.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _REQUEST_SCOPE.reset(token)
+
+
+def current_endpoint() -> str:
+    scope = _REQUEST_SCOPE.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', '?')} {path}"
+
+
+def normalize_sql(sql: Any) -> str:
+    text = sql.decode() if isinstance(sql, (bytes, bytearray)) else str(sql)
+    return " ".join(text.split())[:500]
+
+
+# -----------------------------------
+# Recording
+# -----------------------------------
+def record(sql: str, latency_ms: float, rows: Optional[int], endpoint: str) -> None:
+    if not ENABLED:
+        return
+    rec = {
+        "sql": sql,
+        "latency_ms": round(latency_ms, 3),
+        "rows": rows,
+        "endpoint": endpoint,
+        "at_utc": datetime.now(timezone.utc).isoformat(),
+    }
+    slow = latency_ms >= SLOW_QUERY_MS
+
+    with _LOCK:
+        agg = _BY_SQL.get(sql)
+        if agg is None:
+            agg = _BY_SQL[sql] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "endpoints": set()}
+            if len(_BY_SQL) > MAX_STATEMENTS:
+                _BY_SQL.popitem(last=False)
+        else:
+            _BY_SQL.move_to_end(sql)
+        agg["count"] += 1
+        agg["total_ms"] += latency_ms
+        agg["max_ms"] = max(agg["max_ms"], latency_ms)
+        agg["endpoints"].add(endpoint)
+
+        entry = (latency_ms, next(_SEQ), rec)
+        if len(_SLOWEST) < BUFFER_SIZE:
+            heapq.heappush(_SLOWEST, entry)
+        elif latency_ms > _SLOWEST[0][0]:
+            heapq.heapreplace(_SLOWEST, entry)
+
+        if slow:
+            _RECENT_SLOW.append(rec)
+
+    if slow:
+        logger.warning("slow_query %s", json.dumps({"event": "slow_query", **rec}))
+
+
+def snapshot(limit: int = BUFFER_SIZE) -> Dict[str, Any]:
+    with _LOCK:
+        slowest = [r for _, _, r in sorted(_SLOWEST, key=lambda e: e[0], reverse=True)]
+        recent = list(_RECENT_SLOW)
+        by_sql = [
+            {
+                "sql": sql,
+                "count": a["count"],
+                "total_ms": round(a["total_ms"], 3),
+                "avg_ms": round(a["total_ms"] / a["count"], 3),
+                "max_ms": round(a["max_ms"], 3),
+                "endpoints": sorted(a["endpoints"]),
+            }
+            for sql, a in _BY_SQL.items()
+        ]
+    by_sql.sort(key=lambda a: a["total_ms"], reverse=True)
+    return {
+        "enabled": ENABLED,
+        "threshold_ms": SLOW_QUERY_MS,
+        "slowest": slowest[:limit],
+        "recent_slow": list(reversed(recent))[:limit],
+        "by_statement": by_sql[:limit],
+    }
+
+
+def reset() -> None:
+    with _LOCK:
+        _SLOWEST.clear()
+        _RECENT_SLOW.clear()
+        _BY_SQL.clear()
+
+
+# -----------------------------------
+# Cursor wrappers
+# -----------------------------------
+class _PendingStatement:
+    """
+    Timing for the statement a cursor is currently working on. Fetch time is
+    added to execute time; the record is flushed on the next execute, after
+    fetchall(), or on close().
+    """
+
+    __slots__ = ("sql", "endpoint", "elapsed", "rowcount", "fetched")
+
+    def __init__(self, sql, endpoint, elapsed, rowcount):
+        self.sql = sql
+        self.endpoint = endpoint
+        self.elapsed = elapsed
+        self.rowcount = rowcount  # known up front for DML / buffered SELECTs
+        self.fetched = 0
+
+    def add_fetch(self, seconds: float, n_rows: int) -> None:
+        self.elapsed += seconds
+        self.fetched += n_rows
+
+    def flush(self) -> None:
+        rows = max(self.rowcount or 0, self.fetched)
+        if self.rowcount is None and not self.fetched:
+            rows = None
+        record(self.sql, self.elapsed * 1000.0, rows, self.endpoint)
+
+
+def _rowcount(cursor) -> Optional[int]:
+    rc = getattr(cursor, "rowcount", -1)
+    return rc if isinstance(rc, int) and rc >= 0 else None
+
+
+class InstrumentedCursor:
+    """
+    Wraps a mysql.connector cursor; everything else is delegated.
+    owned=False is for cursors someone else keeps alive (the prepared-statement
+    registry): close() then only flushes the timing.
+    """
+
+    def __init__(self, cursor, owned: bool = True):
+        self._cursor = cursor
+        self._owned = owned
+        self._pending: Optional[_PendingStatement] = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _flush(self) -> None:
+        if self._pending is not None:
+            self._pending.flush()
+            self._pending = None
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._pending = _PendingStatement(
+                normalize_sql(operation),
+                current_endpoint(),
+                time.perf_counter() - t0,
+                _rowcount(self._cursor),
+            )
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = self._cursor.fetchone()
+        if self._pending is not None:
+            self._pending.add_fetch(time.perf_counter() - t0, row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if self._pending is not None:
+            self._pending.add_fetch(time.perf_counter() - t0, len(rows))
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = self._cursor.fetchall()
+        if self._pending is not None:
+            self._pending.add_fetch(time.perf_counter() - t0, len(rows))
+            self._flush()
+        return rows
+
+    def close(self):
+        self._flush()
+        if self._owned:
+            return self._cursor.close()
+        return None
+
+
+class AsyncInstrumentedCursor:
+    """
+    Same as InstrumentedCursor for aiomysql cursors (`async with` + awaitables).
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending: Optional[_PendingStatement] = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    def _flush(self) -> None:
+        if self._pending is not None:
+            self._pending.flush()
+            self._pending = None
+
+    async def execute(self, operation, params=None):
+        self._flush()
+        t0 = time.perf_counter()
+        try:
+            return await self._cursor.execute(operation, params)
+        finally:
+            self._pending = _PendingStatement(
+                normalize_sql(operation),
+                current_endpoint(),
+                time.perf_counter() - t0,
+                _rowcount(self._cursor),
+            )
+
+    async def fetchone(self):
+        t0 = time.perf_counter()
+        row = await self._cursor.fetchone()
+        if self._pending is not None:
+            self._pending.add_fetch(time.perf_counter() - t0, row is not None)
+        return row
+
+    async def fetchall(self):
+        t0 = time.perf_counter()
+        rows = await self._cursor.fetchall()
+        if self._pending is not None:
+            self._pending.add_fetch(time.perf_counter() - t0, len(rows))
+            self._flush()
+        return rows
+
+    async def close(self):
+        self._flush()
+        await self._cursor.close()